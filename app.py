@@ -1,98 +1,255 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, Response, g, session
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
-from database import crear_conexion, crear_tablas
+from database import conexion_db, estadisticas_pool, base_datos_disponible
 from config import Config
-from werkzeug.security import check_password_hash, generate_password_hash
+from cache import CacheTTL, crear_cache_fragmentos
+from busqueda import sugerir_consulta, buscar_resumenes, resumen_ficha, clave_busqueda, LIMITE_SUGERENCIAS
+from fichas import insertar_ficha, actualizar_ficha, separar_pasos, problema_formulario
+from repositorios import RepositorioFichas, RepositorioUsuarios, CANAL_USUARIOS
+from importacion import LECTORES, detectar_formato, importar_fichas, exportar_fichas
+from conocimiento import BaseConocimiento
+from catalogo import consultar_catalogo
+from contenido import ContenidoEstatico
+from condicional import etag_pagina, responder_condicional, condicional, registrar as registrar_condicional
+from contrasenas import PoolHash, PoolHashSaturado, LimitadorIntentos
+from sesiones import crear_almacen_sesiones, InterfazSesionesServidor
+from permisos import compilar_permisos
+import imagenes
+import metricas
+import bitacora
+from migrar import migrar
+from werkzeug.middleware.proxy_fix import ProxyFix
 import psycopg2
+import hashlib
+import io
 import json
+import logging
+import os
+import uuid
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
 app = Flask(__name__)
 app.config.from_object(Config)
 
+# Detrás de un proxy (Render), remote_addr pasa a ser la IP del cliente (la usa el límite de intentos de login)
+if app.config['PROXIES_CONFIABLES']:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXIES_CONFIABLES'],
+                            x_proto=app.config['PROXIES_CONFIABLES'])
+
+# Logging JSON con id de petición; la escritura ocurre en un hilo aparte
+bitacora.registrar(app)
+
 # Configurar Flask-Login
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
 login_manager.login_message = 'Por favor inicia sesión para acceder a esta página.'
 
+# Cache de objetos User por id: evita consultar la BD en cada request autenticado
+cache_usuarios = CacheTTL(max_items=app.config['USER_CACHE_MAX'], ttl=app.config['USER_CACHE_TTL'])
+
+# Sesiones en el servidor (opcional): la cookie lleva solo el id y el usuario armado se comparte entre workers
+almacen_sesiones = crear_almacen_sesiones(app.config['SESSION_STORE_URL'], app.config['SESSION_TTL'],
+                                          app.config['SESSION_MAX'])
+if almacen_sesiones is not None:
+    app.session_interface = InterfazSesionesServidor(almacen_sesiones)
+
+# Cache de resultados de /api/buscar por (consulta normalizada, categoría)
+cache_busqueda = CacheTTL(max_items=app.config['SEARCH_CACHE_MAX'], ttl=app.config['SEARCH_CACHE_TTL'])
+
+# Catálogo de problemas por versión de las fichas (solo se usa cuando no hay snapshot)
+cache_catalogo = CacheTTL(max_items=4, ttl=app.config['SEARCH_CACHE_TTL'])
+
+# HTML ya renderizado del cuerpo de ver_ficha; la versión de la plantilla entra en la clave
+cache_fragmentos = crear_cache_fragmentos(app.config['FRAGMENT_CACHE_URL'], app.config['FRAGMENT_CACHE_MAX_BYTES'],
+                                          app.config['FRAGMENT_CACHE_TTL'])
+with open(os.path.join(app.root_path, 'templates', '_ficha_detalle.html'), 'rb') as plantilla:
+    VERSION_FRAGMENTO_FICHA = hashlib.sha1(plantilla.read()).hexdigest()[:12]
+
+# Latencia por endpoint, tiempo de BD y de plantillas: /metrics y cabecera Server-Timing
+metricas.registrar(app)
+
+# Las páginas que muestran un flash no se etiquetan ni se responden con 304 (ver condicional.py)
+registrar_condicional(app)
+
+# Hash de contraseñas en un pool acotado de hilos, y límite de intentos fallidos de login
+pool_hash = PoolHash(app.config['PASSWORD_HASH_METHOD'], app.config['PASSWORD_HASH_HILOS'],
+                     app.config['PASSWORD_HASH_COLA'], app.config['PASSWORD_HASH_TIMEOUT'])
+intentos_login = LimitadorIntentos(app.config['LOGIN_MAX_INTENTOS'], app.config['LOGIN_VENTANA_SEGUNDOS'])
+intentos_login_ip = LimitadorIntentos(app.config['LOGIN_MAX_INTENTOS_IP'], app.config['LOGIN_VENTANA_SEGUNDOS'])
+metricas.agregar_fuente(pool_hash.metricas)
+metricas.agregar_fuente(lambda: [
+    ('login_bloqueados_total', 'counter', 'Intentos de login rechazados por el límite de fallos',
+     [({'limite': 'usuario'}, intentos_login.bloqueos), ({'limite': 'ip'}, intentos_login_ip.bloqueos)])
+])
+
+# Helpers de imágenes optimizadas (srcset, lazy loading, cache de larga duración)
+version_imagenes = imagenes.registrar(app)
+
+# Contenido fijo (cambia solo con un despliegue): se lee al arrancar desde datos/
+contenido_soluciones = ContenidoEstatico('soluciones_visuales.json', '_soluciones_visuales.html', 'soluciones')
+contenido_informacion = ContenidoEstatico('informacion_general.json', '_informacion_general.html', 'informacion')
+
+# Snapshot en memoria de todas las fichas; los demás workers se enteran por LISTEN/NOTIFY
+base_conocimiento = BaseConocimiento(
+    intervalo_verificacion=app.config['SNAPSHOT_VERIFICACION_SEGUNDOS'],
+    escuchar=app.config['SNAPSHOT_ESCUCHAR']
+)
+
+def aviso_usuario(carga):
+    """NOTIFY de usuarios_cambiados: otro worker cambió o eliminó un usuario (None: se pudo perder algún aviso)"""
+    if carga is None:
+        cache_usuarios.limpiar()
+    else:
+        cache_usuarios.invalidar(int(carga))
+
+# Los cambios de usuarios llegan por la misma conexión de LISTEN que los de fichas
+base_conocimiento.suscribir(CANAL_USUARIOS, aviso_usuario)
+
+def obtener_snapshot():
+    """Snapshot vigente de las fichas, o None si está desactivado o no se pudo cargar"""
+    if not app.config['SNAPSHOT_FICHAS']:
+        return None
+    return base_conocimiento.obtener()
+
+def version_fichas():
+    """Versión global de las fichas para los ETag de listados (sin consultar la BD si hay snapshot)"""
+    snapshot = obtener_snapshot()
+    if snapshot is not None:
+        return (snapshot.version,)
+    with conexion_db() as conexion:
+        if not conexion:
+            return None
+        with conexion.cursor() as cursor:
+            cursor.execute("SELECT version FROM fichas_version WHERE id = 1")
+            fila = cursor.fetchone()
+            return (fila[0],) if fila else None
+
+def version_ficha(id):
+    """Versión de una ficha (id + fecha_actualizacion) para el ETag y la cache de fragmentos de ver_ficha"""
+    snapshot = obtener_snapshot()
+    if snapshot is not None:
+        ficha = snapshot.por_id.get(id)
+        return (ficha.id, ficha.fecha_actualizacion) if ficha else None
+    # Sin snapshot la consulta se hace una vez por petición (la usan el ETag y la vista)
+    memoria = g.setdefault('versiones_ficha', {})
+    if id not in memoria:
+        with conexion_db() as conexion:
+            if not conexion:
+                return None
+            with conexion.cursor() as cursor:
+                memoria[id] = RepositorioFichas(cursor).version(id)
+    return memoria[id]
+
+def usuario_modificado(id_usuario):
+    """Descarta el User armado de este usuario (cambió su rol, permisos o nombre) para que se relea de la BD"""
+    cache_usuarios.invalidar(id_usuario)
+    if almacen_sesiones is not None:
+        almacen_sesiones.olvidar_usuario(id_usuario)
+
+def fichas_modificadas():
+    """Invalida lo que depende del contenido de las fichas tras agregar, editar o eliminar"""
+    base_conocimiento.invalidar()
+    cache_busqueda.limpiar()
+
+def variante_fragmento_ficha(fecha_actualizacion):
+    """Parte de la clave del fragmento que no es el id: plantilla, versión de la ficha y lo que el usuario puede hacer"""
+    return f"{VERSION_FRAGMENTO_FICHA}:{fecha_actualizacion.isoformat()}:{current_user.rol}:{current_user.permisos.mascara}"
+
+def leer_ficha(id):
+    """Ficha completa desde el snapshot o, si no hay, desde la BD (None si no existe)"""
+    snapshot = obtener_snapshot()
+    if snapshot is not None:
+        return snapshot.por_id.get(id)
+    with conexion_db() as conexion:
+        if not conexion:
+            return None
+        with conexion.cursor() as cursor:
+            return RepositorioFichas(cursor).obtener(id)
+
+def fragmento_ficha(id):
+    """{'titulo', 'html'} del cuerpo de ver_ficha: de la cache si esta versión ya se renderizó"""
+    version = version_ficha(id)
+    if version is None:
+        return None
+    variante = variante_fragmento_ficha(version[1])
+    fragmento = cache_fragmentos.obtener(id, variante)
+    if fragmento is None:
+        ficha = leer_ficha(id)
+        if ficha is None:
+            return None
+        fragmento = {'titulo': ficha.problema, 'html': render_template('_ficha_detalle.html', ficha=ficha)}
+        cache_fragmentos.guardar(id, variante, fragmento)
+    return fragmento
+
 @app.context_processor
 def inject_now():
     return {'now': datetime.now()}
 
+# Aviso de modo degradado mientras el circuit breaker corta el acceso a la BD
+@app.context_processor
+def inject_estado_bd():
+    return {'base_datos_degradada': not base_datos_disponible()}
+
+def sin_permisos(permiso):
+    return False
+
 # Inyectar función de permisos a todos los templates
 @app.context_processor
 def inject_permissions():
-    def tiene_permiso(permiso):
-        if current_user.is_authenticated:
-            if current_user.rol == 'admin':
-                return True
-            if hasattr(current_user, 'permisos'):
-                return current_user.permisos.get(permiso, False)
-        return False
-    return dict(tiene_permiso=tiene_permiso)
+    if current_user.is_authenticated:
+        return {'tiene_permiso': current_user.puede}
+    return {'tiene_permiso': sin_permisos}
 
 class User(UserMixin):
     def __init__(self, id, usuario, rol, permisos=None):
         self.id = id
         self.usuario = usuario
         self.rol = rol
-        self.permisos = permisos or {
-            'ver_fichas': True,
-            'agregar_fichas': False,
-            'editar_fichas': False,
-            'eliminar_fichas': False,
-            'cambiar_password': True
-        }
+        # Compilado una vez (rol + usuarios.permisos); el User queda en cache_usuarios
+        self.permisos = compilar_permisos(rol, permisos)
 
     def puede(self, permiso):
-        if self.rol == 'admin':
-            return True
-        return self.permisos.get(permiso, False)
+        return permiso in self.permisos
 
 @login_manager.user_loader
 def load_user(user_id):
-    cursor = None
-    conexion = None
     try:
-        conexion = crear_conexion()
-        if conexion:
-            cursor = conexion.cursor()
-            cursor.execute("SELECT * FROM usuarios WHERE id = %s", (user_id,))
-            user_data = cursor.fetchone()
-            if user_data:
-                # Convertir tupla a diccionario
-                user_dict = {
-                    'id': user_data[0],
-                    'usuario': user_data[1],
-                    'password': user_data[2],
-                    'rol': user_data[3],
-                    'permisos': user_data[4],
-                    'fecha_creacion': user_data[5],
-                    'fecha_actualizacion': user_data[6]
-                }
-                
-                # Cargar permisos desde JSON
-                permisos = {}
-                if user_dict.get('permisos'):
-                    try:
-                        permisos = json.loads(user_dict['permisos'])
-                    except:
-                        permisos = {}
-                
-                return User(
-                    user_dict['id'], 
-                    user_dict['usuario'], 
-                    user_dict['rol'],
-                    permisos
-                )
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None
+
+    # La escucha de avisos mantiene cache_usuarios al día con lo que cambian los demás workers
+    base_conocimiento.iniciar()
+    user = cache_usuarios.obtener(user_id)
+    if user is not None:
+        return user
+
+    # Usuario guardado junto a las sesiones (lo armó otro worker): sin consultar la BD
+    if almacen_sesiones is not None:
+        datos = almacen_sesiones.obtener_usuario(user_id)
+        if datos is not None:
+            user = User(datos['id'], datos['usuario'], datos['rol'], datos['permisos'])
+            cache_usuarios.guardar(user_id, user)
+            return user
+
+    try:
+        with conexion_db() as conexion:
+            if conexion:
+                with conexion.cursor() as cursor:
+                    fila = RepositorioUsuarios(cursor).obtener(user_id)
+                    if fila:
+                        user = User(fila.id, fila.usuario, fila.rol, fila.permisos)
+                        cache_usuarios.guardar(user_id, user)
+                        if almacen_sesiones is not None:
+                            almacen_sesiones.guardar_usuario(user_id, {
+                                'id': user.id, 'usuario': user.usuario, 'rol': user.rol, 'permisos': user.permisos.como_dict()
+                            })
+                        return user
     except Exception as e:
-        print(f"Error en load_user: {e}")
-    finally:
-        if cursor is not None:
-            cursor.close()
-        if conexion is not None:
-            conexion.close()
+        logger.exception("Error en load_user")
     return None
 
 # Decorador personalizado para permisos
@@ -108,6 +265,27 @@ def permiso_requerido(permiso):
         return decorated_function
     return decorator
 
+def actualizar_hash_password(id_usuario, password):
+    """Regenera con el método configurado un hash guardado con otro método o costo (tras verificarlo).
+
+    Si no se puede (pool de hash saturado, BD caída) se reintenta en el próximo login: el login sigue igual.
+    """
+    try:
+        nuevo_hash = pool_hash.generar(password)
+    except PoolHashSaturado:
+        logger.info("Actualización de hash pospuesta: pool de hash saturado", extra={'id_usuario': id_usuario})
+        return
+    # La conexión se pide recién con el hash listo: no queda ocupada mientras se calcula
+    try:
+        with conexion_db() as conexion:
+            if conexion:
+                with conexion.cursor() as cursor:
+                    cursor.execute("UPDATE usuarios SET password = %s WHERE id = %s", (nuevo_hash, id_usuario))
+                conexion.commit()
+                logger.info("Hash de contraseña actualizado al método configurado", extra={'id_usuario': id_usuario})
+    except psycopg2.Error:
+        logger.exception("Error actualizando el hash de contraseña", extra={'id_usuario': id_usuario})
+
 # Rutas de autenticación
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -115,172 +293,67 @@ def login():
     if current_user.is_authenticated:
         return redirect(url_for('index'))
     
-    cursor = None
-    conexion = None
-    
     if request.method == 'POST':
         usuario = request.form['usuario']
         password = request.form['password']
+        ip = request.remote_addr or ''
+        clave_intentos = (usuario.strip().lower(), ip)
+        
+        # Con demasiados fallos recientes no se consulta la BD ni se ocupa el pool de hash
+        espera = max(intentos_login.espera(clave_intentos), intentos_login_ip.espera(ip))
+        if espera:
+            logger.warning("Login bloqueado por intentos fallidos", extra={'usuario': usuario, 'ip': ip})
+            flash(f'Demasiados intentos fallidos. Intenta de nuevo en {(espera + 59) // 60} minuto(s)', 'error')
+            return render_template('login.html'), 429
         
         try:
-            conexion = crear_conexion()
-            if conexion:
-                cursor = conexion.cursor()
-                cursor.execute("SELECT * FROM usuarios WHERE usuario = %s", (usuario,))
-                user_data = cursor.fetchone()
-                
-                if user_data and user_data[2] and user_data[2].strip():  # user_data[2] es password
-                    # Convertir tupla a diccionario
-                    user_dict = {
-                        'id': user_data[0],
-                        'usuario': user_data[1],
-                        'password': user_data[2],
-                        'rol': user_data[3],
-                        'permisos': user_data[4]
-                    }
-                    
-                    if check_password_hash(user_dict['password'], password):
-                        # Cargar permisos desde JSON
-                        permisos = {}
-                        if user_dict.get('permisos'):
-                            try:
-                                permisos = json.loads(user_dict['permisos'])
-                            except:
-                                permisos = {}
-                        
-                        user = User(user_dict['id'], user_dict['usuario'], user_dict['rol'], permisos)
-                        login_user(user)
-                        flash('¡Inicio de sesión exitoso!', 'success')
-                        return redirect(url_for('index'))
-                    else:
-                        flash('Usuario o contraseña incorrectos', 'error')
+            # Solo la lectura del usuario ocupa una conexión: se devuelve al pool antes de verificar el hash
+            fila = None
+            with conexion_db() as conexion:
+                if conexion:
+                    with conexion.cursor() as cursor:
+                        fila = RepositorioUsuarios(cursor).obtener_con_password(usuario)
+
+            if not conexion:
+                flash('Error de conexión a la base de datos', 'error')
+            elif fila and fila.password and fila.password.strip():
+                if pool_hash.verificar(fila.password, password):
+                    intentos_login.limpiar(clave_intentos)
+                    if pool_hash.necesita_rehash(fila.password):
+                        actualizar_hash_password(fila.id, password)
+                    user = User(fila.id, fila.usuario, fila.rol, fila.permisos)
+                    if almacen_sesiones is not None:
+                        session.regenerar()
+                    login_user(user)
+                    flash('¡Inicio de sesión exitoso!', 'success')
+                    return redirect(url_for('index'))
                 else:
-                    flash('Usuario no encontrado', 'error')
+                    intentos_login.registrar_fallo(clave_intentos)
+                    intentos_login_ip.registrar_fallo(ip)
+                    flash('Usuario o contraseña incorrectos', 'error')
             else:
-                flash('Error de conexión a la base de datos', 'error')
-                
+                intentos_login.registrar_fallo(clave_intentos)
+                intentos_login_ip.registrar_fallo(ip)
+                flash('Usuario no encontrado', 'error')
+
+        except PoolHashSaturado:
+            logger.warning("Login rechazado: pool de hash saturado", extra={'usuario': usuario})
+            flash('El servidor está ocupado, intenta de nuevo en unos segundos', 'error')
+            return render_template('login.html'), 503
         except Exception as e:
             flash('Error de base de datos', 'error')
-            print(f"Error en login: {e}")
-        finally:
-            if cursor is not None:
-                cursor.close()
-            if conexion is not None:
-                conexion.close()
+            logger.exception("Error en login")
     
     return render_template('login.html')
 
 @app.route('/soluciones_visuales')
 @login_required
 def soluciones_visuales():
-    soluciones = [
-        {
-            'id': 1,
-            'titulo': '¿Como consultamos clientes?',
-            'categoria': 'Softv',
-            'imagenes': ['softv/softv1.png', 'softv/softv2.png', 'softv/softv3.png', 'softv/softv4.png'],
-            'descripcion': 'Busqueda del cliente paso a paso'
-        },
-        {
-            'id': 2,
-            'titulo': '¿Como vemos las facturas del usuario?',
-            'categoria': 'Softv',
-            'imagenes': ['softv/softv5.png', 'softv/softv6.png', 'softv/softv7.png', 'softv/softv8.png'],
-            'descripcion': 'Consultar historial de pagos del usuario'
-        },
-        {
-            'id': 3,
-            'titulo': '¿Como consultamos las ordenes de servicio de los usuarios?',
-            'categoria': 'Softv',
-            'imagenes': ['softv/softv9.png', 'softv/softv10.png', 'softv/softv11.png', 'softv/softv12.png'],
-            'descripcion': 'Consultar historial de ordenes de servicio del usuario'
-        },
-        {
-            'id': 4,
-            'titulo': '¿Como consultamos reportes de fallas de los usuarios?',
-            'categoria': 'Softv',
-            'imagenes': ['softv/softv13.png', 'softv/softv14.png', 'softv/softv15.png', 'softv/softv16.png'],
-            'descripcion': 'Consultar historial de reportes de falla del usuario'
-        },
-        {
-            'id': 5,
-            'titulo': '¿Como creamos un reporte de falla?',
-            'categoria': 'Softv', 
-            'imagenes': ['softv/softv15.png', 'softv/softv16.png', 'softv/softv17.png', 'softv/softv19.png', 'softv/softv21.png', 'softv/softv22.png'],
-            'descripcion': 'Crear un reporte de falla'
-        },
-        {
-            'id': 6,
-            'titulo': '¿Como creamos una orden de servicio?',
-            'categoria': 'Softv',
-            'imagenes': ['softv/softv23.png', 'softv/softv24.png', 'softv/softv26.png', 'softv/softv27.png', 'softv/softv28.png'],
-            'descripcion': 'Crear una orden de servicio'
-        },
-        {
-            'id': 7,
-            'titulo': '¿Como borramos un reporte de falla en caso necesario?',
-            'categoria': 'Softv',
-            'imagenes': ['softv/softv29.png', 'softv/softv29.png', 'softv/softv29.png'],
-            'descripcion': 'Como eliminar un reporte de falla'
-        },
-        {
-            'id': 8,
-            'titulo': '¿Como ingresamos un nuevo cliente?',
-            'categoria': 'Softv',
-            'imagenes': ['softv/softv30.png', 'softv/softv31.png', 'softv/softv32.png', 'softv/softv33.png', 'softv/softv32.png'],
-            'descripcion': 'Crear un nuevo cliente'
-        },
-        {
-            'id': 9,
-            'titulo': '¿Como buscar un usuario?',
-            'categoria': 'Vortex',
-            'imagenes': ['vortex/vortex1.png', 'vortex/vortex2.png', 'vortex/vortex3.png'],
-            'descripcion': 'Buscar a un usuario'
-        },
-        {
-            'id': 10,
-            'titulo': '¿Como validar puertos en uso y la MAC del equipo?',
-            'categoria': 'Vortex',
-            'imagenes': ['vortex/vortex4.png', 'vortex/vortex5.png'],
-            'descripcion': 'Como validar si el usuario esta haciendo uso de los puertos o el dispositivo no da MAC'
-        },
-        {
-            'id': 11,
-            'titulo': '¿Como validar si el usuario esta teniendo consumo del servicio?',
-            'categoria': 'Vortex',
-            'imagenes': ['vortex/vortex7.png'],
-            'descripcion': 'Como validar el consumo del usuario'
-        },
-        {
-            'id': 12,
-            'titulo': '¿Como cambiar la VLAN?',
-            'categoria': 'Vortex',
-            'imagenes': ['vortex/vortex8.png', 'vortex/vortex9.png'],
-            'descripcion': 'Como cambiar la VLAN acorde a la zona'
-        },
-        {
-            'id': 13,
-            'titulo': '¿Como realizar un resync config?',
-            'categoria': 'Vortex',
-            'imagenes': ['vortex/vortex10.png', 'vortex/vortex11.png'],
-            'descripcion': 'Como realizar un resync config'
-        },
-        {
-            'id': 14,
-            'titulo': '¿Como realizar un reboot?',
-            'categoria': 'Vortex',
-            'imagenes': ['vortex/vortex12.png', 'vortex/vortex13.png'],
-            'descripcion': 'Como realizar un reebot'
-        },
-        {
-            'id': 15,
-            'titulo': '¿Como identificar si el servicio de internet y TV estan activados?',
-            'categoria': 'Vortex',
-            'imagenes': ['vortex/vortex14.png'],
-            'descripcion': 'Validar si el servicio esta activo'
-        }
-    ]
-    return render_template('soluciones_visuales.html', soluciones=soluciones)
+    return responder_condicional(
+        etag_pagina(contenido_soluciones.version, version_imagenes),
+        lambda: render_template('soluciones_visuales.html', contenido=contenido_soluciones.fragmento()),
+        contenido_soluciones.modificado
+    )
 
 @app.route('/atencion_telefonica')
 @login_required
@@ -290,281 +363,11 @@ def atencion_telefonica():
 @app.route('/informacion-general')
 @login_required
 def informacion_general():
-    informacion = {
-        'planes': {
-            'titulo': '📡 Planes de Servicio',
-            'icono': 'fa-tv',
-            'contenido': [
-                {
-                    'subtitulo': 'Planes Básicos',
-                    'contenido_items': [
-                        '💯 **PLANES DE TV E INTERNET** 💯',
-                        '400 megas + TV: $85.000',
-                        '500 megas + TV: $95.000', 
-                        '600 megas + TV: $105.000',
-                        '',
-                        '💯 **PLANES SOLO TV** 💯',
-                        '10Mb + TV: $50.000',
-                        '',
-                        '🌐 **PLANES SOLO INTERNET** 🌐',
-                        '400 megas: $75.000',
-                        '500 megas: $85.000',
-                        '600 megas: $95.000'
-                    ]
-                },
-                {
-                    'subtitulo': 'Planes Corporativos',
-                    'contenido_items': [
-                        '💯 **PLANES CORPORATIVOS** 💯',
-                        '1Mb: $12.000',
-                        '30Mb (mínimo): $360.000 + 19% IVA = $428.400',
-                         '**Planes hogar:** se agrega 19% IVA',
-                        '**Equipo:** robusto para configuraciones especiales'
-                    ]
-                },
-                {
-                    'subtitulo': 'Planes Guamal y Sanmartin',
-                    'contenido_items': [
-                        '🎯 *PLANES DE TV + INTERNET* 🎯',
-                        'TV + 200MB: $65.000',
-                        'TV + 300MB: $75.000', 
-                        'TV + 400MB: $85.000',
-                        '',
-                        '📺 *PLAN SOLO TV* 📺',
-                        'Solo TV: $50.000'
-                    ]
-                },
-                {
-                    'subtitulo': 'Planes Acacías',
-                    'contenido_items': [
-                        '💯 **PLANES DE TV E INTERNET** 💯',
-                        'TV + Internet 200MB: $85.000',
-                        'TV + Internet 300MB: $95.000',
-                        'TV + Internet 400MB: $105.000',
-                        '',
-                        '💯 **PLANES SOLO TV** 💯',
-                        'Solo TV: $50.000',
-                        '',
-                        '🌐 **PLANES SOLO INTERNET** 🌐',
-                        '200MB: $75.000',
-                        '300MB: $85.000',
-                        '400MB: $95.000'
-                    ]
-                }
-            ]
-        },
-        'afiliaciones': {
-            'titulo': '👥 Afiliaciones',
-            'icono': 'fa-user-plus',
-            'contenido': [
-                {
-                    'subtitulo': 'Información General para Afiliar',
-                    'contenido_items': [
-                        '**La afiliación no tiene costo**',
-                        '**Instalación sin costo** en zona urbana (rural: $150.000)',
-                        '',
-                        '**Requisitos:**',
-                        '• 1 Fotocopia de la cédula',
-                        '• 1 Fotocopia del recibo de agua o luz',
-                        '• Pago del primer mes por anticipado',
-                        '• Servicio de TV para 2 televisores',
-                        '',
-                        '**Puntos adicionales de TV:**',
-                        '• Cada punto: $20.000 (solo instalación)',
-                        '• Mensualidad no cambia',
-                        '• Solo para el mismo predio',
-                        '',
-                        '**Señal Digital:**',
-                        '• Decodificador: $58.000 (único pago)',
-                        '• Para TVs clásicos con señal analógica',
-                        '',
-                        '**Tiempo de instalación:** 2-4 días hábiles'
-                    ]
-                },
-                {
-                    'subtitulo': 'Afiliación San Joaquín',
-                    'contenido_items': [
-                        '**Costo de instalación:** $60.000',
-                        '**Fibra incluida:** primeros 70 metros',
-                        '**Costo metro adicional:** $1.700',
-                        '',
-                        '**Servicio de TV:** 1 televisor',
-                        '**Puntos adicionales:** $35.000 c/u',
-                        '**Requisitos y tiempos iguales**  a afiliación general'
-                    ]
-                },
-                {
-                    'subtitulo': 'Información Adicional',
-                    'contenido_items': [
-                        '**Para asesores solicitar:**',
-                        '• Barrio',
-                        '• Dirección exacta', 
-                        '• Nombre del titular',
-                        '• 2 números de teléfono',
-                        '',
-                        '**Sin cláusula de permanencia**',
-                        '**Pago por adelantado** después de firmar contrato',
-                        '**Contrato**  se envía y recibe por el mismo medio'
-                    ]
-                }
-            ]
-        },
-        'win_sports': {
-            'titulo': '⚽ Win Sports +',
-            'icono': 'fa-futbol',
-            'contenido': [
-                {
-                    'subtitulo': '¡Llegó Win Sports + a M@STV Producciones!',
-                    'contenido_items': [
-                        '**Precio:** $35.000 adicionales al mes',
-                        '**Incluye:**',
-                        '• Acceso a Win Sports +',
-                        '• 14 canales premium',
-                        '• Y mucho más contenido deportivo',
-                        '',
-                        '**TV Box:** $100.000 (costo único)',
-                        '**No necesario** si TV es Android (con Google Play Store)',
-                        '**Cláusula:** 6 meses',
-                        '**Requisito:** Tener plan de internet con nosotros'
-                    ]
-                }
-            ]
-        },
-        'oficinas': {
-            'titulo': '🏢 Oficinas y Horarios',
-            'icono': 'fa-building',
-            'contenido': [
-                {
-                    'subtitulo': 'Horarios de Atención',
-                    'contenido_items': [
-                        '**Lunes a Viernes:** 8:00 AM - 5:00 PM',
-                        '**Sábados:** 8:00 AM - 12:00 PM'
-                    ]
-                },
-                {
-                    'subtitulo': 'Direcciones de Oficinas',
-                    'contenido_items': [
-                        '**Facatativá:** Cl 11 #7A-04, Diurba',
-                        '**Bojacá:** Cr 6 #5-146, Barrio Centro',
-                        '**Zipacón:** Crr 4 #5-57, Frente al parque',
-                        '**Rosal:** Cr 8 #8-08, Local 3 Centro',
-                        '**El Triunfo:** Crr 3 #2-40, Frente al coliseo',
-                        '**Viotá:** Cl 20 #11-10, Frente a estación de policía',
-                        '**Girardot:** Crr 10 #18-44, Barrio Centro / Frente a Bancamía',
-                        '**Cachipay:** Crr 3 #3-36, Barrio Centro',
-                        '**Sasaima:** Crr 2 #3-30, Barrio 3 Esquinas',
-                        '**La Mesa:** Cl 8 #16-59, Barrio Santa Bárbara',
-                        '**Anolaima:** Crr 7 #02-57, Barrio Centro',
-                        '**Mesitas del Colegio:** Cl 10 #6-37, Barrio Centro',
-                        '**Anapoima:** Cr 2 #7-32, Local 2 Centro',
-                        '**Albán:** Cl 4 #2-04, Punto de Servientrega',
-                        '**Madrid:** Cl 12 #3-64, Barrio Arrayane',
-                        '**Guayabal de Síquima:** Cl 3 #5-28',
-                        '**Tocaima:** Cl 4 #9-75',
-                        '**San Joaquín:** Cr 4 N 4-55, Al lado del árbol de los aburridos',
-                        '**Apulo:** Cl 14 #6-23, Local 102',
-                        '**Villeta:** Cr 5 #3-43, Local 6 Torre 4 Conjunto Santa Cruz',
-                        '**Acacías:** Cl 15 #22-40, Local 12, Edificio Dark Gym',
-                        '**San Martín:** Cl 7 #5-34, Barrio Fundadores',
-                        '**Guamal:** Cl 10 #4A-04, Barrio Las Villas',
-                        '**Quipile:** Crr 2 #6-07'
-                    ]
-                },
-                {
-                    'subtitulo': 'Puntos Autorizados Facatativá',
-                    'contenido_items': [
-                        '**Bolos el Tunjo:** Cr 2 #6-105',
-                        '**CLT Comunicaciones:** Cl 19 #1A-28 Sur, Prado de Cartagenita',
-                        '**Portal de María:** Transversal 11 #5-04, Manzana 5 Casa 30 S.M.A.',
-                        '**Papelería Expresate:** Cl 8 #10-05, Zambrano',
-                        '**One Books:** Diagonal 5 Este #9E-02, Juan Pablo II',
-                        '**Papelería Chico 1:** Cr 3 #5B-08 Este, Chico 1'
-                    ]
-                }
-            ]
-        },
-        'procesos': {
-            'titulo': '📋 Procesos y Trámites',
-            'icono': 'fa-clipboard-list',
-            'contenido': [
-                {
-                    'subtitulo': 'Cancelación de Servicio',
-                    'contenido_items': [
-                        '**Requisitos:**',
-                        '• Acercarse a la oficina',
-                        '• Carta indicando razón de cancelación',
-                        '• Paz y salvo',
-                        '• Equipos instalados (equipos y cargadores)'
-                    ]
-                },
-                {
-                    'subtitulo': 'Cambio de Titular',
-                    'contenido_items': [
-                        '**Requisitos:**',
-                        '• Carta solicitando cambio, firmada por antiguo y nuevo titular',
-                        '• Copia de cédula del nuevo titular',
-                        '• Estar al día en los pagos'
-                    ]
-                },
-                {
-                    'subtitulo': 'Cambio de Plan',
-                    'contenido_items': [
-                        '**Procedimiento:**',
-                        '• Acercarse a la oficina',
-                        '• Carta solicitando cambio de plan',
-                        '• Estar al día en pagos',
-                        '• Cancelar por adelantado valor del nuevo plan',
-                        '• Ideal realizarlo a finales de mes'
-                    ]
-                },
-                {
-                    'subtitulo': 'Traslado de Domicilio',
-                    'contenido_items': [
-                        '**Costo:** $20.000',
-                        '**Puntos adicionales:** $10.000 c/u (movimiento)',
-                        '**Tiempo:** 2-3 días hábiles',
-                        '**Requisito:** Llevar equipos a la nueva residencia'
-                    ]
-                },
-                {
-                    'subtitulo': 'Solicitud de Facturas',
-                    'contenido_items': [
-                        '**Datos requeridos:**',
-                        '• Contrato',
-                        '• Nombre completo',
-                        '• Cédula',
-                        '• Correo electrónico',
-                        '• Teléfono',
-                        '• Dirección completa',
-                        '• Municipio y barrio',
-                        '• Plan de internet',
-                        '• Valor del plan',
-                        '• Estrato',
-                        '**Empresas:** enviar foto del RUT'
-                    ]
-                }
-            ]
-        },
-        'contacto': {
-            'titulo': '📞 Contacto y Soporte',
-            'icono': 'fa-headset',
-            'contenido': [
-                {
-                    'subtitulo': 'Información de Contacto',
-                    'contenido_items': [
-                        '**Email PQR:** pqr@mastvproducciones.net.co',
-                        '**Email CARTERA:** auxiliaradministrativo@mastvproducciones.net.co',
-                        '**Email INGENIERIA:** ingenieria@mastvproducciones.net.co',
-                        '**Email RECURSOS HUMANOS:** rh@mastvproducciones.net.co',
-                        '**Chat de Soporte:** Solo mensajes escritos 3187777771',
-                        '**No se reciben:** audios ni llamadas por WhatsApp'
-                    ]
-                }
-            ]
-        }
-    }
-    
-    return render_template('informacion_general.html', informacion=informacion)
+    return responder_condicional(
+        etag_pagina(contenido_informacion.version),
+        lambda: render_template('informacion_general.html', contenido=contenido_informacion.fragmento()),
+        contenido_informacion.modificado
+    )
 
 @app.route('/logout')
 @login_required
@@ -577,9 +380,6 @@ def logout():
 @app.route('/cambiar_password', methods=['GET', 'POST'])
 @login_required
 def cambiar_password():
-    cursor = None
-    conexion = None
-    
     if request.method == 'POST':
         password_actual = request.form['password_actual']
         nueva_password = request.form['nueva_password']
@@ -600,35 +400,30 @@ def cambiar_password():
         
         # Verificar contraseña actual
         try:
-            conexion = crear_conexion()
-            if conexion:
-                cursor = conexion.cursor()
-                cursor.execute("SELECT password FROM usuarios WHERE id = %s", (current_user.id,))
-                usuario = cursor.fetchone()
+            with conexion_db() as conexion:
+                if conexion:
+                    with conexion.cursor() as cursor:
+                        hash_actual = RepositorioUsuarios(cursor).password(current_user.id)
                 
-                if usuario and check_password_hash(usuario[0], password_actual):
-                    # Actualizar contraseña
-                    hash_nueva_password = generate_password_hash(nueva_password)
-                    cursor.execute(
-                        "UPDATE usuarios SET password = %s WHERE id = %s",
-                        (hash_nueva_password, current_user.id)
-                    )
-                    conexion.commit()
-                    flash('Contraseña actualizada correctamente', 'success')
-                    return redirect(url_for('index'))
+                        if hash_actual and pool_hash.verificar(hash_actual, password_actual):
+                            # Actualizar contraseña
+                            hash_nueva_password = pool_hash.generar(nueva_password)
+                            cursor.execute(
+                                "UPDATE usuarios SET password = %s WHERE id = %s",
+                                (hash_nueva_password, current_user.id)
+                            )
+                            conexion.commit()
+                            cache_usuarios.invalidar(current_user.id)
+                            flash('Contraseña actualizada correctamente', 'success')
+                            return redirect(url_for('index'))
+                        else:
+                            flash('La contraseña actual es incorrecta', 'error')
                 else:
-                    flash('La contraseña actual es incorrecta', 'error')
-            else:
-                flash('Error de conexión a la base de datos', 'error')
+                    flash('Error de conexión a la base de datos', 'error')
                     
         except Exception as e:
             flash('Error al cambiar la contraseña', 'error')
-            print(f"Error en cambiar_password: {e}")
-        finally:
-            if cursor is not None:
-                cursor.close()
-            if conexion is not None:
-                conexion.close()
+            logger.exception("Error en cambiar_password")
     
     return render_template('cambiar_password.html')
 
@@ -640,50 +435,48 @@ def gestion_usuarios():
         flash('No tienes permisos para acceder a esta página', 'error')
         return redirect(url_for('index'))
     
-    cursor = None
-    conexion = None
     usuarios = []
     
     try:
-        conexion = crear_conexion()
-        if conexion:
-            cursor = conexion.cursor()
-            cursor.execute("SELECT * FROM usuarios ORDER BY fecha_creacion DESC")
-            usuarios_data = cursor.fetchall()
-            
-            # Convertir tuplas a diccionarios
-            for usuario in usuarios_data:
-                usuario_dict = {
-                    'id': usuario[0],
-                    'usuario': usuario[1],
-                    'password': usuario[2],
-                    'rol': usuario[3],
-                    'permisos': usuario[4],
-                    'fecha_creacion': usuario[5],
-                    'fecha_actualizacion': usuario[6]
-                }
-                
-                # Parsear permisos JSON para cada usuario
-                if usuario_dict.get('permisos'):
-                    try:
-                        usuario_dict['permisos_parsed'] = json.loads(usuario_dict['permisos'])
-                    except:
-                        usuario_dict['permisos_parsed'] = {}
-                else:
-                    usuario_dict['permisos_parsed'] = {}
-                
-                usuarios.append(usuario_dict)
+        with conexion_db() as conexion:
+            if conexion:
+                with conexion.cursor() as cursor:
+                    usuarios = RepositorioUsuarios(cursor).listar()
                     
     except Exception as e:
         flash('Error al cargar los usuarios', 'error')
-        print(f"Error en gestion_usuarios: {e}")
-    finally:
-        if cursor is not None:
-            cursor.close()
-        if conexion is not None:
-            conexion.close()
+        logger.exception("Error en gestion_usuarios")
+    
+    # Con sesiones en el servidor se muestran las abiertas de cada usuario y se pueden cerrar
+    sesiones_abiertas = None
+    if almacen_sesiones is not None:
+        sesiones_abiertas = almacen_sesiones.contar_por_usuario(usuario.id for usuario in usuarios)
+    
+    return render_template('gestion_usuarios.html', usuarios=usuarios, sesiones_abiertas=sesiones_abiertas)
+
+# Cerrar todas las sesiones de un usuario (solo admin, con sesiones en el servidor)
+@app.route('/usuarios/<int:id>/cerrar_sesiones', methods=['POST'])
+@login_required
+def cerrar_sesiones_usuario(id):
+    if current_user.rol != 'admin':
+        flash('No tienes permisos para realizar esta acción', 'error')
+        return redirect(url_for('index'))
+    
+    if almacen_sesiones is None:
+        flash('Las sesiones se guardan en el navegador: no se pueden cerrar desde aquí', 'error')
+        return redirect(url_for('gestion_usuarios'))
+    
+    try:
+        cerradas = almacen_sesiones.revocar_usuario(id)
+        cache_usuarios.invalidar(id)
+        logger.info("Sesiones de usuario cerradas por un admin",
+                    extra={'id_usuario': id, 'sesiones': cerradas, 'admin': current_user.id})
+        flash(f'Se cerraron {cerradas} sesión(es) del usuario', 'success')
+    except Exception as e:
+        flash('Error al cerrar las sesiones del usuario', 'error')
+        logger.exception("Error en cerrar_sesiones_usuario")
     
-    return render_template('gestion_usuarios.html', usuarios=usuarios)
+    return redirect(url_for('gestion_usuarios'))
 
 # Ruta para editar usuario (solo admin)
 @app.route('/editar_usuario/<int:id>', methods=['GET', 'POST'])
@@ -693,80 +486,54 @@ def editar_usuario(id):
         flash('No tienes permisos para realizar esta acción', 'error')
         return redirect(url_for('index'))
     
-    cursor = None
-    conexion = None
     usuario_data = None
     
     try:
-        conexion = crear_conexion()
-        if conexion:
-            cursor = conexion.cursor()
+        with conexion_db() as conexion:
+            if conexion:
+                with conexion.cursor() as cursor:
             
-            if request.method == 'POST':
-                usuario = request.form['usuario']
-                password = request.form['password']
-                rol = request.form['rol']
+                    if request.method == 'POST':
+                        usuario = request.form['usuario']
+                        password = request.form['password']
+                        rol = request.form['rol']
                 
-                # Obtener permisos del formulario
-                permisos = {
-                    'ver_fichas': True,  # Siempre activo
-                    'agregar_fichas': 'agregar_fichas' in request.form,
-                    'editar_fichas': 'editar_fichas' in request.form,
-                    'eliminar_fichas': 'eliminar_fichas' in request.form,
-                    'cambiar_password': True  # Siempre permitido
-                }
+                        # Obtener permisos del formulario
+                        permisos = {
+                            'ver_fichas': True,  # Siempre activo
+                            'agregar_fichas': 'agregar_fichas' in request.form,
+                            'editar_fichas': 'editar_fichas' in request.form,
+                            'eliminar_fichas': 'eliminar_fichas' in request.form,
+                            'cambiar_password': True  # Siempre permitido
+                        }
                 
-                permisos_json = json.dumps(permisos)
+                        permisos_json = json.dumps(permisos)
                 
-                if password:
-                    hash_password = generate_password_hash(password)
-                    cursor.execute(
-                        "UPDATE usuarios SET usuario = %s, password = %s, rol = %s, permisos = %s WHERE id = %s",
-                        (usuario, hash_password, rol, permisos_json, id)
-                    )
-                else:
-                    cursor.execute(
-                        "UPDATE usuarios SET usuario = %s, rol = %s, permisos = %s WHERE id = %s",
-                        (usuario, rol, permisos_json, id)
-                    )
+                        if password:
+                            hash_password = pool_hash.generar(password)
+                            cursor.execute(
+                                "UPDATE usuarios SET usuario = %s, password = %s, rol = %s, permisos = %s WHERE id = %s",
+                                (usuario, hash_password, rol, permisos_json, id)
+                            )
+                        else:
+                            cursor.execute(
+                                "UPDATE usuarios SET usuario = %s, rol = %s, permisos = %s WHERE id = %s",
+                                (usuario, rol, permisos_json, id)
+                            )
                 
-                conexion.commit()
-                flash('Usuario actualizado correctamente', 'success')
-                return redirect(url_for('gestion_usuarios'))
-            
-            # GET: Cargar datos del usuario
-            cursor.execute("SELECT * FROM usuarios WHERE id = %s", (id,))
-            usuario = cursor.fetchone()
+                        conexion.commit()
+                        usuario_modificado(id)
+                        flash('Usuario actualizado correctamente', 'success')
+                        return redirect(url_for('gestion_usuarios'))
             
-            if usuario:
-                usuario_data = {
-                    'id': usuario[0],
-                    'usuario': usuario[1],
-                    'password': usuario[2],
-                    'rol': usuario[3],
-                    'permisos': usuario[4],
-                    'fecha_creacion': usuario[5],
-                    'fecha_actualizacion': usuario[6]
-                }
-                
-                if usuario_data.get('permisos'):
-                    try:
-                        usuario_data['permisos_parsed'] = json.loads(usuario_data['permisos'])
-                    except:
-                        usuario_data['permisos_parsed'] = {}
-                else:
-                    usuario_data['permisos_parsed'] = {}
+                    # GET: Cargar datos del usuario
+                    usuario_data = RepositorioUsuarios(cursor).obtener(id)
             
     except psycopg2.IntegrityError:
         flash('El usuario ya existe', 'error')
     except Exception as e:
         flash('Error al editar el usuario', 'error')
-        print(f"Error en editar_usuario: {e}")
-    finally:
-        if cursor is not None:
-            cursor.close()
-        if conexion is not None:
-            conexion.close()
+        logger.exception("Error en editar_usuario")
     
     if not usuario_data:
         flash('Usuario no encontrado', 'error')
@@ -782,9 +549,6 @@ def agregar_usuario():
         flash('No tienes permisos para realizar esta acción', 'error')
         return redirect(url_for('index'))
     
-    cursor = None
-    conexion = None
-    
     if request.method == 'POST':
         usuario = request.form['usuario']
         password = request.form['password']
@@ -804,29 +568,24 @@ def agregar_usuario():
         }
         
         permisos_json = json.dumps(permisos)
-        hash_password = generate_password_hash(password)
         
         try:
-            conexion = crear_conexion()
-            if conexion:
-                cursor = conexion.cursor()
-                cursor.execute(
-                    "INSERT INTO usuarios (usuario, password, rol, permisos) VALUES (%s, %s, %s, %s)",
-                    (usuario, hash_password, rol, permisos_json)
-                )
-                conexion.commit()
-                flash('Usuario agregado correctamente', 'success')
-                return redirect(url_for('gestion_usuarios'))
+            hash_password = pool_hash.generar(password)
+            with conexion_db() as conexion:
+                if conexion:
+                    with conexion.cursor() as cursor:
+                        cursor.execute(
+                            "INSERT INTO usuarios (usuario, password, rol, permisos) VALUES (%s, %s, %s, %s)",
+                            (usuario, hash_password, rol, permisos_json)
+                        )
+                        conexion.commit()
+                        flash('Usuario agregado correctamente', 'success')
+                        return redirect(url_for('gestion_usuarios'))
         except psycopg2.IntegrityError:
             flash('El usuario ya existe', 'error')
         except Exception as e:
             flash('Error al agregar el usuario', 'error')
-            print(f"Error en agregar_usuario: {e}")
-        finally:
-            if cursor is not None:
-                cursor.close()
-            if conexion is not None:
-                conexion.close()
+            logger.exception("Error en agregar_usuario")
     
     return render_template('agregar_usuario.html')
 
@@ -842,71 +601,83 @@ def eliminar_usuario(id):
         flash('No puedes eliminar tu propio usuario', 'error')
         return redirect(url_for('gestion_usuarios'))
     
-    cursor = None
-    conexion = None
-    
     try:
-        conexion = crear_conexion()
-        if conexion:
-            cursor = conexion.cursor()
-            cursor.execute("DELETE FROM usuarios WHERE id = %s", (id,))
-            conexion.commit()
-            flash('Usuario eliminado correctamente', 'success')
+        with conexion_db() as conexion:
+            if conexion:
+                with conexion.cursor() as cursor:
+                    cursor.execute("DELETE FROM usuarios WHERE id = %s", (id,))
+                    conexion.commit()
+                    cache_usuarios.invalidar(id)
+                    if almacen_sesiones is not None:
+                        almacen_sesiones.revocar_usuario(id)
+                    flash('Usuario eliminado correctamente', 'success')
     except Exception as e:
         flash('Error al eliminar el usuario', 'error')
-        print(f"Error en eliminar_usuario: {e}")
-    finally:
-        if cursor is not None:
-            cursor.close()
-        if conexion is not None:
-            conexion.close()
+        logger.exception("Error en eliminar_usuario")
     
     return redirect(url_for('gestion_usuarios'))
 
 # Rutas principales
 @app.route('/')
 @login_required
+@condicional(version_fichas)
 def index():
     if not current_user.puede('ver_fichas'):
         flash('No tienes permisos para ver las fichas', 'error')
         return redirect(url_for('login'))
     
-    cursor = None
-    conexion = None
     fichas = []
+    siguiente = None
+    conteos = {}
     
     try:
-        conexion = crear_conexion()
-        if conexion:
-            cursor = conexion.cursor()
-            cursor.execute("SELECT * FROM fichas ORDER BY fecha_actualizacion DESC")
-            fichas_data = cursor.fetchall()
-            
-            # Convertir tuplas a diccionarios
-            for ficha in fichas_data:
-                ficha_dict = {
-                    'id': ficha[0],
-                    'categoria': ficha[1],
-                    'problema': ficha[2],
-                    'descripcion': ficha[3],
-                    'causas': ficha[4],
-                    'solucion': ficha[5],
-                    'palabras_clave': ficha[6],
-                    'fecha_creacion': ficha[7],
-                    'fecha_actualizacion': ficha[8]
-                }
-                fichas.append(ficha_dict)
+        snapshot = obtener_snapshot()
+        if snapshot is not None:
+            # Solo la primera página; el resto se pide a /api/fichas
+            fichas, siguiente = snapshot.pagina(app.config['FICHAS_POR_PAGINA'])
+            conteos = snapshot.conteos
+        else:
+            with conexion_db() as conexion:
+                if conexion:
+                    with conexion.cursor() as cursor:
+                        repositorio = RepositorioFichas(cursor)
+                        fichas, siguiente = repositorio.pagina(app.config['FICHAS_POR_PAGINA'])
+                        conteos = repositorio.conteos_por_categoria()
                 
     except Exception as e:
         flash('Error al cargar las fichas', 'error')
-        print(f"Error en index: {e}")
-    finally:
-        if cursor is not None:
-            cursor.close()
-        if conexion is not None:
-            conexion.close()
+        logger.exception("Error en index")
+    
+    return render_template('index.html', fichas=fichas, siguiente=siguiente, conteos=conteos,
+                           total_fichas=sum(conteos.values()), user=current_user)
+
+# API para "cargar más" fichas en el index
+@app.route('/api/fichas')
+@login_required
+def api_fichas():
+    if not current_user.puede('ver_fichas'):
+        return jsonify({'error': 'No autorizado'}), 403
+    
+    despues = request.args.get('despues', '')
+    try:
+        snapshot = obtener_snapshot()
+        if snapshot is not None:
+            fichas, siguiente = snapshot.pagina(app.config['FICHAS_POR_PAGINA'], despues)
+        else:
+            with conexion_db() as conexion:
+                if not conexion:
+                    return jsonify({'error': 'Error de conexión a la base de datos'}), 503
+                with conexion.cursor() as cursor:
+                    fichas, siguiente = RepositorioFichas(cursor).pagina(app.config['FICHAS_POR_PAGINA'], despues)
+    except Exception as e:
+        logger.exception("Error en api_fichas")
+        return jsonify({'error': 'Error al cargar las fichas'}), 500
     
-    return render_template('index.html', fichas=fichas, user=current_user)
+    return jsonify({
+        'html': render_template('_fichas_tarjetas.html', fichas=fichas),
+        'modales': render_template('_fichas_modales.html', fichas=fichas),
+        'siguiente': siguiente
+    })
 
 @app.route('/agregar', methods=['GET', 'POST'])
 @login_required
@@ -915,21 +686,17 @@ def agregar_ficha():
         flash('No tienes permisos para realizar esta acción', 'error')
         return redirect(url_for('index'))
     
-    cursor = None
-    conexion = None
-    
     if request.method == 'POST':
         # Obtener datos del formulario
         categoria = request.form.get('categoria', '')
-        problema = request.form.get('problema', '')
+        problema = problema_formulario(request.form)
         descripcion = request.form.get('descripcion', '')
-        causas = request.form.get('causas', '')
-        solucion = request.form.get('solucion', '')
+        causas = separar_pasos(request.form.get('causas', ''))
+        solucion = separar_pasos(request.form.get('solucion', ''))
         palabras_clave = request.form.get('palabras_clave', '')
-        
-        print(f"📝 DATOS DEL FORMULARIO:")
-        print(f"   Categoría: {categoria}")
-        print(f"   Problema: {problema}")
+        # Clave única del formulario (o cabecera Idempotency-Key para clientes de la API)
+        clave_idempotencia = (request.form.get('clave_idempotencia') or
+                              request.headers.get('Idempotency-Key', ''))[:64] or None
         
         # Validar campos requeridos
         campos_requeridos = {
@@ -942,58 +709,37 @@ def agregar_ficha():
         campos_faltantes = [campo for campo, valor in campos_requeridos.items() if not valor]
         
         if campos_faltantes:
-            print(f"❌ CAMPOS FALTANTES: {campos_faltantes}")
+            logger.info("Ficha sin campos requeridos", extra={'campos_faltantes': campos_faltantes})
             flash('Por favor, complete todos los campos requeridos', 'error')
-            return render_template('agregar_ficha.html')
-        
-        print("✅ TODOS LOS CAMPOS REQUERIDOS COMPLETOS")
+            return render_template('agregar_ficha.html', clave_idempotencia=clave_idempotencia or uuid.uuid4().hex)
         
         try:
-            conexion = crear_conexion()
-            if conexion:
-                cursor = conexion.cursor()
-                print("🔧 Ejecutando INSERT en la base de datos...")
-                
-                cursor.execute('''
-                    INSERT INTO fichas (categoria, problema, descripcion, causas, solucion, palabras_clave)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                ''', (categoria, problema, descripcion, causas, solucion, palabras_clave))
-                
-                conexion.commit()
-                print("✅ Ficha agregada correctamente a la base de datos")
-                flash('Ficha agregada correctamente', 'success')
-                return redirect(url_for('index'))
-            else:
-                print("❌ No hay conexión a la base de datos")
-                flash('Error de conexión a la base de datos', 'error')
-                
-        except psycopg2.IntegrityError as e:
-            # ERROR ESPECÍFICO: duplicate key - problema de secuencia
-            print(f"❌ ERROR DE INTEGRIDAD (secuencia): {str(e)}")
-            flash('Error en la base de datos: problema con IDs. Por favor, contacte al administrador.', 'error')
-            if conexion:
-                conexion.rollback()
-                
-            # Intentar resetear la secuencia automáticamente
-            try:
-                from database import resetear_secuencias
-                resetear_secuencias()
-                print("🔄 Secuencia reseteada automáticamente")
-            except:
-                print("⚠️ No se pudo resetear la secuencia automáticamente")
-                
+            with conexion_db() as conexion:
+                if conexion:
+                    with conexion.cursor() as cursor:
+                        id_ficha, creada = insertar_ficha(
+                            cursor, categoria, problema, descripcion, causas, solucion, palabras_clave,
+                            clave_idempotencia
+                        )
+                        conexion.commit()
+
+                    if creada:
+                        fichas_modificadas()
+                        logger.info("Ficha agregada", extra={'id_ficha': id_ficha, 'categoria': categoria})
+                    else:
+                        logger.info("Envío repetido de ficha ignorado", extra={'id_ficha': id_ficha})
+                    flash('Ficha agregada correctamente', 'success')
+                    return redirect(url_for('index'))
+                else:
+                    flash('Error de conexión a la base de datos', 'error')
+
         except Exception as e:
-            print(f"❌ ERROR en base de datos: {str(e)}")
+            logger.exception("Error en agregar_ficha")
             flash(f'Error al agregar la ficha: {str(e)}', 'error')
-            if conexion:
-                conexion.rollback()
-        finally:
-            if cursor is not None:
-                cursor.close()
-            if conexion is not None:
-                conexion.close()
-    
-    return render_template('agregar_ficha.html')
+
+        return render_template('agregar_ficha.html', clave_idempotencia=clave_idempotencia or uuid.uuid4().hex)
+
+    return render_template('agregar_ficha.html', clave_idempotencia=uuid.uuid4().hex)
 
 @app.route('/editar/<int:id>', methods=['GET', 'POST'])
 @login_required
@@ -1002,67 +748,41 @@ def editar_ficha(id):
         flash('No tienes permisos para realizar esta acción', 'error')
         return redirect(url_for('index'))
     
-    cursor = None
-    conexion = None
     ficha = None
     
     try:
-        conexion = crear_conexion()
-        if conexion:
-            cursor = conexion.cursor()
-            
-            if request.method == 'POST':
-                categoria = request.form['categoria']
-                problema = request.form['problema']
-                descripcion = request.form['descripcion']
-                causas = request.form['causas']
-                solucion = request.form['solucion']
-                palabras_clave = request.form['palabras_clave']
-                
-                # Procesar causas (convertir saltos de línea a |)
-                causas_items = [item.strip() for item in causas.split('\n') if item.strip()]
-                causas_str = '|'.join(causas_items)
-                
-                cursor.execute('''
-                    UPDATE fichas 
-                    SET categoria=%s, problema=%s, descripcion=%s, 
-                    causas=%s, solucion=%s, palabras_clave=%s 
-                    WHERE id=%s
-                ''', (categoria, problema, descripcion, causas_str, solucion, palabras_clave, id))
-                
-                conexion.commit()
-                flash('Ficha actualizada correctamente', 'success')
-                return redirect(url_for('index'))
+        with conexion_db() as conexion:
+            if conexion:
+                with conexion.cursor() as cursor:
             
-            # GET: Cargar datos de la ficha
-            cursor.execute("SELECT * FROM fichas WHERE id = %s", (id,))
-            ficha_data = cursor.fetchone()
+                    if request.method == 'POST':
+                        categoria = request.form.get('categoria', '')
+                        # Con "Otro problema" el select va deshabilitado y solo llega problema_real
+                        problema = problema_formulario(request.form)
+                        descripcion = request.form.get('descripcion', '')
+                        causas = separar_pasos(request.form.get('causas', ''))
+                        solucion = separar_pasos(request.form.get('solucion', ''))
+                        palabras_clave = request.form.get('palabras_clave', '')
+
+                        if not (categoria and problema and causas and solucion):
+                            # Se vuelve a mostrar el formulario con la ficha guardada
+                            flash('Por favor, complete todos los campos requeridos', 'error')
+                        else:
+                            # Solo se reescriben los pasos que cambiaron (fichas_pasos)
+                            actualizar_ficha(cursor, id, categoria, problema, descripcion, causas, solucion, palabras_clave)
+
+                            conexion.commit()
+                            fichas_modificadas()
+                            cache_fragmentos.invalidar_grupo(id)
+                            flash('Ficha actualizada correctamente', 'success')
+                            return redirect(url_for('index'))
             
-            if ficha_data:
-                ficha = {
-                    'id': ficha_data[0],
-                    'categoria': ficha_data[1],
-                    'problema': ficha_data[2],
-                    'descripcion': ficha_data[3],
-                    'causas': ficha_data[4],
-                    'solucion': ficha_data[5],
-                    'palabras_clave': ficha_data[6],
-                    'fecha_creacion': ficha_data[7],
-                    'fecha_actualizacion': ficha_data[8]
-                }
-                
-                # Convertir | de vuelta a saltos de línea para el formulario
-                if ficha and ficha['causas']:
-                    ficha['causas'] = ficha['causas'].replace('|', '\n')
+                    # GET: Cargar datos de la ficha
+                    ficha = RepositorioFichas(cursor).obtener(id)
             
     except Exception as e:
         flash('Error al cargar/editar la ficha', 'error')
-        print(f"Error en editar_ficha: {e}")
-    finally:
-        if cursor is not None:
-            cursor.close()
-        if conexion is not None:
-            conexion.close()
+        logger.exception("Error en editar_ficha")
     
     if not ficha:
         flash('Ficha no encontrada', 'error')
@@ -1077,29 +797,24 @@ def eliminar_ficha(id):
         flash('No tienes permisos para realizar esta acción', 'error')
         return redirect(url_for('index'))
     
-    cursor = None
-    conexion = None
-    
     try:
-        conexion = crear_conexion()
-        if conexion:
-            cursor = conexion.cursor()
-            cursor.execute("DELETE FROM fichas WHERE id = %s", (id,))
-            conexion.commit()
-            flash('Ficha eliminada correctamente', 'success')
+        with conexion_db() as conexion:
+            if conexion:
+                with conexion.cursor() as cursor:
+                    cursor.execute("DELETE FROM fichas WHERE id = %s", (id,))
+                    conexion.commit()
+                    fichas_modificadas()
+                    cache_fragmentos.invalidar_grupo(id)
+                    flash('Ficha eliminada correctamente', 'success')
     except Exception as e:
         flash('Error al eliminar la ficha', 'error')
-        print(f"Error en eliminar_ficha: {e}")
-    finally:
-        if cursor is not None:
-            cursor.close()
-        if conexion is not None:
-            conexion.close()
+        logger.exception("Error en eliminar_ficha")
     
     return redirect(url_for('index'))
 
 @app.route('/buscar')
 @login_required
+@condicional(version_fichas)
 def buscar():
     if not current_user.puede('ver_fichas'):
         flash('No tienes permisos para ver las fichas', 'error')
@@ -1107,137 +822,219 @@ def buscar():
     
     query = request.args.get('q', '')
     categoria = request.args.get('categoria', '')
+    modo = request.args.get('modo', '')
     
-    cursor = None
-    conexion = None
     fichas = []
+    aproximado = False
+    sugerencia = None
+    texto = query.strip()
     
     try:
-        conexion = crear_conexion()
-        if conexion:
-            cursor = conexion.cursor()
-            
-            if categoria and query:
-                sql = "SELECT * FROM fichas WHERE categoria = %s AND (problema LIKE %s OR palabras_clave LIKE %s)"
-                cursor.execute(sql, (categoria, f'%{query}%', f'%{query}%'))
-            elif categoria:
-                sql = "SELECT * FROM fichas WHERE categoria = %s"
-                cursor.execute(sql, (categoria,))
-            elif query:
-                sql = "SELECT * FROM fichas WHERE problema LIKE %s OR palabras_clave LIKE %s"
-                cursor.execute(sql, (f'%{query}%', f'%{query}%'))
-            else:
-                cursor.execute("SELECT * FROM fichas ORDER BY fecha_actualizacion DESC")
-            
-            fichas_data = cursor.fetchall()
-            
-            # Convertir tuplas a diccionarios
-            for ficha in fichas_data:
-                ficha_dict = {
-                    'id': ficha[0],
-                    'categoria': ficha[1],
-                    'problema': ficha[2],
-                    'descripcion': ficha[3],
-                    'causas': ficha[4],
-                    'solucion': ficha[5],
-                    'palabras_clave': ficha[6],
-                    'fecha_creacion': ficha[7],
-                    'fecha_actualizacion': ficha[8]
-                }
-                fichas.append(ficha_dict)
+        snapshot = obtener_snapshot()
+        if snapshot is not None and modo != 'aproximado':
+            # Búsqueda exacta servida desde el snapshot en memoria
+            fichas = snapshot.buscar(texto, categoria)
+        
+        if snapshot is None or (texto and not fichas):
+            with conexion_db() as conexion:
+                if conexion:
+                    with conexion.cursor() as cursor:
+                        repositorio = RepositorioFichas(cursor)
+                        # Búsqueda de texto completo (índice GIN sobre fichas.busqueda)
+                        if snapshot is None and modo != 'aproximado':
+                            fichas = repositorio.buscar(texto, categoria)
+                
+                        # Sin resultados exactos: intentar con trigramas y sugerir una corrección
+                        if texto and not fichas:
+                            fichas = repositorio.buscar_aproximado(query, categoria)
+                            aproximado = True
+                            sugerencia = sugerir_consulta(cursor, query)
                 
     except Exception as e:
         flash('Error en la búsqueda', 'error')
-        print(f"Error en buscar: {e}")
-    finally:
-        if cursor is not None:
-            cursor.close()
-        if conexion is not None:
-            conexion.close()
+        logger.exception("Error en buscar")
     
-    return render_template('buscar.html', fichas=fichas, query=query, categoria=categoria)
+    return render_template('buscar.html', fichas=fichas, query=query, categoria=categoria,
+                           modo=modo, aproximado=aproximado, sugerencia=sugerencia)
+
+# API de búsqueda incremental (mientras el asesor escribe)
+@app.route('/api/buscar')
+@login_required
+def api_buscar():
+    if not current_user.puede('ver_fichas'):
+        return jsonify({'error': 'No autorizado'}), 403
+    
+    query = request.args.get('q', '')
+    categoria = request.args.get('categoria', '')
+    texto, categoria = clave_busqueda(query, categoria)
+    if not texto:
+        return jsonify([])
+    
+    # La versión del snapshot en la clave descarta resultados de antes de un cambio en otro worker
+    snapshot = obtener_snapshot()
+    clave = (snapshot.version if snapshot is not None else None, texto, categoria)
+    
+    resultados = cache_busqueda.obtener(clave)
+    if resultados is None:
+        try:
+            resultados = []
+            if snapshot is not None:
+                resultados = [
+                    resumen_ficha(f.id, f.categoria, f.problema, f.descripcion)
+                    for f in snapshot.buscar(query, categoria, LIMITE_SUGERENCIAS)
+                ]
+            if not resultados:
+                with conexion_db() as conexion:
+                    if not conexion:
+                        return jsonify({'error': 'Error de conexión a la base de datos'}), 503
+                    with conexion.cursor() as cursor:
+                        resultados = buscar_resumenes(cursor, query, categoria, exacta=snapshot is None)
+        except Exception as e:
+            logger.exception("Error en api_buscar")
+            return jsonify({'error': 'Error en la búsqueda'}), 500
+        
+        for resultado in resultados:
+            resultado['url'] = url_for('ver_ficha', id=resultado['id'])
+        cache_busqueda.guardar(clave, resultados)
+    
+    return jsonify(resultados)
 
 @app.route('/ficha/<int:id>')
 @login_required
+@condicional(version_ficha)
 def ver_ficha(id):
     if not current_user.puede('ver_fichas'):
         flash('No tienes permisos para ver las fichas', 'error')
         return redirect(url_for('index'))
     
-    cursor = None
-    conexion = None
-    ficha = None
+    fragmento = None
     
     try:
-        conexion = crear_conexion()
-        if conexion:
-            cursor = conexion.cursor()
-            cursor.execute("SELECT * FROM fichas WHERE id = %s", (id,))
-            ficha_data = cursor.fetchone()
-            
-            if ficha_data:
-                ficha = {
-                    'id': ficha_data[0],
-                    'categoria': ficha_data[1],
-                    'problema': ficha_data[2],
-                    'descripcion': ficha_data[3],
-                    'causas': ficha_data[4],
-                    'solucion': ficha_data[5],
-                    'palabras_clave': ficha_data[6],
-                    'fecha_creacion': ficha_data[7],
-                    'fecha_actualizacion': ficha_data[8]
-                }
-                
+        fragmento = fragmento_ficha(id)
     except Exception as e:
         flash('Error al cargar la ficha', 'error')
-        print(f"Error en ver_ficha: {e}")
-    finally:
-        if cursor is not None:
-            cursor.close()
-        if conexion is not None:
-            conexion.close()
+        logger.exception("Error en ver_ficha")
     
-    if not ficha:
+    if not fragmento:
         flash('Ficha no encontrada', 'error')
         return redirect(url_for('index'))
     
-    return render_template('ver_ficha.html', ficha=ficha)
+    return render_template('ver_ficha.html', titulo=fragmento['titulo'], contenido=fragmento['html'])
+
+def obtener_catalogo():
+    """Catálogo de problemas de la versión actual de las fichas (None si no hay BD ni snapshot)"""
+    snapshot = obtener_snapshot()
+    if snapshot is not None:
+        return snapshot.catalogo
+    version = version_fichas()
+    if version is None:
+        return None
+    catalogo = cache_catalogo.obtener(version)
+    if catalogo is None:
+        with conexion_db() as conexion:
+            if not conexion:
+                return None
+            with conexion.cursor() as cursor:
+                catalogo = consultar_catalogo(cursor)
+        cache_catalogo.guardar(version, catalogo)
+    return catalogo
+
+def responder_catalogo(categoria):
+    try:
+        catalogo = obtener_catalogo()
+    except Exception as e:
+        logger.exception("Error cargando el catálogo de problemas")
+        catalogo = None
+    if catalogo is None:
+        return jsonify({'error': 'Error de conexión a la base de datos'}), 503
+
+    cuerpo, etag = catalogo.json(categoria)
+    respuesta = Response(cuerpo, mimetype='application/json')
+    respuesta.set_etag(etag)
+    # El navegador lo guarda y revalida cada vez: si no cambió, 304 sin cuerpo
+    respuesta.cache_control.private = True
+    respuesta.cache_control.no_cache = True
+    return respuesta.make_conditional(request)
+
+# API con las categorías que tienen fichas (y cuántas)
+@app.route('/api/problemas')
+@login_required
+def catalogo_problemas():
+    return responder_catalogo(None)
 
-# API para obtener problemas por categoría
+# API para obtener problemas por categoría (con cantidad de fichas y causas sugeridas)
 @app.route('/api/problemas/<categoria>')
 @login_required
 def obtener_problemas(categoria):
-    problemas_por_categoria = {
-        'TV': [
-            'No hay señal en el televisor',
-            'Imagen pixelada o con interferencias',
-            'Sin sonido en algunos canales',
-            'Problemas con la guía de programación',
-            'Otro problema con TV'
-        ],
-        'Internet': [
-            'Internet lento o intermitente',
-            'Sin conexión a internet',
-            'Problemas con WiFi',
-            'No puedo conectarme a sitios específicos',
-            'Velocidad inferior a la contratada',
-            'Problemas con el módem/router',
-            'Otro problema con Internet'
-        ],
-        'Equipo': [
-            'Equipo no enciende',
-            'Problemas con puertos HDMI/USB',
-            'Dispositivo no da MAC',
-            'Problemas niveles opticos',
-            'Otro problema con Equipo'
-        ]
-    }
-    
-    problemas = problemas_por_categoria.get(categoria, [])
-    return jsonify(problemas)
+    return responder_catalogo(categoria)
+
+# API con métricas del pool de conexiones (solo admin)
+@app.route('/api/estado/pool')
+@login_required
+def estado_pool():
+    if current_user.rol != 'admin':
+        return jsonify({'error': 'No autorizado'}), 403
+    return jsonify(estadisticas_pool())
+
+# Importación masiva de fichas (CSV, JSONL o volcado MySQL) en un multipart con el campo "archivo"
+@app.route('/api/fichas/importar', methods=['POST'])
+@login_required
+def importar_fichas_api():
+    if current_user.rol != 'admin':
+        return jsonify({'error': 'No autorizado'}), 403
+
+    archivo = request.files.get('archivo')
+    if not archivo:
+        return jsonify({'error': 'Falta el archivo'}), 400
+    formato = request.form.get('formato') or detectar_formato(archivo.filename)
+    if formato not in LECTORES:
+        return jsonify({'error': 'Formato no soportado (csv, jsonl o mysql)'}), 400
+
+    try:
+        with conexion_db() as conexion:
+            if not conexion:
+                return jsonify({'error': 'Error de conexión a la base de datos'}), 503
+            flujo = io.TextIOWrapper(archivo.stream, encoding='utf-8-sig', newline='')
+            resumen = importar_fichas(conexion, LECTORES[formato](flujo))
+    except Exception as e:
+        logger.exception("Error en importar_fichas_api")
+        return jsonify({'error': f'Error al importar: {str(e)}'}), 500
+
+    if resumen['insertadas'] or resumen['actualizadas']:
+        fichas_modificadas()
+        cache_fragmentos.limpiar()
+    return jsonify(resumen)
+
+# Exportación de todas las fichas; se envía por partes mientras se leen de la BD
+@app.route('/api/fichas/exportar')
+@login_required
+def exportar_fichas_api():
+    if current_user.rol != 'admin':
+        return jsonify({'error': 'No autorizado'}), 403
+
+    formato = request.args.get('formato', 'csv')
+    if formato not in ('csv', 'jsonl'):
+        return jsonify({'error': 'Formato no soportado (csv o jsonl)'}), 400
+
+    def generar():
+        # La conexión queda prestada mientras dure la descarga y vuelve al pool al terminar o cortarse
+        with conexion_db() as conexion:
+            if not conexion:
+                return
+            yield ''
+            yield from exportar_fichas(conexion, formato)
+
+    flujo = generar()
+    # El primer next() obtiene la conexión: si falla se puede responder 503 antes de enviar cabeceras
+    if next(flujo, None) is None:
+        return jsonify({'error': 'Error de conexión a la base de datos'}), 503
+
+    return Response(flujo, mimetype='text/csv' if formato == 'csv' else 'application/x-ndjson',
+                    headers={'Content-Disposition': f'attachment; filename=fichas.{formato}'})
 
 if __name__ == '__main__':
+    # Solo para desarrollo local; en producción start.sh arranca gunicorn (gunicorn.conf.py)
     with app.app_context():
-        print("🚀 Iniciando aplicación Flask...")
-        crear_tablas()
+        logger.info("Iniciando aplicación Flask (servidor de desarrollo)")
+        migrar()
     app.run(host='0.0.0.0', port=5000, debug=True)
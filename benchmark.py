@@ -0,0 +1,434 @@
+# Benchmark de carga: siembra una PostgreSQL de pruebas con fichas y usuarios, genera tráfico
+# autenticado sobre index, buscar, ver_ficha, /api/problemas y login, y reporta p50/p95/p99,
+# peticiones por segundo y consultas SQL por petición (leídas de la cabecera Server-Timing).
+#
+#   BENCH_DATABASE_URL=postgresql://localhost/soporte_bench python benchmark.py --fichas 2000 --usuarios 50
+#   python benchmark.py --temporal                 # PostgreSQL desechable con initdb/pg_ctl, sin contenedor
+#   python benchmark.py --url http://localhost:5000 --sin-sembrar   # contra un gunicorn ya levantado
+#   python benchmark.py --json actual.json --comparar base.json     # en CI: sale con 1 si algo empeoró
+#
+# Nunca usa DATABASE_URL: la base de benchmark se vacía y se vuelve a sembrar.
+import argparse
+import json
+import logging
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.cookiejar import CookieJar
+
+import bitacora
+
+logger = logging.getLogger(__name__)
+# LOG_LEVEL=WARNING acalla a la app durante la medición; el resumen del benchmark se informa igual
+logger.setLevel(logging.INFO)
+
+MEZCLA_POR_DEFECTO = 'index=30,buscar=20,ver_ficha=30,api_problemas=15,login=5'
+PASSWORD_BENCH = 'benchmark'
+
+# Material para fichas sintéticas (mismas categorías que la app)
+PROBLEMAS = {
+    'TV': ['No hay señal en el televisor', 'Imagen pixelada o con interferencias',
+           'Sin sonido en algunos canales', 'Problemas con la guía de programación'],
+    'Internet': ['Internet lento o intermitente', 'Sin conexión a internet', 'Problemas con WiFi',
+                 'Velocidad inferior a la contratada', 'Problemas con el módem/router'],
+    'Equipo': ['Equipo no enciende', 'Problemas con puertos HDMI/USB', 'Dispositivo no da MAC',
+               'Problemas niveles opticos']
+}
+CAUSAS = ['Micronodo/CATV alarmado', 'Decodificador desprogramado', 'Cable de señal dañado',
+          'Congestión de la red', 'Interferencia WiFi', 'Potencias mayores a -27', 'ONU desconfigurada',
+          'patchcord desconectado', 'VLAN incorrecta', 'Cargador del modem desconectado']
+PASOS = ['Reiniciar el equipo', 'Validar potencias en el OLT', 'Verificar luces del módem',
+         'Reprogramar el decodificador', 'Cambiar el canal WiFi', 'Revisar el cableado coaxial',
+         'Confirmar la MAC en el sistema', 'Generar orden de servicio en Softv']
+PALABRAS = ['señal', 'router', 'módem', 'fibra', 'decodificador', 'wifi', 'canales', 'potencia',
+            'intermitente', 'lento', 'pixelada', 'cable', 'puerto', 'optico', 'reinicio', 'antena']
+
+# ------------------------------------------------------------------ PostgreSQL desechable
+
+class PostgresTemporal:
+    """Cluster de PostgreSQL en un directorio temporal (initdb + pg_ctl), escuchando solo en un socket Unix"""
+
+    def __init__(self, bin_dir=None):
+        self.bin_dir = bin_dir or self._buscar_bin()
+        self.directorio = None
+
+    @staticmethod
+    def _buscar_bin():
+        if shutil.which('pg_ctl'):
+            return os.path.dirname(shutil.which('pg_ctl'))
+        try:
+            return subprocess.check_output(['pg_config', '--bindir'], text=True).strip()
+        except (OSError, subprocess.CalledProcessError):
+            raise SystemExit("No se encontró pg_ctl: instala PostgreSQL o usa --bin-postgres")
+
+    def _ejecutar(self, programa, *argumentos):
+        subprocess.run([os.path.join(self.bin_dir, programa), *argumentos], check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+    def iniciar(self):
+        self.directorio = tempfile.mkdtemp(prefix='bench-pg-')
+        datos = os.path.join(self.directorio, 'datos')
+        self._ejecutar('initdb', '-D', datos, '-U', 'postgres', '-A', 'trust', '-E', 'UTF8')
+        self._ejecutar('pg_ctl', '-D', datos, '-w', '-l', os.path.join(self.directorio, 'postgres.log'),
+                       '-o', f"-k {self.directorio} -c listen_addresses='' -c fsync=off", 'start')
+        return f'postgresql://postgres@/postgres?host={self.directorio}'
+
+    def detener(self):
+        if self.directorio:
+            try:
+                self._ejecutar('pg_ctl', '-D', os.path.join(self.directorio, 'datos'), '-m', 'fast', 'stop')
+            finally:
+                shutil.rmtree(self.directorio, ignore_errors=True)
+                self.directorio = None
+
+# ------------------------------------------------------------------ siembra
+
+def generar_fichas(cantidad, rng):
+    """Registros en el formato de importacion.importar_fichas"""
+    for numero in range(cantidad):
+        categoria = rng.choice(list(PROBLEMAS))
+        yield {
+            'categoria': categoria,
+            'problema': rng.choice(PROBLEMAS[categoria]),
+            'descripcion': f"Caso {numero}: " + ' '.join(rng.choices(PALABRAS, k=12)),
+            'causas': rng.sample(CAUSAS, rng.randint(1, 4)),
+            'solucion': rng.sample(PASOS, rng.randint(2, 6)),
+            'palabras_clave': ', '.join(rng.sample(PALABRAS, 3))
+        }
+
+def sembrar(cantidad_fichas, cantidad_usuarios, rng):
+    """Aplica migraciones y deja exactamente cantidad_fichas fichas y los usuarios bench_*"""
+    from werkzeug.security import generate_password_hash
+    from database import crear_conexion
+    from importacion import importar_fichas
+    from migrar import aplicar_migraciones
+
+    conexion = crear_conexion()
+    if conexion is None:
+        raise SystemExit("No se pudo conectar a la base de benchmark")
+    try:
+        aplicar_migraciones(conexion)
+        with conexion.cursor() as cursor:
+            cursor.execute("SET statement_timeout = 0")
+            cursor.execute("TRUNCATE fichas RESTART IDENTITY CASCADE")
+            cursor.execute("DELETE FROM usuarios WHERE usuario LIKE 'bench\\_%%'")
+            # Un solo hash para todos: el costo de verificarlo en /login es el mismo
+            hash_password = generate_password_hash(PASSWORD_BENCH)
+            permisos = json.dumps({'ver_fichas': True, 'cambiar_password': True})
+            cursor.executemany(
+                "INSERT INTO usuarios (usuario, password, rol, permisos) VALUES (%s, %s, %s, %s)",
+                [('bench_admin', hash_password, 'admin', None)] +
+                [(f'bench_{numero:04d}', hash_password, 'asesor', permisos) for numero in range(cantidad_usuarios)]
+            )
+        conexion.commit()
+        resumen = importar_fichas(conexion, generar_fichas(cantidad_fichas, rng))
+        with conexion.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        conexion.commit()
+    finally:
+        conexion.close()
+    logger.info("Base de benchmark sembrada", extra={
+        'fichas': resumen['insertadas'], 'usuarios': cantidad_usuarios + 1, 'segundos': resumen['segundos']
+    })
+
+def datos_de_trafico():
+    """Ids de fichas, categorías y usuarios para armar las peticiones"""
+    from database import crear_conexion
+    conexion = crear_conexion()
+    try:
+        with conexion.cursor() as cursor:
+            cursor.execute("SELECT id FROM fichas")
+            ids = [fila[0] for fila in cursor.fetchall()]
+            cursor.execute("SELECT DISTINCT categoria FROM fichas")
+            categorias = [fila[0] for fila in cursor.fetchall()]
+            cursor.execute("SELECT usuario FROM usuarios WHERE usuario LIKE 'bench\\_%%' ORDER BY usuario")
+            usuarios = [fila[0] for fila in cursor.fetchall()]
+    finally:
+        conexion.close()
+    if not ids or not usuarios:
+        raise SystemExit("La base no tiene fichas ni usuarios bench_*: ejecuta sin --sin-sembrar")
+    return ids, categorias, usuarios
+
+# ------------------------------------------------------------------ clientes
+
+class ClienteLocal:
+    """Peticiones contra la app en el mismo proceso (cliente de pruebas de Flask, sin red)"""
+
+    def __init__(self, app):
+        self._cliente = app.test_client()
+
+    def get(self, ruta):
+        respuesta = self._cliente.get(ruta)
+        return respuesta.status_code, respuesta.headers.get('Server-Timing', '')
+
+    def post(self, ruta, datos):
+        respuesta = self._cliente.post(ruta, data=datos)
+        return respuesta.status_code, respuesta.headers.get('Server-Timing', '')
+
+class _SinRedirecciones(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *argumentos, **extra):
+        return None
+
+class ClienteHTTP:
+    """Peticiones HTTP reales contra un servidor ya levantado (p.ej. gunicorn), con cookies de sesión"""
+
+    def __init__(self, base):
+        self.base = base.rstrip('/')
+        self._abridor = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(CookieJar()), _SinRedirecciones()
+        )
+
+    def _pedir(self, peticion):
+        try:
+            with self._abridor.open(peticion, timeout=30) as respuesta:
+                respuesta.read()
+                return respuesta.status, respuesta.headers.get('Server-Timing', '')
+        except urllib.error.HTTPError as err:
+            # Con las redirecciones desactivadas, un 302 llega como HTTPError
+            return err.code, err.headers.get('Server-Timing', '')
+
+    def get(self, ruta):
+        return self._pedir(urllib.request.Request(self.base + ruta))
+
+    def post(self, ruta, datos):
+        cuerpo = urllib.parse.urlencode(datos).encode('utf-8')
+        return self._pedir(urllib.request.Request(self.base + ruta, data=cuerpo))
+
+# ------------------------------------------------------------------ tráfico
+
+_CONSULTAS = re.compile(r'desc="(\d+) consultas"')
+
+def _consultas(server_timing):
+    coincidencia = _CONSULTAS.search(server_timing or '')
+    return int(coincidencia.group(1)) if coincidencia else None
+
+def leer_mezcla(texto):
+    """'index=30,buscar=20' -> ([rutas], [pesos])"""
+    rutas, pesos = [], []
+    for parte in texto.split(','):
+        ruta, _, peso = parte.partition('=')
+        if ruta.strip() not in ACCIONES:
+            raise SystemExit(f"Ruta desconocida en --mezcla: {ruta!r} (opciones: {', '.join(ACCIONES)})")
+        rutas.append(ruta.strip())
+        pesos.append(float(peso or 1))
+    return rutas, pesos
+
+def _index(sesion, datos, rng):
+    return sesion['cliente'].get('/')
+
+def _buscar(sesion, datos, rng):
+    return sesion['cliente'].get('/buscar?' + urllib.parse.urlencode({'q': rng.choice(PALABRAS)}))
+
+def _ver_ficha(sesion, datos, rng):
+    return sesion['cliente'].get(f"/ficha/{rng.choice(datos['ids'])}")
+
+def _api_problemas(sesion, datos, rng):
+    return sesion['cliente'].get('/api/problemas/' + urllib.parse.quote(rng.choice(datos['categorias'])))
+
+def _login(sesion, datos, rng):
+    # Cliente nuevo: se mide el inicio de sesión completo, no la redirección de un usuario ya autenticado
+    return sesion['nuevo_cliente']().post('/login', {'usuario': sesion['usuario'], 'password': PASSWORD_BENCH})
+
+ACCIONES = {
+    'index': _index,
+    'buscar': _buscar,
+    'ver_ficha': _ver_ficha,
+    'api_problemas': _api_problemas,
+    'login': _login
+}
+
+def _trabajador(nuevo_cliente, usuario, datos, rutas, pesos, semilla, calentamiento, fin, resultados, bloqueo):
+    rng = random.Random(semilla)
+    cliente = nuevo_cliente()
+    estado, _ = cliente.post('/login', {'usuario': usuario, 'password': PASSWORD_BENCH})
+    if estado not in (200, 302):
+        raise RuntimeError(f"No se pudo iniciar sesión como {usuario} (HTTP {estado})")
+    sesion = {'cliente': cliente, 'nuevo_cliente': nuevo_cliente, 'usuario': usuario}
+
+    propias = []
+    realizadas = 0
+    while not fin(realizadas):
+        ruta = rng.choices(rutas, pesos)[0]
+        inicio = time.perf_counter()
+        estado, server_timing = ACCIONES[ruta](sesion, datos, rng)
+        duracion = time.perf_counter() - inicio
+        realizadas += 1
+        if realizadas > calentamiento:
+            propias.append((ruta, duracion, _consultas(server_timing), estado))
+    with bloqueo:
+        resultados.extend(propias)
+
+def ejecutar_trafico(nuevo_cliente, datos, rutas, pesos, concurrencia, peticiones, duracion, calentamiento, semilla):
+    """Lanza los hilos y devuelve ([(ruta, segundos, consultas, estado)], segundos de reloj)"""
+    resultados = []
+    bloqueo = threading.Lock()
+    limite_tiempo = [None]
+
+    def fin(realizadas):
+        if duracion:
+            return limite_tiempo[0] is not None and time.monotonic() >= limite_tiempo[0]
+        return realizadas >= calentamiento + peticiones // concurrencia
+
+    hilos = [
+        threading.Thread(target=_trabajador, name=f'bench-{numero}', args=(
+            nuevo_cliente, datos['usuarios'][numero % len(datos['usuarios'])], datos, rutas, pesos,
+            semilla + numero, calentamiento, fin, resultados, bloqueo
+        ))
+        for numero in range(concurrencia)
+    ]
+    inicio = time.monotonic()
+    if duracion:
+        limite_tiempo[0] = inicio + duracion
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    return resultados, time.monotonic() - inicio
+
+# ------------------------------------------------------------------ reporte
+
+def _percentil(ordenados, porcentaje):
+    if not ordenados:
+        return 0.0
+    posicion = max(0, min(len(ordenados) - 1, int(round(porcentaje / 100 * len(ordenados) + 0.5)) - 1))
+    return ordenados[posicion]
+
+def resumir(resultados, segundos):
+    """Estadísticas por ruta y totales (latencias en milisegundos)"""
+    por_ruta = {}
+    for ruta, duracion, consultas, estado in resultados:
+        por_ruta.setdefault(ruta, []).append((duracion, consultas, estado))
+    por_ruta['total'] = [(duracion, consultas, estado) for _, duracion, consultas, estado in resultados]
+
+    resumen = {}
+    for ruta, muestras in por_ruta.items():
+        latencias = sorted(duracion * 1000 for duracion, _, _ in muestras)
+        consultas = [c for _, c, _ in muestras if c is not None]
+        resumen[ruta] = {
+            'peticiones': len(muestras),
+            'por_segundo': round(len(muestras) / segundos, 1) if segundos else 0.0,
+            'p50_ms': round(_percentil(latencias, 50), 2),
+            'p95_ms': round(_percentil(latencias, 95), 2),
+            'p99_ms': round(_percentil(latencias, 99), 2),
+            'consultas_por_peticion': round(sum(consultas) / len(consultas), 2) if consultas else None,
+            'errores': sum(1 for _, _, estado in muestras if estado >= 400)
+        }
+    return resumen
+
+def informar(resumen):
+    """Una línea de log por ruta (la de 'total' al final) con los campos de resumir()"""
+    for ruta in sorted(resumen, key=lambda r: (r == 'total', r)):
+        logger.info("Resultado del benchmark", extra={'ruta': ruta, **resumen[ruta]})
+
+def comparar(resumen, base, tolerancia, holgura_ms=2.0):
+    """Regresiones frente a un resultado anterior: p95 más lento que la tolerancia o más consultas"""
+    problemas = []
+    for ruta, datos in resumen.items():
+        anterior = base.get(ruta)
+        if not anterior:
+            continue
+        limite = anterior['p95_ms'] * (1 + tolerancia) + holgura_ms
+        if datos['p95_ms'] > limite:
+            problemas.append(f"{ruta}: p95 {datos['p95_ms']} ms > {limite:.2f} ms (base {anterior['p95_ms']} ms)")
+        if (datos['consultas_por_peticion'] is not None and anterior.get('consultas_por_peticion') is not None
+                and datos['consultas_por_peticion'] > anterior['consultas_por_peticion'] + 0.5):
+            problemas.append(f"{ruta}: {datos['consultas_por_peticion']} consultas/petición "
+                             f"(base {anterior['consultas_por_peticion']})")
+        if datos['errores']:
+            problemas.append(f"{ruta}: {datos['errores']} respuestas con error (4xx/5xx)")
+    return problemas
+
+# ------------------------------------------------------------------ CLI
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de carga de la app de soporte técnico")
+    origen = parser.add_mutually_exclusive_group()
+    origen.add_argument('--db', default=os.getenv('BENCH_DATABASE_URL'),
+                        help="URL de una base dedicada al benchmark (o BENCH_DATABASE_URL)")
+    origen.add_argument('--temporal', action='store_true', help="Crea un PostgreSQL desechable con initdb/pg_ctl")
+    parser.add_argument('--bin-postgres', help="Carpeta con initdb y pg_ctl (por defecto, los del PATH)")
+    parser.add_argument('--url', help="Medir un servidor ya levantado en vez de la app en este proceso")
+    parser.add_argument('--fichas', type=int, default=1000)
+    parser.add_argument('--usuarios', type=int, default=20)
+    parser.add_argument('--sin-sembrar', action='store_true', help="Usar los datos que ya tiene la base")
+    parser.add_argument('--mezcla', default=MEZCLA_POR_DEFECTO, help=f"Pesos por ruta ({MEZCLA_POR_DEFECTO})")
+    parser.add_argument('--concurrencia', type=int, default=4)
+    parser.add_argument('--peticiones', type=int, default=2000, help="Total a medir (sin contar el calentamiento)")
+    parser.add_argument('--duracion', type=float, help="Segundos de medición (en lugar de --peticiones)")
+    parser.add_argument('--calentamiento', type=int, default=20, help="Peticiones por hilo que no se miden")
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--json', help="Escribir el resultado en este archivo")
+    parser.add_argument('--comparar', help="Resultado JSON anterior: sale con 1 si hay regresiones")
+    parser.add_argument('--tolerancia', type=float, default=0.25, help="Aumento de p95 admitido al comparar")
+    argumentos = parser.parse_args()
+
+    rutas, pesos = leer_mezcla(argumentos.mezcla)
+    servidor = PostgresTemporal(argumentos.bin_postgres) if argumentos.temporal else None
+    if servidor is None and not argumentos.db:
+        parser.error("Indica --db (o BENCH_DATABASE_URL) o --temporal; nunca se usa DATABASE_URL")
+
+    try:
+        url_db = servidor.iniciar() if servidor else argumentos.db
+        # La app y los módulos de BD leen DATABASE_URL al conectar
+        os.environ['DATABASE_URL'] = url_db
+        os.environ.setdefault('LOG_LEVEL', 'WARNING')
+        bitacora.configurar()
+
+        rng = random.Random(argumentos.semilla)
+        if not argumentos.sin_sembrar:
+            sembrar(argumentos.fichas, argumentos.usuarios, rng)
+        ids, categorias, usuarios = datos_de_trafico()
+        datos = {'ids': ids, 'categorias': categorias, 'usuarios': usuarios}
+
+        if argumentos.url:
+            nuevo_cliente = lambda: ClienteHTTP(argumentos.url)
+        else:
+            from app import app
+            nuevo_cliente = lambda: ClienteLocal(app)
+
+        logger.info("Midiendo tráfico", extra={'concurrencia': argumentos.concurrencia, 'mezcla': argumentos.mezcla})
+        resultados, segundos = ejecutar_trafico(
+            nuevo_cliente, datos, rutas, pesos, argumentos.concurrencia, argumentos.peticiones,
+            argumentos.duracion, argumentos.calentamiento, argumentos.semilla
+        )
+    finally:
+        if servidor:
+            servidor.detener()
+
+    resumen = resumir(resultados, segundos)
+    informar(resumen)
+
+    if argumentos.json:
+        with open(argumentos.json, 'w', encoding='utf-8') as salida:
+            json.dump({
+                'configuracion': {
+                    'fichas': len(ids), 'usuarios': len(usuarios), 'mezcla': argumentos.mezcla,
+                    'concurrencia': argumentos.concurrencia, 'modo': 'http' if argumentos.url else 'local'
+                },
+                'rutas': resumen
+            }, salida, ensure_ascii=False, indent=2)
+
+    if argumentos.comparar:
+        with open(argumentos.comparar, encoding='utf-8') as entrada:
+            base = json.load(entrada)['rutas']
+        problemas = comparar(resumen, base, argumentos.tolerancia)
+        for problema in problemas:
+            logger.error("Regresión frente a la base", extra={'problema': problema, 'base': argumentos.comparar})
+        if problemas:
+            bitacora.detener()
+            sys.exit(1)
+        logger.info("Sin regresiones frente a la base", extra={'base': argumentos.comparar})
+
+    bitacora.detener()
+
+if __name__ == '__main__':
+    main()
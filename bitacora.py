@@ -0,0 +1,148 @@
+# Logging estructurado (JSON, una línea por registro) con escritura fuera del hilo de la petición.
+#
+# Los handlers solo encolan el registro (QueueHandler); un QueueListener por proceso lo
+# formatea y lo escribe en stdout. LOG_LEVEL controla el nivel (INFO por defecto) y
+# LOG_MUESTREO cuántos registros marcados con extra={'muestreo': True} se agrupan en uno.
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import uuid
+from datetime import datetime, timezone
+
+# Atributos estándar de LogRecord: lo demás que venga en extra= se incluye en el JSON
+_ATRIBUTOS_RECORD = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'request_id', 'muestreo'}
+
+class FormatoJSON(logging.Formatter):
+    """Un objeto JSON por línea: ts, nivel, logger, msg, request_id y los campos de extra="""
+
+    def format(self, record):
+        datos = {
+            'ts': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec='milliseconds'),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+            'pid': record.process
+        }
+        if getattr(record, 'request_id', None):
+            datos['request_id'] = record.request_id
+        for clave, valor in vars(record).items():
+            if clave not in _ATRIBUTOS_RECORD and not clave.startswith('_'):
+                datos[clave] = valor
+        if record.exc_text:
+            datos['excepcion'] = record.exc_text
+        return json.dumps(datos, ensure_ascii=False, default=str)
+
+class FiltroPeticion(logging.Filter):
+    """Agrega el id de la petición en curso (se ejecuta en el hilo de la petición, antes de encolar)"""
+
+    def filter(self, record):
+        if not hasattr(record, 'request_id'):
+            record.request_id = id_peticion()
+        return True
+
+class FiltroMuestreo(logging.Filter):
+    """Deja pasar 1 de cada N registros marcados con muestreo (p.ej. cada conexión exitosa)"""
+
+    def __init__(self, cada):
+        super().__init__()
+        self.cada = max(1, cada)
+        self._contadores = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if not getattr(record, 'muestreo', False) or self.cada == 1:
+            return True
+        clave = (record.name, record.msg)
+        with self._lock:
+            cuenta = self._contadores.get(clave, 0) + 1
+            self._contadores[clave] = cuenta
+        if cuenta % self.cada != 1:
+            return False
+        record.muestreo_cada = self.cada
+        return True
+
+class ManejadorCola(logging.handlers.QueueHandler):
+    """QueueHandler que deja la excepción formateada aparte en vez de pegarla al mensaje"""
+
+    def prepare(self, record):
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        registro = logging.makeLogRecord(vars(record))
+        registro.msg = record.getMessage()
+        registro.args = None
+        registro.exc_info = None
+        return registro
+
+_cola = queue.SimpleQueue()
+_oyente = None
+_configurado = False
+
+def _iniciar_oyente():
+    global _oyente
+    salida = logging.StreamHandler(sys.stdout)
+    salida.setFormatter(FormatoJSON())
+    _oyente = logging.handlers.QueueListener(_cola, salida, respect_handler_level=False)
+    _oyente.start()
+
+def _reiniciar_tras_fork():
+    # El hilo del listener no existe en el proceso hijo (workers de gunicorn con preload_app)
+    global _cola
+    _cola = queue.SimpleQueue()
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, ManejadorCola):
+            handler.queue = _cola
+    _iniciar_oyente()
+
+def detener():
+    """Vacía la cola antes de terminar el proceso"""
+    global _oyente
+    if _oyente is not None:
+        _oyente.stop()
+        _oyente = None
+
+def configurar():
+    """Instala el logging estructurado en el logger raíz (una vez por proceso)"""
+    global _configurado
+    if _configurado:
+        return
+    _configurado = True
+
+    manejador = ManejadorCola(_cola)
+    manejador.addFilter(FiltroPeticion())
+    manejador.addFilter(FiltroMuestreo(int(os.getenv('LOG_MUESTREO', '100'))))
+
+    raiz = logging.getLogger()
+    raiz.handlers[:] = [manejador]
+    raiz.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+
+    _iniciar_oyente()
+    os.register_at_fork(after_in_child=_reiniciar_tras_fork)
+    atexit.register(detener)
+
+def id_peticion():
+    """Id de la petición actual (None fuera de una petición)"""
+    from flask import g, has_request_context
+    if has_request_context():
+        return g.get('request_id')
+    return None
+
+def registrar(app):
+    """Asigna un id a cada petición (o reutiliza X-Request-ID del proxy) y lo devuelve en la respuesta"""
+    from flask import g, request
+
+    configurar()
+
+    @app.before_request
+    def asignar_id_peticion():
+        g.request_id = request.headers.get('X-Request-ID', '')[:64] or uuid.uuid4().hex[:16]
+
+    @app.after_request
+    def devolver_id_peticion(respuesta):
+        if g.get('request_id'):
+            respuesta.headers['X-Request-ID'] = g.request_id
+        return respuesta
@@ -0,0 +1,165 @@
+import re
+import unicodedata
+
+# Máximo de fichas devueltas por una búsqueda
+LIMITE_RESULTADOS = 200
+
+# Máximo de sugerencias devueltas por /api/buscar
+LIMITE_SUGERENCIAS = 8
+
+# Largo del fragmento de descripción en las sugerencias
+LARGO_FRAGMENTO = 140
+
+# Similitud mínima (0-1) para que una ficha cuente como coincidencia aproximada
+UMBRAL_SIMILITUD = 0.4
+
+# Columnas de fichas_detalle en el orden que esperan las vistas (ficha[0]..ficha[8]); causas y solucion son listas
+COLUMNAS_FICHA = "id, categoria, problema, descripcion, causas, solucion, palabras_clave, fecha_creacion, fecha_actualizacion"
+
+def normalizar(texto):
+    """Minúsculas y sin acentos, igual que f_unaccent(lower(...)) en PostgreSQL"""
+    descompuesto = unicodedata.normalize('NFKD', (texto or '').lower())
+    return ''.join(c for c in descompuesto if not unicodedata.combining(c))
+
+def construir_tsquery(texto):
+    """Convierte el texto del usuario en una tsquery con prefijos: 'modem lent' -> 'modem:* & lent:*'"""
+    palabras = re.findall(r'\w+', texto or '')
+    if not palabras:
+        return None
+    return ' & '.join(f"{palabra}:*" for palabra in palabras)
+
+def buscar_fichas(cursor, texto, categoria='', limite=LIMITE_RESULTADOS):
+    """Búsqueda de texto completo ordenada por relevancia, con filtro opcional de categoría"""
+    tsquery = construir_tsquery(texto)
+    condiciones = []
+    parametros = []
+
+    if categoria:
+        condiciones.append("categoria = %s")
+        parametros.append(categoria)
+
+    where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+
+    if tsquery:
+        # La ficha coincide por sus campos o por alguno de sus pasos: cada lado usa su índice GIN
+        # (idx_fichas_busqueda, idx_fichas_pasos_busqueda) y solo los ids encontrados se unen a fichas_detalle
+        sql = f"""
+            WITH consulta AS (
+                SELECT to_tsquery('spanish', f_unaccent(%s)) AS q
+            ), coincidencias AS (
+                SELECT f.id, ts_rank(f.busqueda, consulta.q) AS rango
+                FROM fichas f, consulta
+                WHERE f.busqueda @@ consulta.q
+                UNION ALL
+                SELECT p.ficha_id, ts_rank(p.busqueda, consulta.q)
+                FROM fichas_pasos p, consulta
+                WHERE p.busqueda @@ consulta.q
+            ), encontradas AS (
+                SELECT id, max(rango) AS rango
+                FROM coincidencias
+                GROUP BY id
+            ), mejores AS (
+                -- Ordenar y cortar antes de armar los pasos: solo las fichas devueltas leen fichas_pasos
+                SELECT encontradas.id, encontradas.rango, fichas.fecha_actualizacion AS fecha
+                FROM encontradas
+                JOIN fichas USING (id)
+                {where}
+                ORDER BY encontradas.rango DESC, fichas.fecha_actualizacion DESC
+                LIMIT %s
+            )
+            SELECT {COLUMNAS_FICHA}
+            FROM mejores
+            JOIN fichas_detalle USING (id)
+            ORDER BY mejores.rango DESC, mejores.fecha DESC
+        """
+        parametros = [tsquery] + parametros
+    else:
+        sql = f"""
+            SELECT {COLUMNAS_FICHA}
+            FROM fichas_detalle
+            {where}
+            ORDER BY fecha_actualizacion DESC
+            LIMIT %s
+        """
+
+    cursor.execute(sql, parametros + [limite])
+    return cursor.fetchall()
+
+def buscar_fichas_aproximado(cursor, texto, categoria='', limite=LIMITE_RESULTADOS):
+    """Búsqueda tolerante a errores: similitud de trigramas sobre problema y palabras clave"""
+    texto = (texto or '').strip()
+    if not texto:
+        return []
+
+    # El umbral aplica al operador <% para que el filtro use los índices GIN de trigramas
+    cursor.execute(
+        "SELECT set_config('pg_trgm.word_similarity_threshold', %s, true)",
+        (str(UMBRAL_SIMILITUD),)
+    )
+
+    filtro_categoria = "AND categoria = %(categoria)s" if categoria else ""
+    cursor.execute(f"""
+        WITH consulta AS (SELECT f_unaccent(lower(%(texto)s)) AS q)
+        SELECT {COLUMNAS_FICHA},
+               GREATEST(
+                   word_similarity(q, f_unaccent(lower(problema))),
+                   word_similarity(q, f_unaccent(lower(coalesce(palabras_clave, ''))))
+               ) AS similitud
+        FROM fichas_detalle, consulta
+        WHERE (q <%% f_unaccent(lower(problema))
+               OR q <%% f_unaccent(lower(coalesce(palabras_clave, ''))))
+        {filtro_categoria}
+        ORDER BY similitud DESC, fecha_actualizacion DESC
+        LIMIT %(limite)s
+    """, {'texto': texto, 'categoria': categoria, 'limite': limite})
+    return cursor.fetchall()
+
+def sugerir_consulta(cursor, texto):
+    """Devuelve la consulta corregida palabra por palabra ("¿quisiste decir?"), o None si no hay cambios"""
+    palabras = re.findall(r'\w+', normalizar(texto))[:8]
+    if not palabras:
+        return None
+
+    cursor.execute("""
+        SELECT original.palabra, sugerida.palabra
+        FROM unnest(%s::text[]) WITH ORDINALITY AS original(palabra, posicion)
+        LEFT JOIN LATERAL (
+            SELECT v.palabra
+            FROM fichas_vocabulario v
+            WHERE v.palabra %% original.palabra
+            ORDER BY similarity(v.palabra, original.palabra) DESC, v.frecuencia DESC
+            LIMIT 1
+        ) sugerida ON true
+        ORDER BY original.posicion
+    """, (palabras,))
+
+    corregidas = [
+        sugerida if sugerida and len(original) >= 3 else original
+        for original, sugerida in cursor.fetchall()
+    ]
+    sugerencia = ' '.join(corregidas)
+    return sugerencia if sugerencia != ' '.join(palabras) else None
+
+def clave_busqueda(texto, categoria=''):
+    """Clave de cache para una búsqueda: texto normalizado + categoría"""
+    return (' '.join(normalizar(texto).split()), categoria or '')
+
+def resumen_ficha(id, categoria, problema, descripcion):
+    """Versión compacta de una ficha para la búsqueda incremental"""
+    descripcion = descripcion or ''
+    fragmento = descripcion[:LARGO_FRAGMENTO]
+    if len(descripcion) > LARGO_FRAGMENTO:
+        fragmento = fragmento.rsplit(' ', 1)[0] + '...'
+    return {
+        'id': id,
+        'categoria': categoria,
+        'problema': problema,
+        'fragmento': fragmento
+    }
+
+def buscar_resumenes(cursor, texto, categoria='', exacta=True):
+    """Resultados compactos desde la BD: texto completo (si exacta) y luego trigramas"""
+    filas = buscar_fichas(cursor, texto, categoria, LIMITE_SUGERENCIAS) if exacta else []
+    if not filas and texto.strip():
+        filas = buscar_fichas_aproximado(cursor, texto, categoria, LIMITE_SUGERENCIAS)
+    return [resumen_ficha(*fila[:4]) for fila in filas]
@@ -0,0 +1,213 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+class CacheTTL:
+    """Cache LRU en memoria con expiración por tiempo (una instancia por worker)"""
+
+    def __init__(self, max_items=1000, ttl=60):
+        self.max_items = max_items
+        self.ttl = ttl
+        self._datos = OrderedDict()  # clave -> (expira_en, valor)
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, clave, por_defecto=None):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                self.fallos += 1
+                return por_defecto
+            expira_en, valor = entrada
+            if expira_en < time.monotonic():
+                del self._datos[clave]
+                self.fallos += 1
+                return por_defecto
+            self._datos.move_to_end(clave)
+            self.aciertos += 1
+            return valor
+
+    def guardar(self, clave, valor, ttl=None):
+        expira_en = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._datos[clave] = (expira_en, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_items:
+                self._datos.popitem(last=False)
+
+    def invalidar(self, clave):
+        with self._lock:
+            self._datos.pop(clave, None)
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'items': len(self._datos),
+                'max_items': self.max_items,
+                'ttl': self.ttl,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos
+            }
+
+
+class CacheFragmentos:
+    """LRU de HTML ya renderizado, acotado por bytes (una instancia por worker).
+
+    Las entradas se agrupan (p.ej. por ficha) para invalidar todas sus variantes de una vez.
+    """
+
+    def __init__(self, max_bytes=8 * 1024 * 1024, ttl=3600):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._datos = OrderedDict()  # (grupo, variante) -> (expira_en, tamaño, valor)
+        self._grupos = {}            # grupo -> {variante}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+
+    def _quitar(self, clave):
+        _, tamano, _ = self._datos.pop(clave)
+        self._bytes -= tamano
+        variantes = self._grupos.get(clave[0])
+        if variantes is not None:
+            variantes.discard(clave[1])
+            if not variantes:
+                del self._grupos[clave[0]]
+
+    def obtener(self, grupo, variante):
+        clave = (grupo, variante)
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None or entrada[0] < time.monotonic():
+                if entrada is not None:
+                    self._quitar(clave)
+                self.fallos += 1
+                return None
+            self._datos.move_to_end(clave)
+            self.aciertos += 1
+            return entrada[2]
+
+    def guardar(self, grupo, variante, valor):
+        """valor: dict serializable ({'titulo': ..., 'html': ...}); su tamaño cuenta por los textos"""
+        tamano = sum(len(texto.encode('utf-8')) for texto in valor.values())
+        if tamano > self.max_bytes:
+            return
+        clave = (grupo, variante)
+        with self._lock:
+            if clave in self._datos:
+                self._quitar(clave)
+            self._datos[clave] = (time.monotonic() + self.ttl, tamano, valor)
+            self._grupos.setdefault(grupo, set()).add(variante)
+            self._bytes += tamano
+            while self._bytes > self.max_bytes:
+                self._quitar(next(iter(self._datos)))
+                self.desalojos += 1
+
+    def invalidar_grupo(self, grupo):
+        with self._lock:
+            for variante in list(self._grupos.get(grupo, ())):
+                self._quitar((grupo, variante))
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+            self._grupos.clear()
+            self._bytes = 0
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'backend': 'memoria',
+                'items': len(self._datos),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'desalojos': self.desalojos
+            }
+
+class CacheFragmentosRedis:
+    """Misma interfaz que CacheFragmentos pero compartida entre workers en Redis (o un servidor compatible).
+
+    Cada grupo es un hash con una entrada por variante; el desalojo LRU lo hace el servidor
+    (maxmemory-policy allkeys-lru). Si Redis no responde se comporta como un fallo de cache.
+    """
+
+    def __init__(self, url, ttl=3600, prefijo='fragmentos'):
+        import redis
+        self.ttl = ttl
+        self.prefijo = prefijo
+        self._cliente = redis.Redis.from_url(url, socket_timeout=0.25, socket_connect_timeout=0.25)
+        self.aciertos = 0
+        self.fallos = 0
+        self.errores = 0
+
+    def _clave(self, grupo):
+        return f'{self.prefijo}:{grupo}'
+
+    def obtener(self, grupo, variante):
+        try:
+            crudo = self._cliente.hget(self._clave(grupo), variante)
+        except Exception as err:
+            self.errores += 1
+            logger.warning("Cache de fragmentos no disponible", extra={'error': str(err), 'muestreo': True})
+            crudo = None
+        if crudo is None:
+            self.fallos += 1
+            return None
+        self.aciertos += 1
+        return json.loads(crudo)
+
+    def guardar(self, grupo, variante, valor):
+        try:
+            with self._cliente.pipeline() as tuberia:
+                tuberia.hset(self._clave(grupo), variante, json.dumps(valor, ensure_ascii=False))
+                tuberia.expire(self._clave(grupo), self.ttl)
+                tuberia.execute()
+        except Exception as err:
+            self.errores += 1
+            logger.warning("Cache de fragmentos no disponible", extra={'error': str(err), 'muestreo': True})
+
+    def invalidar_grupo(self, grupo):
+        try:
+            self._cliente.delete(self._clave(grupo))
+        except Exception:
+            self.errores += 1
+            logger.exception("Error invalidando la cache de fragmentos", extra={'grupo': grupo})
+
+    def limpiar(self):
+        try:
+            claves = list(self._cliente.scan_iter(match=f'{self.prefijo}:*', count=500))
+            if claves:
+                self._cliente.delete(*claves)
+        except Exception:
+            self.errores += 1
+            logger.exception("Error limpiando la cache de fragmentos")
+
+    def estadisticas(self):
+        return {
+            'backend': 'redis',
+            'aciertos': self.aciertos,
+            'fallos': self.fallos,
+            'errores': self.errores
+        }
+
+def crear_cache_fragmentos(url=None, max_bytes=8 * 1024 * 1024, ttl=3600):
+    """Cache compartida en Redis si hay URL y el paquete redis está instalado; si no, LRU en memoria"""
+    if url:
+        try:
+            return CacheFragmentosRedis(url, ttl=ttl)
+        except ImportError:
+            logger.warning("Paquete redis no instalado: cache de fragmentos en memoria")
+    return CacheFragmentos(max_bytes=max_bytes, ttl=ttl)
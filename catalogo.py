@@ -0,0 +1,61 @@
+# Catálogo de problemas por categoría derivado de las fichas guardadas (desplegables de agregar/editar ficha).
+# El JSON de cada categoría se serializa una sola vez al construir el catálogo (carga del snapshot o
+# cambio de versión de las fichas) y se sirve tal cual, con su ETag.
+import hashlib
+import json
+from collections import Counter
+
+# Máximo de causas sugeridas por problema (las más frecuentes en sus fichas)
+MAX_CAUSAS_SUGERIDAS = 10
+
+def _serializar(datos):
+    cuerpo = json.dumps(datos, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return cuerpo, hashlib.sha1(cuerpo).hexdigest()[:16]
+
+class CatalogoProblemas:
+    """Problemas de cada categoría con su cantidad de fichas y causas más comunes, ya en JSON"""
+
+    def __init__(self, filas):
+        """filas: (categoria, problema, causas) de cada ficha"""
+        agrupado = {}  # categoria -> problema -> [fichas, Counter de causas]
+        for categoria, problema, causas in filas:
+            datos = agrupado.setdefault(categoria, {}).setdefault(problema, [0, Counter()])
+            datos[0] += 1
+            datos[1].update(set(causas or ()))
+
+        self.categorias = {}
+        self._json = {}
+        for categoria, problemas in agrupado.items():
+            ordenados = sorted(problemas.items(), key=lambda item: (-item[1][0], item[0]))
+            self._json[categoria] = _serializar({
+                'categoria': categoria,
+                'problemas': [
+                    {
+                        'problema': problema,
+                        'fichas': fichas,
+                        'causas': [causa for causa, _ in causas.most_common(MAX_CAUSAS_SUGERIDAS)]
+                    }
+                    for problema, (fichas, causas) in ordenados
+                ]
+            })
+            self.categorias[categoria] = sum(fichas for fichas, _ in problemas.values())
+
+        self._json[None] = _serializar({
+            'categorias': [
+                {'categoria': categoria, 'fichas': fichas}
+                for categoria, fichas in sorted(self.categorias.items(), key=lambda item: (-item[1], item[0]))
+            ]
+        })
+
+    def json(self, categoria=None):
+        """(cuerpo, etag) de una categoría, o del listado de categorías si categoria es None"""
+        precalculado = self._json.get(categoria)
+        if precalculado is not None:
+            return precalculado
+        # Categoría sin fichas: respuesta vacía (no se guarda, la URL la elige el cliente)
+        return _serializar({'categoria': categoria, 'problemas': []})
+
+def consultar_catalogo(cursor):
+    """Catálogo armado desde la BD (cuando no hay snapshot en memoria)"""
+    cursor.execute("SELECT categoria, problema, causas FROM fichas_detalle")
+    return CatalogoProblemas(cursor.fetchall())
@@ -0,0 +1,98 @@
+import hashlib
+import logging
+from functools import wraps
+
+from flask import g, request, session, make_response, message_flashed
+from flask_login import current_user
+
+from database import base_datos_disponible
+
+logger = logging.getLogger(__name__)
+
+def etag_pagina(*partes):
+    """ETag de una página: versión de los datos de la vista + lo que base.html muestra del usuario"""
+    if current_user.is_authenticated:
+        partes += (current_user.id, current_user.usuario, current_user.rol, current_user.permisos.mascara)
+    base = '|'.join(str(parte) for parte in partes)
+    return hashlib.sha1(base.encode('utf-8')).hexdigest()[:20]
+
+def _etiquetar(respuesta, etag, ultima_modificacion):
+    respuesta.set_etag(etag, weak=True)
+    if ultima_modificacion is not None:
+        respuesta.last_modified = ultima_modificacion
+    # El HTML depende del usuario: que el navegador lo guarde pero siempre pregunte
+    respuesta.headers['Cache-Control'] = 'private, no-cache'
+    respuesta.vary.add('Cookie')
+    return respuesta
+
+def _hubo_flash():
+    """True si la página lleva (o puede llevar) un flash: pendiente al empezar la petición o agregado durante ella.
+
+    base.html consume los flashes pendientes al renderizar, así que después de la vista ya no quedan
+    en la sesión; por eso registrar() los anota en g antes de que corra.
+    """
+    return bool(g.get('flash_pendiente') or g.get('hubo_flash') or session.get('_flashes'))
+
+def no_modificado(etag, ultima_modificacion=None):
+    """True si el cliente ya tiene esta versión de la página"""
+    # Un flash cambia el HTML y tiene que mostrarse: nunca responder 304 en ese caso
+    if _hubo_flash():
+        return False
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if ultima_modificacion is not None and request.if_modified_since:
+        return ultima_modificacion <= request.if_modified_since
+    return False
+
+def responder_condicional(etag, generar, ultima_modificacion=None):
+    """Responde 304 sin llamar a generar() si el cliente ya tiene la página; si no, la genera y la etiqueta"""
+    if no_modificado(etag, ultima_modificacion):
+        return _etiquetar(make_response('', 304), etag, ultima_modificacion)
+    respuesta = make_response(generar())
+    if _hubo_flash() or not base_datos_disponible():
+        # Lleva un flash o el aviso de modo degradado: no guardarla con este ETag
+        return respuesta
+    return _etiquetar(respuesta, etag, ultima_modificacion)
+
+def _registrar_flash(app, message, category):
+    g.hubo_flash = True
+
+message_flashed.connect(_registrar_flash)
+
+def registrar(app):
+    """Anota al empezar cada petición si había flashes pendientes (la vista los consume al renderizar)"""
+    @app.before_request
+    def recordar_flash_pendiente():
+        if request.endpoint != 'static':
+            g.flash_pendiente = bool(session.get('_flashes'))
+
+def condicional(calcular_version):
+    """Decorador de vistas GET: responde 304 antes de ejecutar la vista si los datos no cambiaron.
+
+    calcular_version recibe los mismos argumentos que la vista y devuelve una tupla barata
+    de obtener (versión de las fichas, fecha_actualizacion...) o None para no usar ETag.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(*args, **kwargs):
+            if request.method != 'GET':
+                return vista(*args, **kwargs)
+            try:
+                version = calcular_version(*args, **kwargs)
+            except Exception:
+                logger.exception("Error calculando versión", extra={'endpoint': request.endpoint})
+                version = None
+            if version is None:
+                return vista(*args, **kwargs)
+
+            etag = etag_pagina(request.full_path, *version)
+            if no_modificado(etag):
+                return _etiquetar(make_response('', 304), etag, None)
+
+            respuesta = make_response(vista(*args, **kwargs))
+            # Páginas con errores, avisos o en modo degradado no se etiquetan: no deben servirse otra vez con un 304
+            if respuesta.status_code == 200 and not _hubo_flash() and base_datos_disponible():
+                _etiquetar(respuesta, etag, None)
+            return respuesta
+        return envoltura
+    return decorador
@@ -16,3 +16,46 @@ class Config:
         'DATABASE_URL',
         f'postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
     )
+
+    # Cache en memoria de usuarios autenticados (por worker)
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', '60'))
+    USER_CACHE_MAX = int(os.environ.get('USER_CACHE_MAX', '500'))
+
+    # Tamaño de página del listado de fichas en el index
+    FICHAS_POR_PAGINA = int(os.environ.get('FICHAS_POR_PAGINA', '24'))
+
+    # Cache de resultados de la búsqueda incremental (por worker)
+    SEARCH_CACHE_TTL = int(os.environ.get('SEARCH_CACHE_TTL', '300'))
+    SEARCH_CACHE_MAX = int(os.environ.get('SEARCH_CACHE_MAX', '1000'))
+
+    # Snapshot en memoria de las fichas (por worker); SNAPSHOT_FICHAS=0 vuelve a consultar la BD
+    SNAPSHOT_FICHAS = os.environ.get('SNAPSHOT_FICHAS', '1') == '1'
+    SNAPSHOT_ESCUCHAR = os.environ.get('SNAPSHOT_ESCUCHAR', '1') == '1'
+    SNAPSHOT_VERIFICACION_SEGUNDOS = int(os.environ.get('SNAPSHOT_VERIFICACION_SEGUNDOS', '30'))
+
+    # Cache del HTML de ver_ficha por (ficha, fecha_actualizacion, permisos): en memoria por worker,
+    # o compartida en Redis (o un servidor compatible) si se define FRAGMENT_CACHE_URL
+    FRAGMENT_CACHE_URL = os.environ.get('FRAGMENT_CACHE_URL')
+    FRAGMENT_CACHE_MAX_BYTES = int(os.environ.get('FRAGMENT_CACHE_MAX_BYTES', str(8 * 1024 * 1024)))
+    FRAGMENT_CACHE_TTL = int(os.environ.get('FRAGMENT_CACHE_TTL', '3600'))
+
+    # Hash de contraseñas (werkzeug): método y costo de los hashes nuevos; los guardados con otro se
+    # regeneran al iniciar sesión. El cálculo corre en un pool acotado de hilos por worker.
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+    PASSWORD_HASH_HILOS = int(os.environ.get('PASSWORD_HASH_HILOS', '2'))
+    PASSWORD_HASH_COLA = int(os.environ.get('PASSWORD_HASH_COLA', '16'))
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', '10'))
+
+    # Límite de intentos fallidos de login por worker: por usuario+IP y, más holgado, por IP
+    LOGIN_MAX_INTENTOS = int(os.environ.get('LOGIN_MAX_INTENTOS', '5'))
+    LOGIN_MAX_INTENTOS_IP = int(os.environ.get('LOGIN_MAX_INTENTOS_IP', '50'))
+    LOGIN_VENTANA_SEGUNDOS = int(os.environ.get('LOGIN_VENTANA_SEGUNDOS', '300'))
+
+    # Proxies delante de la app (p.ej. 1 en Render): la IP del cliente se toma de X-Forwarded-For
+    PROXIES_CONFIABLES = int(os.environ.get('PROXIES_CONFIABLES', '0'))
+
+    # Sesiones en el servidor: vacío = cookie firmada de Flask (por defecto); 'memoria' = en el proceso
+    # (solo con un worker de gunicorn); 'redis://...' = compartidas entre workers y nodos
+    SESSION_STORE_URL = os.environ.get('SESSION_STORE_URL', '')
+    SESSION_TTL = int(os.environ.get('SESSION_TTL', str(12 * 3600)))
+    SESSION_MAX = int(os.environ.get('SESSION_MAX', '10000'))
@@ -0,0 +1,287 @@
+import logging
+import os
+import re
+import select
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime
+
+from database import conexion_db, crear_conexion
+from busqueda import normalizar, LIMITE_RESULTADOS
+from catalogo import CatalogoProblemas
+from fichas import CANAL_CAMBIOS, codificar_cursor, decodificar_cursor
+from repositorios import RepositorioFichas
+
+logger = logging.getLogger(__name__)
+
+# Con LISTEN activo la versión se compara igual cada intervalo_verificacion * este factor: una conexión de
+# escucha cortada en silencio (PgBouncer, proxy de la nube) no da error y dejaría el snapshot viejo para siempre
+FACTOR_VERIFICACION_ESCUCHANDO = 10
+
+# Peso de cada campo en el orden de los resultados de búsqueda
+PESOS_CAMPOS = (
+    ('problema', 3),
+    ('palabras_clave', 3),
+    ('descripcion', 2),
+    ('causas', 1),
+    ('solucion', 1)
+)
+
+# Palabras demasiado comunes para filtrar (igual que hace la configuración 'spanish' de PostgreSQL)
+PALABRAS_VACIAS = {
+    'a', 'al', 'con', 'de', 'del', 'el', 'en', 'es', 'la', 'las', 'lo', 'los',
+    'no', 'para', 'por', 'que', 'se', 'su', 'un', 'una', 'y'
+}
+
+class SnapshotFichas:
+    """Copia inmutable de todas las fichas con índices precalculados"""
+
+    def __init__(self, version, fichas):
+        """fichas: objetos repositorios.Ficha"""
+        self.version = version
+        self.cargado_en = time.time()
+
+        fichas = list(fichas)
+        fichas.sort(key=lambda f: (f.fecha_actualizacion or datetime.min, f.id), reverse=True)
+        self.fichas = tuple(fichas)
+        self.por_id = {ficha.id: ficha for ficha in self.fichas}
+
+        # Claves ascendentes para ubicar el cursor de paginación con bisect
+        self._claves_asc = [(f.fecha_actualizacion or datetime.min, f.id) for f in reversed(self.fichas)]
+
+        por_categoria = {}
+        for posicion, ficha in enumerate(self.fichas):
+            por_categoria.setdefault(ficha.categoria, []).append(posicion)
+        self.por_categoria = {categoria: frozenset(posiciones) for categoria, posiciones in por_categoria.items()}
+        self.conteos = {categoria: len(posiciones) for categoria, posiciones in por_categoria.items()}
+
+        # Índice invertido: palabra normalizada -> {posición de la ficha: peso}
+        indice = {}
+        for posicion, ficha in enumerate(self.fichas):
+            for campo, peso in PESOS_CAMPOS:
+                valor = getattr(ficha, campo)
+                if isinstance(valor, tuple):
+                    valor = ' '.join(valor)
+                for palabra in re.findall(r'\w+', normalizar(valor)):
+                    pesos = indice.setdefault(palabra, {})
+                    if pesos.get(posicion, 0) < peso:
+                        pesos[posicion] = peso
+        self._indice = indice
+        self._vocabulario = sorted(indice)
+
+        # JSON de /api/problemas precalculado con esta versión de las fichas
+        self.catalogo = CatalogoProblemas((f.categoria, f.problema, f.causas) for f in self.fichas)
+
+    def _coincidencias(self, termino):
+        """Posiciones de las fichas con alguna palabra que empieza por el término (con su peso)"""
+        resultado = {}
+        inicio = bisect_left(self._vocabulario, termino)
+        for palabra in self._vocabulario[inicio:]:
+            if not palabra.startswith(termino):
+                break
+            for posicion, peso in self._indice[palabra].items():
+                if resultado.get(posicion, 0) < peso:
+                    resultado[posicion] = peso
+        return resultado
+
+    def buscar(self, texto, categoria='', limite=LIMITE_RESULTADOS):
+        """Todas las palabras deben aparecer (como prefijo); ordena por peso y fecha"""
+        terminos = [t for t in re.findall(r'\w+', normalizar(texto)) if t not in PALABRAS_VACIAS]
+        filtro = self.por_categoria.get(categoria, frozenset()) if categoria else None
+
+        if not terminos:
+            if texto and texto.strip():
+                return []
+            posiciones = sorted(filtro) if filtro is not None else range(len(self.fichas))
+            return [self.fichas[p] for p in posiciones][:limite]
+
+        puntajes = None
+        for termino in terminos:
+            coincidencias = self._coincidencias(termino)
+            if puntajes is None:
+                puntajes = coincidencias
+            else:
+                puntajes = {p: puntajes[p] + peso for p, peso in coincidencias.items() if p in puntajes}
+            if not puntajes:
+                return []
+
+        if filtro is not None:
+            puntajes = {p: puntaje for p, puntaje in puntajes.items() if p in filtro}
+
+        ordenadas = sorted(puntajes, key=lambda p: (-puntajes[p], p))
+        return [self.fichas[p] for p in ordenadas[:limite]]
+
+    def pagina(self, limite, despues=None):
+        """Equivalente en memoria de RepositorioFichas.pagina (mismo formato de cursor)"""
+        inicio = 0
+        posicion = decodificar_cursor(despues) if despues else None
+        if posicion:
+            inicio = len(self.fichas) - bisect_left(self._claves_asc, posicion)
+        pagina = self.fichas[inicio:inicio + limite]
+        siguiente = None
+        if inicio + limite < len(self.fichas) and pagina:
+            siguiente = codificar_cursor(pagina[-1].fecha_actualizacion, pagina[-1].id)
+        return list(pagina), siguiente
+
+class BaseConocimiento:
+    """Mantiene el snapshot de fichas de este worker y lo recarga cuando cambia la versión en la BD"""
+
+    def __init__(self, intervalo_verificacion=30, escuchar=True):
+        self.intervalo_verificacion = intervalo_verificacion
+        self.intervalo_escuchando = intervalo_verificacion * FACTOR_VERIFICACION_ESCUCHANDO
+        self.escuchar = escuchar
+        self._snapshot = None
+        self._obsoleto = True
+        self._ultima_verificacion = 0.0
+        self._escuchando = False
+        self._reconectar = False
+        self._hilo = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._suscripciones = {}  # canal -> funcion(carga)
+        self.recargas = 0
+
+    def suscribir(self, canal, funcion):
+        """Escucha también otro canal en la conexión de LISTEN: funcion(carga) por cada NOTIFY, y
+        funcion(None) al (re)conectar porque los avisos de mientras no se escuchaba se perdieron"""
+        self._suscripciones[canal] = funcion
+
+    def iniciar(self):
+        """Arranca la escucha en este proceso aunque todavía nadie haya pedido el snapshot"""
+        self._preparar_proceso()
+
+    def _avisar(self, canal, carga):
+        try:
+            self._suscripciones[canal](carga)
+        except Exception:
+            logger.exception("Error procesando un aviso de cambios", extra={'canal': canal})
+
+    def invalidar(self):
+        """Marca el snapshot como obsoleto (lo llama el worker que escribió)"""
+        self._obsoleto = True
+
+    def _preparar_proceso(self):
+        if self._pid == os.getpid() and (self._hilo is not None or not self.escuchar):
+            return
+        with self._lock:
+            # Tras un fork de gunicorn el hilo de escucha no existe en el hijo: empezar de cero
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._snapshot = None
+                self._obsoleto = True
+                self._escuchando = False
+                self._hilo = None
+            if self.escuchar and self._hilo is None:
+                self._hilo = threading.Thread(target=self._escuchar_cambios, name='escucha-fichas', daemon=True)
+                self._hilo.start()
+
+    def _escuchar_cambios(self):
+        """Hilo en segundo plano: LISTEN sobre una conexión dedicada y marca obsoleto al recibir NOTIFY"""
+        while True:
+            conexion = crear_conexion()
+            if conexion is None:
+                time.sleep(self.intervalo_verificacion)
+                continue
+            try:
+                conexion.autocommit = True
+                with conexion.cursor() as cursor:
+                    cursor.execute(f"LISTEN {CANAL_CAMBIOS}")
+                    for canal in self._suscripciones:
+                        cursor.execute(f"LISTEN {canal}")
+                self._escuchando = True
+                # Pudo haber cambios mientras no escuchábamos
+                self._obsoleto = True
+                for canal in self._suscripciones:
+                    self._avisar(canal, None)
+                while not self._reconectar:
+                    select.select([conexion], [], [], 60)
+                    conexion.poll()
+                    while conexion.notifies:
+                        aviso = conexion.notifies.pop(0)
+                        if aviso.channel == CANAL_CAMBIOS:
+                            self._obsoleto = True
+                        elif aviso.channel in self._suscripciones:
+                            self._avisar(aviso.channel, aviso.payload)
+            except Exception as err:
+                logger.warning("Escucha de cambios en fichas interrumpida", extra={'error': str(err).strip()})
+            finally:
+                self._escuchando = False
+                self._reconectar = False
+                try:
+                    conexion.close()
+                except Exception:
+                    pass
+            time.sleep(5)
+
+    def _cargar(self):
+        with conexion_db() as conexion:
+            if not conexion:
+                return None
+            with conexion.cursor() as cursor:
+                # Leer la versión antes que los datos: si algo cambia en medio, la próxima verificación recarga
+                cursor.execute("SELECT version FROM fichas_version WHERE id = 1")
+                fila = cursor.fetchone()
+                version = fila[0] if fila else 0
+                return SnapshotFichas(version, RepositorioFichas(cursor).todas())
+
+    def _version_actual(self):
+        with conexion_db() as conexion:
+            if not conexion:
+                return None
+            with conexion.cursor() as cursor:
+                cursor.execute("SELECT version FROM fichas_version WHERE id = 1")
+                fila = cursor.fetchone()
+                return fila[0] if fila else 0
+
+    def obtener(self):
+        """Snapshot vigente (se carga la primera vez); None si nunca se pudo cargar"""
+        self._preparar_proceso()
+        snapshot = self._snapshot
+        intervalo = self.intervalo_escuchando if self._escuchando else self.intervalo_verificacion
+        verificar = time.monotonic() - self._ultima_verificacion >= intervalo
+        if snapshot is not None and not self._obsoleto and not verificar:
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            try:
+                if snapshot is not None and not self._obsoleto:
+                    # Comparar la versión (cada intervalo_verificacion segundos sin LISTEN, más espaciado con LISTEN)
+                    if time.monotonic() - self._ultima_verificacion < intervalo:
+                        return snapshot
+                    self._ultima_verificacion = time.monotonic()
+                    version = self._version_actual()
+                    if version in (None, snapshot.version):
+                        return snapshot
+                    if self._escuchando:
+                        # Se perdió un NOTIFY: la conexión de escucha probablemente está cortada, abrir otra
+                        logger.warning("Snapshot desactualizado con LISTEN activo: se reabre la escucha",
+                                       extra={'version': snapshot.version, 'version_bd': version})
+                        self._reconectar = True
+
+                self._obsoleto = False
+                nuevo = self._cargar()
+                if nuevo is None:
+                    self._obsoleto = True
+                    return snapshot
+                self._snapshot = nuevo
+                self._ultima_verificacion = time.monotonic()
+                self.recargas += 1
+                logger.info("Snapshot de fichas cargado", extra={'version': nuevo.version, 'fichas': len(nuevo.fichas)})
+                return nuevo
+            except Exception:
+                self._obsoleto = True
+                logger.exception("Error cargando snapshot de fichas")
+                # Mejor servir datos algo viejos que fallar
+                return snapshot
+
+    def estadisticas(self):
+        snapshot = self._snapshot
+        return {
+            'version': snapshot.version if snapshot else None,
+            'fichas': len(snapshot.fichas) if snapshot else 0,
+            'recargas': self.recargas,
+            'escuchando': self._escuchando,
+            'obsoleto': self._obsoleto
+        }
@@ -0,0 +1,41 @@
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timezone
+
+from flask import render_template
+
+CARPETA_DATOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'datos')
+CARPETA_PLANTILLAS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+
+class ContenidoEstatico:
+    """Contenido que solo cambia con un despliegue: se lee una vez y su HTML se renderiza una vez por worker"""
+
+    def __init__(self, archivo_datos, plantilla_fragmento, variable):
+        self.plantilla_fragmento = plantilla_fragmento
+        self.variable = variable
+
+        ruta_datos = os.path.join(CARPETA_DATOS, archivo_datos)
+        with open(ruta_datos, 'rb') as archivo:
+            crudo = archivo.read()
+        self.datos = json.loads(crudo)
+
+        # La versión depende de los datos y de la plantilla que los presenta
+        ruta_plantilla = os.path.join(CARPETA_PLANTILLAS, plantilla_fragmento)
+        with open(ruta_plantilla, 'rb') as archivo:
+            self.version = hashlib.sha1(crudo + archivo.read()).hexdigest()[:16]
+        modificado = max(os.path.getmtime(ruta_datos), os.path.getmtime(ruta_plantilla))
+        # Last-Modified solo tiene resolución de segundos
+        self.modificado = datetime.fromtimestamp(int(modificado), tz=timezone.utc)
+
+        self._html = None
+        self._lock = threading.Lock()
+
+    def fragmento(self):
+        """HTML renderizado del contenido (requiere contexto de Flask la primera vez)"""
+        if self._html is None:
+            with self._lock:
+                if self._html is None:
+                    self._html = render_template(self.plantilla_fragmento, **{self.variable: self.datos})
+        return self._html
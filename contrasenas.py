@@ -0,0 +1,205 @@
+# Hash de contraseñas fuera del hilo de la petición: un pool acotado de hilos por worker (PBKDF2 y scrypt
+# liberan el GIL) con cola limitada, y un limitador de intentos de login para que la fuerza bruta no lo agote.
+# El método y costo salen de PASSWORD_HASH_METHOD; los hashes guardados con otro método se regeneran al
+# iniciar sesión (ver necesita_rehash).
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as TimeoutFuturo
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+from metricas import Histograma
+
+logger = logging.getLogger(__name__)
+
+# Límites (segundos) de los histogramas de espera en cola y de duración del hash
+LIMITES_ESPERA_HASH = (0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+LIMITES_DURACION_HASH = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+class PoolHashSaturado(Exception):
+    """La cola del pool de hash está llena o la operación esperó más que el timeout"""
+
+def prefijo_del_metodo(metodo):
+    """Método completo tal como lo deja generate_password_hash al inicio del hash, sin calcular ninguno
+    ('pbkdf2' -> 'pbkdf2:sha256:600000', 'scrypt' -> 'scrypt:32768:8:1'); mismas reglas que werkzeug"""
+    nombre, *argumentos = metodo.split(':')
+    if nombre == 'scrypt':
+        n, r, p = argumentos or (2 ** 15, 8, 1)
+        return f"scrypt:{int(n)}:{int(r)}:{int(p)}"
+    if nombre == 'pbkdf2':
+        algoritmo = argumentos[0] if argumentos else 'sha256'
+        iteraciones = int(argumentos[1]) if len(argumentos) > 1 else DEFAULT_PBKDF2_ITERATIONS
+        return f"pbkdf2:{algoritmo}:{iteraciones}"
+    # Métodos heredados (hmac con el nombre del algoritmo, 'plain'): el prefijo es el nombre tal cual
+    return metodo
+
+def _gevent_activo():
+    """True si gunicorn corre con gevent: los hilos de threading son greenlets y no sirven para calcular hashes"""
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('threading')
+
+class PoolHash:
+    """Genera y verifica hashes en un pool de hilos acotado; rechaza en lugar de encolar sin límite"""
+
+    def __init__(self, metodo, hilos=2, max_en_cola=16, timeout=10.0):
+        self.metodo = metodo
+        self.hilos = hilos
+        self.max_en_cola = max_en_cola
+        self.timeout = timeout
+        # Método completo tal como queda en el hash, para comparar con los guardados (necesita_rehash)
+        self.prefijo = prefijo_del_metodo(metodo)
+
+        self._lock = threading.Lock()
+        self._pid = None
+        self._ejecutor = None
+        self._cupos = None
+        self.pendientes = 0
+        self.operaciones = {}  # (operacion, resultado) -> cantidad
+        self.espera = Histograma(LIMITES_ESPERA_HASH)
+        self.duracion = Histograma(LIMITES_DURACION_HASH)
+
+    def _preparar_proceso(self):
+        """Crea el ejecutor en cada worker (los hilos no sobreviven al fork de gunicorn)"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if _gevent_activo():
+                # Hilos reales del sistema, fuera del hub de gevent
+                from gevent.threadpool import ThreadPoolExecutor as EjecutorGevent
+                self._ejecutor = EjecutorGevent(max_workers=self.hilos)
+            else:
+                self._ejecutor = ThreadPoolExecutor(max_workers=self.hilos, thread_name_prefix='hash')
+            self._cupos = threading.BoundedSemaphore(self.hilos + self.max_en_cola)
+            self.pendientes = 0
+            self._pid = os.getpid()
+
+    def _contar(self, operacion, resultado):
+        with self._lock:
+            clave = (operacion, resultado)
+            self.operaciones[clave] = self.operaciones.get(clave, 0) + 1
+
+    def _ejecutar(self, operacion, funcion, *argumentos):
+        self._preparar_proceso()
+        if not self._cupos.acquire(blocking=False):
+            self._contar(operacion, 'rechazada')
+            raise PoolHashSaturado(f"Pool de hash lleno ({self.hilos} hilos, {self.max_en_cola} en cola)")
+
+        encolada = time.perf_counter()
+
+        def tarea():
+            inicio = time.perf_counter()
+            try:
+                return funcion(*argumentos)
+            finally:
+                fin = time.perf_counter()
+                with self._lock:
+                    self.espera.observar(inicio - encolada)
+                    self.duracion.observar(fin - inicio)
+
+        cupos = self._cupos
+
+        def liberar(_futuro):
+            # El cupo se devuelve cuando el hash termina de verdad, no cuando la petición deja de esperarlo:
+            # así los hashes que siguen corriendo tras un timeout siguen contando para el límite
+            with self._lock:
+                self.pendientes -= 1
+            cupos.release()
+
+        with self._lock:
+            self.pendientes += 1
+        try:
+            futuro = self._ejecutor.submit(tarea)
+        except BaseException:
+            liberar(None)
+            raise
+        futuro.add_done_callback(liberar)
+
+        try:
+            resultado = futuro.result(timeout=self.timeout)
+        except TimeoutFuturo:
+            futuro.cancel()
+            self._contar(operacion, 'timeout')
+            raise PoolHashSaturado(f"El hash no terminó en {self.timeout} s")
+        self._contar(operacion, 'ok')
+        return resultado
+
+    def generar(self, password):
+        """Hash nuevo con el método configurado"""
+        return self._ejecutar('generar', generate_password_hash, password, self.metodo)
+
+    def verificar(self, hash_guardado, password):
+        return self._ejecutar('verificar', check_password_hash, hash_guardado, password)
+
+    def necesita_rehash(self, hash_guardado):
+        """True si el hash se generó con otro método o costo que el configurado"""
+        return hash_guardado.split('$', 1)[0] != self.prefijo
+
+    def metricas(self):
+        """Series para /metrics (ver metricas.agregar_fuente)"""
+        with self._lock:
+            return [
+                ('hash_operaciones_total', 'counter', 'Operaciones del pool de hash de contraseñas por resultado',
+                 [({'operacion': operacion, 'resultado': resultado}, cantidad)
+                  for (operacion, resultado), cantidad in sorted(self.operaciones.items())]),
+                ('hash_pendientes', 'gauge', 'Hashes en cola o en curso en este worker',
+                 [({}, self.pendientes)]),
+                ('hash_espera_cola_segundos', 'histogram', 'Espera por un hilo libre del pool de hash',
+                 [({}, self.espera.copiar())]),
+                ('hash_duracion_segundos', 'histogram', 'Tiempo calculando cada hash',
+                 [({}, self.duracion.copiar())])
+            ]
+
+class LimitadorIntentos:
+    """Intentos fallidos por clave en una ventana deslizante (en memoria, por worker)"""
+
+    def __init__(self, max_intentos=5, ventana=300, max_claves=10000):
+        self.max_intentos = max_intentos
+        self.ventana = ventana
+        self.max_claves = max_claves
+        self._fallos = OrderedDict()  # clave -> deque de instantes (monotonic)
+        self._lock = threading.Lock()
+        self.bloqueos = 0
+
+    def _vigentes(self, clave, ahora):
+        instantes = self._fallos.get(clave)
+        if instantes is None:
+            return None
+        while instantes and instantes[0] <= ahora - self.ventana:
+            instantes.popleft()
+        if not instantes:
+            del self._fallos[clave]
+            return None
+        return instantes
+
+    def espera(self, clave):
+        """Segundos que faltan para volver a intentar (0 si no está bloqueada)"""
+        ahora = time.monotonic()
+        with self._lock:
+            instantes = self._vigentes(clave, ahora)
+            if instantes is None or len(instantes) < self.max_intentos:
+                return 0
+            self.bloqueos += 1
+            return int(instantes[-self.max_intentos] + self.ventana - ahora) + 1
+
+    def registrar_fallo(self, clave):
+        ahora = time.monotonic()
+        with self._lock:
+            instantes = self._vigentes(clave, ahora)
+            if instantes is None:
+                instantes = self._fallos[clave] = deque(maxlen=self.max_intentos)
+            instantes.append(ahora)
+            self._fallos.move_to_end(clave)
+            while len(self._fallos) > self.max_claves:
+                self._fallos.popitem(last=False)
+
+    def limpiar(self, clave):
+        with self._lock:
+            self._fallos.pop(clave, None)
@@ -1,254 +1,439 @@
 import os
+import logging
 import psycopg2
 from urllib.parse import quote_plus
-from werkzeug.security import generate_password_hash
-import json
 import time
+import threading
+from contextlib import contextmanager
+from metricas import CursorMedido, registrar_espera_pool
 
-def crear_conexion():
-    """Conexión mejorada con mejor manejo de errores"""
-    max_intentos = 3
-    for intento in range(max_intentos):
-        try:
-            print(f"🔗 Intento {intento + 1} de conexión a PostgreSQL...")
-            
-            # Usar DATABASE_URL si existe
-            database_url = os.getenv('DATABASE_URL')
-            
-            if database_url:
-                print("🔧 Usando DATABASE_URL de variable de entorno")
-                if database_url.startswith("postgres://"):
-                    database_url = database_url.replace("postgres://", "postgresql://", 1)
-                
-                # Agregar sslmode si es necesario para Render
-                if 'render.com' in database_url and 'sslmode=' not in database_url:
-                    database_url += '?sslmode=require'
-                    
-                print(f"🔗 URL: {database_url.split('@')[0]}@***")
-                conexion = psycopg2.connect(database_url)
-                
-            else:
-                # Usar variables individuales
-                user = os.getenv('DB_USER', 'soporte_tecnico_9sad_user')
-                password = os.getenv('DB_PASSWORD', 'T56GYS30j5w4k6zrdlvAh1GfExjT0t7a')
-                host = os.getenv('DB_HOST', 'dpg-d3g1q2nqaa0ldt0j7vug-a.oregon-postgres.render.com')
-                port = os.getenv('DB_PORT', '5432')
-                dbname = os.getenv('DB_NAME', 'soporte_tecnico_9sad')
-                
-                print(f"🔧 Configuración: host={host}, db={dbname}, user={user}")
-                
-                # Para Render, usar sslmode=require
-                if 'render.com' in host:
-                    conexion = psycopg2.connect(
-                        host=host,
-                        database=dbname,
-                        user=user,
-                        password=password,
-                        port=port,
-                        sslmode='require'
-                    )
-                else:
-                    conexion = psycopg2.connect(
-                        host=host,
-                        database=dbname,
-                        user=user,
-                        password=password,
-                        port=port
-                    )
-            
-            # Verificar que la conexión funciona
-            cursor = conexion.cursor()
-            cursor.execute("SELECT 1")
-            cursor.close()
-            
-            print("✅ ¡CONEXIÓN EXITOSA a PostgreSQL!")
-            return conexion
-            
-        except Exception as err:
-            print(f"❌ Intento {intento + 1} falló: {str(err)}")
-            if intento < max_intentos - 1:
-                print("🔄 Reintentando en 3 segundos...")
-                time.sleep(3)
-            else:
-                print("💥 Todos los intentos de conexión fallaron")
-                return None
+logger = logging.getLogger(__name__)
+
+class CircuitoConexion:
+    """Circuit breaker para abrir conexiones: tras varios fallos seguidos deja de intentar
+    durante un rato y las peticiones fallan al instante en vez de quedarse esperando a PostgreSQL.
+
+    cerrado -> (umbral_fallos fallos) -> abierto -> (espera_apertura s) -> semiabierto -> un intento de prueba
+    """
+
+    def __init__(self, umbral_fallos=3, espera_apertura=30):
+        self.umbral_fallos = umbral_fallos
+        self.espera_apertura = espera_apertura
+        self.estado = 'cerrado'
+        self._fallos_consecutivos = 0
+        self._abierto_desde = 0.0
+        self._ultimo_error = None
+        self._lock = threading.Lock()
+        self.metricas = {
+            'intentos': 0,
+            'fallos': 0,
+            'rechazadas': 0,
+            'sondeos': 0,
+            'transiciones': {}
+        }
+
+    def _cambiar(self, estado):
+        transicion = f"{self.estado}->{estado}"
+        self.metricas['transiciones'][transicion] = self.metricas['transiciones'].get(transicion, 0) + 1
+        self.estado = estado
+        if estado == 'abierto':
+            self._abierto_desde = time.monotonic()
+            logger.error("Circuito de BD abierto", extra={'espera_segundos': self.espera_apertura, 'error': self._ultimo_error})
+        elif estado == 'cerrado':
+            logger.info("Circuito de BD cerrado: PostgreSQL responde otra vez")
+
+    def permitir(self):
+        """True si se puede intentar conectar ahora; con el circuito abierto responde False sin esperar"""
+        with self._lock:
+            if self.estado == 'abierto':
+                if time.monotonic() - self._abierto_desde < self.espera_apertura:
+                    self.metricas['rechazadas'] += 1
+                    return False
+                # Pasó la espera: dejar pasar un único intento de prueba
+                self._cambiar('semiabierto')
+                self.metricas['sondeos'] += 1
+            elif self.estado == 'semiabierto':
+                # Ya hay un intento de prueba en curso
+                self.metricas['rechazadas'] += 1
+                return False
+            self.metricas['intentos'] += 1
+            return True
+
+    def registrar_exito(self):
+        with self._lock:
+            self._fallos_consecutivos = 0
+            if self.estado != 'cerrado':
+                self._cambiar('cerrado')
+
+    def registrar_fallo(self, error):
+        with self._lock:
+            self._fallos_consecutivos += 1
+            self._ultimo_error = str(error).strip()
+            self.metricas['fallos'] += 1
+            if self.estado == 'semiabierto' or (
+                    self.estado == 'cerrado' and self._fallos_consecutivos >= self.umbral_fallos):
+                self._cambiar('abierto')
+
+    def cancelar_sondeo(self):
+        """Devuelve el intento de prueba sin resultado (no llegó a tocar PostgreSQL): el próximo permitir() prueba otra vez"""
+        with self._lock:
+            if self.estado == 'semiabierto':
+                self.estado = 'abierto'
+                self._abierto_desde = time.monotonic() - self.espera_apertura
+
+    def disponible(self):
+        """False mientras el circuito está abierto (la app muestra la página en modo degradado)"""
+        return self.estado == 'cerrado'
+
+    def estadisticas(self):
+        with self._lock:
+            datos = dict(self.metricas)
+            datos['transiciones'] = dict(self.metricas['transiciones'])
+            datos.update({
+                'estado': self.estado,
+                'fallos_consecutivos': self._fallos_consecutivos,
+                'umbral_fallos': self.umbral_fallos,
+                'espera_apertura': self.espera_apertura,
+                'ultimo_error': self._ultimo_error
+            })
+            if self.estado != 'cerrado':
+                datos['segundos_abierto'] = round(time.monotonic() - self._abierto_desde, 1)
+        return datos
+
+
+circuito = CircuitoConexion(
+    umbral_fallos=int(os.getenv('DB_CIRCUITO_FALLOS', '3')),
+    espera_apertura=float(os.getenv('DB_CIRCUITO_ESPERA', '30'))
+)
+
+def _opciones_conexion():
+    """Timeouts de conexión y de sentencia (DB_CONNECT_TIMEOUT en segundos, DB_STATEMENT_TIMEOUT en ms; 0 = sin límite)"""
+    # CursorMedido cuenta consultas y tiempo de BD de cada petición (ver metricas.py)
+    opciones = {'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', '5')), 'cursor_factory': CursorMedido}
+    statement_timeout = int(os.getenv('DB_STATEMENT_TIMEOUT', '15000'))
+    if statement_timeout > 0:
+        opciones['options'] = f'-c statement_timeout={statement_timeout}'
+    return opciones
+
+def crear_conexion(permitida=False):
+    """Abre una conexión a PostgreSQL: un solo intento, sin sleep, protegido por el circuit breaker.
+
+    Devuelve None si falla o si el circuito está abierto; el reintento lo hace la siguiente
+    petición (o el intento de prueba del circuito) en lugar de bloquear al worker.
+    permitida=True indica que quien llama ya obtuvo el paso con circuito.permitir().
+    """
+    if not permitida and not circuito.permitir():
+        return None
 
-def resetear_secuencias():
-    """Función CRÍTICA: Resetea las secuencias de las tablas"""
-    conexion = None
-    cursor = None
-    
     try:
-        conexion = crear_conexion()
-        if not conexion:
-            print("💥 No se pudo conectar para resetear secuencias")
-            return False
+        opciones = _opciones_conexion()
+
+        # Usar DATABASE_URL si existe
+        database_url = os.getenv('DATABASE_URL')
+
+        if database_url:
+            if database_url.startswith("postgres://"):
+                database_url = database_url.replace("postgres://", "postgresql://", 1)
+
+            # Agregar sslmode si es necesario para Render
+            if 'render.com' in database_url and 'sslmode=' not in database_url:
+                database_url += '?sslmode=require'
+
+            logger.debug("Conectando con DATABASE_URL", extra={'url': f"{database_url.split('@')[0]}@***"})
+            conexion = psycopg2.connect(database_url, **opciones)
+
+        else:
+            # Usar variables individuales
+            user = os.getenv('DB_USER', 'soporte_tecnico_9sad_user')
+            password = os.getenv('DB_PASSWORD', 'T56GYS30j5w4k6zrdlvAh1GfExjT0t7a')
+            host = os.getenv('DB_HOST', 'dpg-d3g1q2nqaa0ldt0j7vug-a.oregon-postgres.render.com')
+            port = os.getenv('DB_PORT', '5432')
+            dbname = os.getenv('DB_NAME', 'soporte_tecnico_9sad')
+
+            logger.debug("Conectando con DB_HOST", extra={'host': host, 'db': dbname, 'usuario_db': user})
+
+            # Para Render, usar sslmode=require
+            if 'render.com' in host:
+                opciones['sslmode'] = 'require'
+            conexion = psycopg2.connect(
+                host=host,
+                database=dbname,
+                user=user,
+                password=password,
+                port=port,
+                **opciones
+            )
 
+        # Verificar que la conexión funciona
         cursor = conexion.cursor()
-        
-        print("🔄 Reseteando secuencias...")
-        
-        # Resetear secuencia de usuarios
-        cursor.execute("""
-            SELECT setval('usuarios_id_seq', COALESCE((SELECT MAX(id) FROM usuarios), 1), false)
-        """)
-        print("✅ Secuencia 'usuarios_id_seq' reseteada")
-        
-        # Resetear secuencia de fichas
-        cursor.execute("""
-            SELECT setval('fichas_id_seq', COALESCE((SELECT MAX(id) FROM fichas), 1), false)
-        """)
-        print("✅ Secuencia 'fichas_id_seq' reseteada")
-        
-        conexion.commit()
-        print("🎉 Secuencias reseteadas correctamente")
-        return True
+        cursor.execute("SELECT 1")
+        cursor.close()
+        conexion.rollback()
+
+        circuito.registrar_exito()
+        logger.info("Conexión a PostgreSQL abierta", extra={'muestreo': True})
+        return conexion
 
     except Exception as err:
-        print(f"💥 Error reseteando secuencias: {str(err)}")
-        if conexion:
-            conexion.rollback()
-        return False
-        
-    finally:
-        if cursor:
+        circuito.registrar_fallo(err)
+        logger.warning("Conexión a PostgreSQL fallida", extra={'error': str(err).strip()})
+        return None
+
+class PoolConexiones:
+    """Pool de conexiones por proceso (cada worker de gunicorn tiene el suyo)"""
+
+    def __init__(self, minimo=1, maximo=10, timeout_espera=10, ping_segundos=30):
+        self.minimo = minimo
+        self.maximo = maximo
+        self.timeout_espera = timeout_espera
+        self.ping_segundos = ping_segundos
+        self.pid = os.getpid()
+        self._libres = []  # [(conexion, momento_devolucion)]
+        self._abiertas = 0
+        self._condicion = threading.Condition()
+        self.metricas = {
+            'checkouts': 0,
+            'esperas': 0,
+            'tiempo_espera_total': 0.0,
+            'timeouts': 0,
+            'creadas': 0,
+            'descartadas': 0,
+            'pings_fallidos': 0
+        }
+
+    def _ping(self, conexion):
+        """SELECT 1 sobre una conexión libre; se llama sin el lock del pool tomado"""
+        try:
+            cursor = conexion.cursor()
+            cursor.execute("SELECT 1")
             cursor.close()
-        if conexion:
+            conexion.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _contar_prestamo(self, inicio, esperado):
+        self.metricas['checkouts'] += 1
+        if esperado:
+            self.metricas['tiempo_espera_total'] += time.monotonic() - inicio
+
+    def _descartar(self, conexion):
+        try:
             conexion.close()
+        except Exception:
+            pass
+        self.metricas['descartadas'] += 1
 
-def crear_tablas():
-    """Función mejorada para crear tablas"""
-    print("🔧 Iniciando creación de tablas...")
-    
-    conexion = None
-    cursor = None
-    
-    try:
-        conexion = crear_conexion()
-        if not conexion:
-            print("💥 No se pudo conectar para crear tablas")
-            return False
+    def obtener(self):
+        """Presta una conexión del pool; devuelve None si no hay base de datos"""
+        inicio = time.perf_counter()
+        conexion = self._prestar()
+        registrar_espera_pool(time.perf_counter() - inicio)
+        return conexion
 
-        cursor = conexion.cursor()
+    def _prestar(self):
+        inicio = time.monotonic()
+        esperado = False
 
-        # Tabla usuarios
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS usuarios (
-                id SERIAL PRIMARY KEY,
-                usuario VARCHAR(50) UNIQUE NOT NULL,
-                password VARCHAR(255) NOT NULL,
-                rol VARCHAR(50) NOT NULL DEFAULT 'asesor',
-                permisos JSONB,
-                fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        print("✅ Tabla 'usuarios' lista")
-
-        # Tabla fichas
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS fichas (
-                id SERIAL PRIMARY KEY,
-                categoria VARCHAR(50) NOT NULL,
-                problema VARCHAR(255) NOT NULL,
-                descripcion TEXT,
-                causas TEXT,
-                solucion TEXT NOT NULL,
-                palabras_clave TEXT,
-                fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        print("✅ Tabla 'fichas' lista")
-
-        # Insertar usuario admin por defecto
-        cursor.execute("SELECT COUNT(*) FROM usuarios WHERE usuario = 'admin'")
-        if cursor.fetchone()[0] == 0:
-            password_hash = generate_password_hash('admin123')
-            permisos_admin = json.dumps({
-                'ver_fichas': True, 
-                'agregar_fichas': True,
-                'editar_fichas': True, 
-                'eliminar_fichas': True,
-                'cambiar_password': True
+        # Con el circuito abierto tampoco se prestan las conexiones libres (lo más probable es que estén
+        # muertas); en semiabierto la petición que gana el intento de prueba lo hace con una libre o una nueva
+        sondeo = False
+        if not circuito.disponible():
+            if not circuito.permitir():
+                return None
+            sondeo = True
+
+        while True:
+            candidata = None
+            with self._condicion:
+                while True:
+                    if self._libres:
+                        conexion, momento = self._libres.pop()
+                        if conexion.closed:
+                            self._abiertas -= 1
+                            self._descartar(conexion)
+                            continue
+                        if not sondeo and time.monotonic() - momento < self.ping_segundos:
+                            self._contar_prestamo(inicio, esperado)
+                            return conexion
+                        # Inactiva hace rato (o sondeo del circuito): ping fuera del lock, sin frenar a los demás hilos
+                        candidata = conexion
+                        break
+
+                    if self._abiertas < self.maximo:
+                        # Reservar el cupo y crear la conexión fuera del lock
+                        self._abiertas += 1
+                        break
+
+                    if not esperado:
+                        esperado = True
+                        self.metricas['esperas'] += 1
+                    restante = self.timeout_espera - (time.monotonic() - inicio)
+                    if restante <= 0 or not self._condicion.wait(restante):
+                        self.metricas['timeouts'] += 1
+                        logger.warning("Pool de conexiones agotado", extra={'espera_segundos': self.timeout_espera})
+                        if sondeo:
+                            circuito.cancelar_sondeo()
+                        return None
+
+            if candidata is None:
+                break
+
+            if self._ping(candidata):
+                if sondeo:
+                    circuito.registrar_exito()
+                with self._condicion:
+                    self._contar_prestamo(inicio, esperado)
+                return candidata
+
+            with self._condicion:
+                self.metricas['pings_fallidos'] += 1
+                self._abiertas -= 1
+                self._descartar(candidata)
+                self._condicion.notify()
+            if sondeo:
+                circuito.registrar_fallo("ping fallido en una conexión del pool")
+                return None
+
+        conexion = crear_conexion(permitida=sondeo)
+        with self._condicion:
+            if conexion is None:
+                self._abiertas -= 1
+                self._condicion.notify()
+                return None
+            self.metricas['creadas'] += 1
+            self._contar_prestamo(inicio, esperado)
+        return conexion
+
+    def devolver(self, conexion):
+        """Devuelve una conexión al pool, descartándola si quedó inservible"""
+        reutilizable = not conexion.closed
+        if reutilizable and conexion.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conexion.rollback()
+            except Exception:
+                reutilizable = False
+
+        with self._condicion:
+            if reutilizable:
+                self._libres.append((conexion, time.monotonic()))
+            else:
+                self._abiertas -= 1
+                self._descartar(conexion)
+            self._condicion.notify()
+
+    def precalentar(self):
+        """Abre las conexiones mínimas configuradas"""
+        conexiones = [self.obtener() for _ in range(self.minimo)]
+        for conexion in conexiones:
+            if conexion is not None:
+                self.devolver(conexion)
+
+    def estadisticas(self):
+        with self._condicion:
+            datos = dict(self.metricas)
+            datos.update({
+                'pid': self.pid,
+                'minimo': self.minimo,
+                'maximo': self.maximo,
+                'abiertas': self._abiertas,
+                'libres': len(self._libres),
+                'en_uso': self._abiertas - len(self._libres)
             })
-            cursor.execute(
-                "INSERT INTO usuarios (usuario, password, rol, permisos) VALUES (%s, %s, %s, %s)",
-                ('admin', password_hash, 'admin', permisos_admin)
-            )
-            print("✅ Usuario 'admin' creado (password: admin123)")
+        return datos
+
+    def cerrar(self):
+        with self._condicion:
+            while self._libres:
+                conexion, _ = self._libres.pop()
+                self._abiertas -= 1
+                self._descartar(conexion)
 
-        # RESETEAR SECUENCIAS DESPUÉS DE CREAR TABLAS
-        cursor.execute("""
-            SELECT setval('usuarios_id_seq', COALESCE((SELECT MAX(id) FROM usuarios), 1), true)
-        """)
-        cursor.execute("""
-            SELECT setval('fichas_id_seq', COALESCE((SELECT MAX(id) FROM fichas), 1), true)
-        """)
 
-        conexion.commit()
-        print("🎉 Base de datos inicializada CORRECTAMENTE")
-        return True
+_pool = None
+_pool_lock = threading.Lock()
+
+def obtener_pool():
+    """Devuelve el pool del proceso actual, creándolo si hace falta (por ejemplo tras un fork de gunicorn)"""
+    global _pool
+    pool = _pool
+    if pool is not None and pool.pid == os.getpid():
+        return pool
+    with _pool_lock:
+        if _pool is None or _pool.pid != os.getpid():
+            # Las conexiones heredadas del proceso padre no se cierran: sus sockets pertenecen al padre
+            _pool = PoolConexiones(
+                minimo=int(os.getenv('DB_POOL_MIN', '1')),
+                maximo=int(os.getenv('DB_POOL_MAX', '10')),
+                timeout_espera=float(os.getenv('DB_POOL_TIMEOUT', '10')),
+                ping_segundos=float(os.getenv('DB_POOL_PING_SEGUNDOS', '30'))
+            )
+            logger.info("Pool de conexiones creado", extra={'minimo': _pool.minimo, 'maximo': _pool.maximo})
+            _pool.precalentar()
+        return _pool
 
+@contextmanager
+def conexion_db():
+    """Presta una conexión del pool durante el bloque with (None si no hay conexión)"""
+    pool = obtener_pool()
+    conexion = pool.obtener()
+    try:
+        yield conexion
     except Exception as err:
-        print(f"💥 Error en creación de tablas: {str(err)}")
-        if conexion:
-            conexion.rollback()
-        return False
-        
+        if conexion is not None:
+            if not conexion.closed:
+                try:
+                    conexion.rollback()
+                except Exception:
+                    pass
+            if conexion.closed and isinstance(err, (psycopg2.OperationalError, psycopg2.InterfaceError)):
+                # El servidor cortó la conexión en medio de la petición: cuenta como fallo para el circuito
+                circuito.registrar_fallo(err)
+        raise
     finally:
-        if cursor:
-            cursor.close()
-        if conexion:
-            conexion.close()
+        if conexion is not None:
+            pool.devolver(conexion)
+
+def pool_actual():
+    """Pool de este proceso si ya existe, sin crearlo (para métricas)"""
+    pool = _pool
+    return pool if pool is not None and pool.pid == os.getpid() else None
+
+def estadisticas_pool():
+    """Métricas del pool del proceso actual y del circuit breaker"""
+    datos = obtener_pool().estadisticas()
+    datos['circuito'] = circuito.estadisticas()
+    return datos
+
+def base_datos_disponible():
+    """False mientras el circuit breaker mantiene cortado el acceso a PostgreSQL"""
+    return circuito.disponible()
 
 def verificar_tablas():
     """Verificar que las tablas existen"""
-    conexion = None
-    cursor = None
-    
     try:
-        conexion = crear_conexion()
-        if not conexion:
-            return False
+        with conexion_db() as conexion:
+            if not conexion:
+                return False
 
-        cursor = conexion.cursor()
-        
-        # Verificar tabla usuarios
-        cursor.execute("SELECT EXISTS (SELECT FROM information_schema.tables WHERE table_name = 'usuarios')")
-        usuarios_existe = cursor.fetchone()[0]
-        
-        # Verificar tabla fichas
-        cursor.execute("SELECT EXISTS (SELECT FROM information_schema.tables WHERE table_name = 'fichas')")
-        fichas_existe = cursor.fetchone()[0]
-        
-        print(f"📊 Tabla 'usuarios' existe: {usuarios_existe}")
-        print(f"📊 Tabla 'fichas' existe: {fichas_existe}")
-        
-        return usuarios_existe and fichas_existe
+            with conexion.cursor() as cursor:
+                # Verificar tabla usuarios
+                cursor.execute("SELECT EXISTS (SELECT FROM information_schema.tables WHERE table_name = 'usuarios')")
+                usuarios_existe = cursor.fetchone()[0]
+                
+                # Verificar tabla fichas
+                cursor.execute("SELECT EXISTS (SELECT FROM information_schema.tables WHERE table_name = 'fichas')")
+                fichas_existe = cursor.fetchone()[0]
+            
+            logger.info("Verificación de tablas", extra={'usuarios': usuarios_existe, 'fichas': fichas_existe})
+            
+            return usuarios_existe and fichas_existe
         
     except Exception as err:
-        print(f"💥 Error verificando tablas: {err}")
+        logger.exception("Error verificando tablas")
         return False
-        
-    finally:
-        if cursor:
-            cursor.close()
-        if conexion:
-            conexion.close()
 
 if __name__ == "__main__":
-    print("🚀 Inicializando base de datos...")
-    
-    # Primero resetear secuencias
-    print("🔄 Reseteando secuencias...")
-    if resetear_secuencias():
-        print("✅ Secuencias reseteadas")
-    else:
-        print("⚠️ No se pudieron resetear secuencias")
-    
-    # Luego crear tablas si es necesario
-    if crear_tablas():
-        print("🎉 ¡Base de datos lista!")
-    else:
-        print("💥 Error inicializando base de datos")
+    # El esquema ahora lo crean las migraciones versionadas (migraciones/*.sql)
+    from migrar import main
+    main()
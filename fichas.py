@@ -0,0 +1,85 @@
+import re
+from datetime import datetime
+
+# Canal de NOTIFY del trigger de versión de fichas (migraciones/0005_version_fichas.sql)
+CANAL_CAMBIOS = 'fichas_cambiadas'
+
+def codificar_cursor(fecha_actualizacion, id_ficha):
+    """Posición de la última ficha de una página: '2024-05-01T10:30:00.000000_42'"""
+    return f"{fecha_actualizacion.isoformat()}_{id_ficha}"
+
+def decodificar_cursor(token):
+    """Inverso de codificar_cursor; devuelve None si el token no es válido"""
+    try:
+        fecha, id_ficha = token.rsplit('_', 1)
+        return datetime.fromisoformat(fecha), int(id_ficha)
+    except (AttributeError, ValueError):
+        return None
+
+def separar_pasos(texto):
+    """Lista de pasos desde el texto del formulario: separados por '|' o por línea, sin la numeración "1. " """
+    partes = re.split(r'[|\n]', texto or '')
+    return [re.sub(r'^\d+\.\s*', '', parte.strip()) for parte in partes if parte.strip()]
+
+def problema_formulario(formulario):
+    """Problema elegido en el formulario; con "Otro problema con X" (o sin selección) vale el texto que
+    escribió el usuario en problema_real, así el catálogo aprende el nombre real del problema"""
+    problema = formulario.get('problema', '').strip()
+    problema_real = formulario.get('problema_real', '').strip()
+    if problema_real and (not problema or problema.startswith('Otro')):
+        return problema_real
+    return problema
+
+def guardar_pasos(cursor, id_ficha, tipo, pasos):
+    """Deja en fichas_pasos exactamente estos pasos; solo escribe las filas que cambiaron"""
+    cursor.execute("""
+        INSERT INTO fichas_pasos (ficha_id, tipo, orden, texto)
+        SELECT %s, %s, orden, texto FROM unnest(%s::text[]) WITH ORDINALITY AS pasos(texto, orden)
+        ON CONFLICT (ficha_id, tipo, orden) DO UPDATE SET texto = EXCLUDED.texto
+        WHERE fichas_pasos.texto IS DISTINCT FROM EXCLUDED.texto
+    """, (id_ficha, tipo, list(pasos)))
+    cursor.execute(
+        "DELETE FROM fichas_pasos WHERE ficha_id = %s AND tipo = %s AND orden > %s",
+        (id_ficha, tipo, len(pasos))
+    )
+
+def insertar_ficha(cursor, categoria, problema, descripcion, causas, solucion, palabras_clave, clave_idempotencia=None):
+    """INSERT ... RETURNING id de una ficha nueva y sus pasos (causas y solucion son listas). Devuelve (id, creada).
+
+    Con clave_idempotencia, reenviar el mismo formulario (doble clic, reintento tras un timeout)
+    devuelve la ficha que ya se creó con esa clave en lugar de duplicarla.
+    """
+    for _ in range(2):
+        cursor.execute("""
+            INSERT INTO fichas (categoria, problema, descripcion, palabras_clave, clave_idempotencia)
+            VALUES (%s, %s, %s, %s, %s)
+            ON CONFLICT (clave_idempotencia) DO NOTHING
+            RETURNING id
+        """, (categoria, problema, descripcion, palabras_clave, clave_idempotencia))
+        fila = cursor.fetchone()
+        if fila:
+            guardar_pasos(cursor, fila[0], 'causa', causas)
+            guardar_pasos(cursor, fila[0], 'solucion', solucion)
+            return fila[0], True
+
+        # Otro envío con la misma clave ya la insertó (si se esperó a su commit, ahora es visible)
+        cursor.execute("SELECT id FROM fichas WHERE clave_idempotencia = %s", (clave_idempotencia,))
+        fila = cursor.fetchone()
+        if fila:
+            return fila[0], False
+        # La ficha con esa clave se borró entre las dos consultas: insertar de nuevo
+    raise RuntimeError("No se pudo insertar la ficha con la clave de idempotencia indicada")
+
+def actualizar_ficha(cursor, id_ficha, categoria, problema, descripcion, causas, solucion, palabras_clave):
+    """UPDATE de los campos de la ficha y de los pasos que cambiaron. Devuelve False si la ficha no existe"""
+    cursor.execute("""
+        UPDATE fichas
+        SET categoria=%s, problema=%s, descripcion=%s, palabras_clave=%s,
+        fecha_actualizacion=CURRENT_TIMESTAMP
+        WHERE id=%s
+    """, (categoria, problema, descripcion, palabras_clave, id_ficha))
+    if cursor.rowcount == 0:
+        return False
+    guardar_pasos(cursor, id_ficha, 'causa', causas)
+    guardar_pasos(cursor, id_ficha, 'solucion', solucion)
+    return True
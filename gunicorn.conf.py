@@ -0,0 +1,107 @@
+# Configuración de gunicorn (se carga sola al ejecutar gunicorn desde esta carpeta)
+#
+# GUNICORN_WORKER_CLASS=gthread (por defecto): varios hilos por worker; el pool de conexiones
+#   y los caches son thread-safe.
+# GUNICORN_WORKER_CLASS=gevent: muchas peticiones por worker con greenlets; psycopg2 se vuelve
+#   cooperativo con psycogreen para que una consulta lenta no bloquee al resto.
+#
+# Conexiones a PostgreSQL: cada worker abre hasta DB_POOL_MAX conexiones más una de LISTEN (snapshot de
+# fichas), así que el total es workers x (DB_POOL_MAX + 1) y tiene que quedar por debajo del max_connections
+# del plan. DB_MAX_CONEXIONES es ese presupuesto para este servicio; si DB_POOL_MAX no está definido se
+# calcula a partir de él.
+import logging
+import math
+import os
+
+import bitacora
+
+logger = logging.getLogger('gunicorn.conf')
+
+def cpus_disponibles():
+    """CPUs que puede usar este contenedor: la cuota del cgroup y la afinidad, no las del host"""
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+    cuota = None
+    try:
+        # cgroup v2: "max 100000" o "200000 100000"
+        with open('/sys/fs/cgroup/cpu.max') as archivo:
+            limite, periodo = archivo.read().split()
+        if limite != 'max':
+            cuota = int(limite) / int(periodo)
+    except (OSError, ValueError):
+        try:
+            # cgroup v1
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as archivo:
+                limite = int(archivo.read())
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as archivo:
+                periodo = int(archivo.read())
+            if limite > 0:
+                cuota = limite / periodo
+        except (OSError, ValueError):
+            pass
+    if cuota is not None:
+        cpus = min(cpus, max(1, math.ceil(cuota)))
+    return cpus
+
+cpus = cpus_disponibles()
+
+# Tope de workers por defecto (WEB_CONCURRENCY lo reemplaza): más procesos solo multiplican conexiones y memoria
+MAX_WORKERS = int(os.getenv('GUNICORN_MAX_WORKERS', '8'))
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+
+if worker_class == 'gevent':
+    # Un worker por CPU basta: la concurrencia la dan los greenlets
+    workers = int(os.getenv('WEB_CONCURRENCY', str(min(cpus, MAX_WORKERS))))
+    worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '100'))
+else:
+    workers = int(os.getenv('WEB_CONCURRENCY', str(min(cpus * 2 + 1, MAX_WORKERS))))
+    threads = int(os.getenv('GUNICORN_THREADS', '4'))
+
+# Conexiones por worker: el pool más la de LISTEN deben entrar en el presupuesto del servicio.
+# Se pasa por el entorno, que los workers heredan (database.obtener_pool lee DB_POOL_MAX)
+max_conexiones = int(os.getenv('DB_MAX_CONEXIONES', '50'))
+if 'DB_POOL_MAX' not in os.environ:
+    # Nunca más que el default anterior (10): con gthread no hay más peticiones simultáneas que hilos
+    os.environ['DB_POOL_MAX'] = str(max(1, min(10, max_conexiones // workers - 1)))
+pool_max = int(os.environ['DB_POOL_MAX'])
+
+# Cargar la app en el proceso maestro comparte memoria entre workers; con gevent no,
+# porque el monkey patching tiene que ocurrir antes de importar la app
+preload_app = worker_class != 'gevent'
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+
+# Reciclar workers de vez en cuando (fugas de memoria), escalonados para no reiniciarlos a la vez
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '1000'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '100'))
+
+accesslog = '-'
+errorlog = '-'
+
+def post_worker_init(worker):
+    if worker_class == 'gevent':
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+        bitacora.configurar()
+        logger.info("psycopg2 en modo cooperativo (gevent)", extra={'worker': worker.pid})
+
+def on_starting(server):
+    bitacora.configurar()
+    logger.info("Gunicorn iniciando", extra={
+        'workers': workers,
+        'worker_class': worker_class,
+        'cpus': cpus,
+        'hilos': threads if worker_class != 'gevent' else None,
+        'conexiones_worker': worker_connections if worker_class == 'gevent' else None,
+        'db_pool_max': pool_max,
+        'db_conexiones_total': workers * (pool_max + 1)
+    })
+    if workers * (pool_max + 1) > max_conexiones:
+        logger.warning("workers x (DB_POOL_MAX + 1) supera DB_MAX_CONEXIONES", extra={
+            'workers': workers, 'db_pool_max': pool_max, 'db_max_conexiones': max_conexiones
+        })
+    if os.getenv('SESSION_STORE_URL') == 'memoria' and workers > 1:
+        logger.warning("SESSION_STORE_URL=memoria guarda las sesiones en cada worker: con varios workers usa Redis")
@@ -0,0 +1,157 @@
+# Variantes optimizadas (WebP/AVIF, varios anchos) de las capturas de static/img/soluciones.
+# Se generan en el build (python imagenes.py) y la app solo lee el manifiesto al arrancar.
+import hashlib
+import json
+import logging
+import os
+
+from markupsafe import Markup, escape
+
+logger = logging.getLogger(__name__)
+
+CARPETA_STATIC = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+CARPETA_ORIGEN = os.path.join(CARPETA_STATIC, 'img', 'soluciones')
+CARPETA_GENERADAS = os.path.join(CARPETA_ORIGEN, '_generadas')
+ARCHIVO_MANIFIESTO = os.path.join(CARPETA_GENERADAS, 'manifiesto.json')
+
+# Anchos de las miniaturas; el ancho original también se incluye
+ANCHOS = (320, 640, 1280)
+
+# Formatos en orden de preferencia (el navegador usa el primero que soporte)
+FORMATOS = (
+    ('avif', 'image/avif', {'quality': 50}),
+    ('webp', 'image/webp', {'quality': 80, 'method': 6})
+)
+
+TAMANOS_TARJETA = '(min-width: 1200px) 33vw, (min-width: 768px) 50vw, 100vw'
+
+def _formato_soportado(extension):
+    # Pillow 10 no trae codificador AVIF: lo registra pillow-avif-plugin (requirements.txt) al importarse
+    from PIL import Image
+    try:
+        import pillow_avif  # noqa: F401
+    except ImportError:
+        pass
+    return f'.{extension}' in Image.registered_extensions()
+
+def generar_variantes():
+    """Genera las variantes que falten y escribe el manifiesto. Requiere Pillow (solo en el build)."""
+    from PIL import Image
+
+    os.makedirs(CARPETA_GENERADAS, exist_ok=True)
+    formatos = [f for f in FORMATOS if _formato_soportado(f[0])]
+    for extension, _, _ in FORMATOS:
+        if not _formato_soportado(extension):
+            # El manifiesto solo lista los formatos generados: las páginas no ofrecen <source> de este tipo
+            logger.warning("Pillow no soporta el formato: no se generan sus variantes", extra={'formato': extension})
+    if not formatos:
+        return {}
+
+    manifiesto = {}
+    for raiz, carpetas, archivos in os.walk(CARPETA_ORIGEN):
+        carpetas[:] = [c for c in carpetas if os.path.join(raiz, c) != CARPETA_GENERADAS]
+        for nombre in sorted(archivos):
+            if not nombre.lower().endswith(('.png', '.jpg', '.jpeg')):
+                continue
+            ruta = os.path.join(raiz, nombre)
+            relativa = os.path.relpath(ruta, CARPETA_ORIGEN).replace(os.sep, '/')
+            with open(ruta, 'rb') as archivo:
+                huella = hashlib.sha1(archivo.read()).hexdigest()[:10]
+
+            with Image.open(ruta) as imagen:
+                imagen = imagen.convert('RGBA' if imagen.mode in ('RGBA', 'LA', 'P') else 'RGB')
+                ancho_original, alto_original = imagen.size
+                anchos = sorted({a for a in ANCHOS if a < ancho_original} | {ancho_original})
+                base = os.path.splitext(relativa)[0].replace('/', '_')
+
+                entrada = {'ancho': ancho_original, 'alto': alto_original, 'variantes': {}}
+                for extension, tipo, opciones in formatos:
+                    variantes = []
+                    for ancho in anchos:
+                        destino = f"{base}-{ancho}w.{huella}.{extension}"
+                        ruta_destino = os.path.join(CARPETA_GENERADAS, destino)
+                        if not os.path.exists(ruta_destino):
+                            alto = round(alto_original * ancho / ancho_original)
+                            copia = imagen if ancho == ancho_original else imagen.resize((ancho, alto), Image.LANCZOS)
+                            copia.save(ruta_destino, extension.upper(), **opciones)
+                        variantes.append([ancho, destino])
+                    entrada['variantes'][tipo] = variantes
+                manifiesto[relativa] = entrada
+                logger.info("Variantes de imagen generadas", extra={
+                    'imagen': relativa, 'anchos': len(anchos), 'formatos': [f[0] for f in formatos]
+                })
+
+    with open(ARCHIVO_MANIFIESTO, 'w', encoding='utf-8') as archivo:
+        json.dump(manifiesto, archivo, indent=2)
+    return manifiesto
+
+def cargar_manifiesto():
+    """Manifiesto generado en el build; vacío si no existe (se usan las imágenes originales)"""
+    try:
+        with open(ARCHIVO_MANIFIESTO, encoding='utf-8') as archivo:
+            return json.load(archivo)
+    except (OSError, ValueError):
+        return {}
+
+def registrar(app):
+    """Helpers de plantilla y cabeceras de cache para las variantes generadas.
+
+    Devuelve la versión del manifiesto (entra en el ETag de las páginas que usan las imágenes).
+    """
+    from flask import request, url_for
+
+    manifiesto = cargar_manifiesto()
+    version = hashlib.sha1(json.dumps(manifiesto, sort_keys=True).encode('utf-8')).hexdigest()[:10]
+
+    def _url(nombre):
+        return url_for('static', filename=f'img/soluciones/_generadas/{nombre}')
+
+    def imagen_responsive(ruta, alt='', clase='', tamanos=TAMANOS_TARJETA):
+        """<picture> con srcset AVIF/WebP y carga diferida; la imagen original queda de respaldo"""
+        original = url_for('static', filename=f'img/soluciones/{ruta}')
+        entrada = manifiesto.get(ruta)
+        if not entrada:
+            return Markup(
+                f'<img src="{original}" class="{escape(clase)}" alt="{escape(alt)}" loading="lazy" decoding="async">'
+            )
+        fuentes = []
+        for tipo, variantes in entrada['variantes'].items():
+            srcset = ', '.join(f'{_url(nombre)} {ancho}w' for ancho, nombre in variantes)
+            fuentes.append(f'<source type="{tipo}" srcset="{srcset}" sizes="{escape(tamanos)}">')
+        return Markup(
+            '<picture>' + ''.join(fuentes) +
+            f'<img src="{original}" class="{escape(clase)}" alt="{escape(alt)}" '
+            f'width="{entrada["ancho"]}" height="{entrada["alto"]}" loading="lazy" decoding="async">'
+            '</picture>'
+        )
+
+    def imagenes_grandes():
+        """Ruta original -> mejor variante WebP más ancha (para el carrusel en JS)"""
+        mapa = {}
+        for ruta, entrada in manifiesto.items():
+            variantes = entrada['variantes'].get('image/webp')
+            if variantes:
+                mapa[ruta] = _url(variantes[-1][1])
+        return mapa
+
+    app.jinja_env.globals.update(imagen_responsive=imagen_responsive, imagenes_grandes=imagenes_grandes)
+
+    @app.after_request
+    def cache_imagenes_generadas(respuesta):
+        # Los nombres llevan el hash del contenido: se pueden cachear "para siempre"
+        if request.endpoint == 'static' and request.path.startswith('/static/img/soluciones/_generadas/'):
+            if respuesta.status_code == 200 and not request.path.endswith('.json'):
+                respuesta.cache_control.no_cache = None
+                respuesta.cache_control.public = True
+                respuesta.cache_control.max_age = 31536000
+                respuesta.cache_control.immutable = True
+        return respuesta
+
+    return version
+
+if __name__ == '__main__':
+    import bitacora
+    bitacora.configurar()
+    resultado = generar_variantes()
+    logger.info("Variantes de imágenes listas", extra={'imagenes': len(resultado)})
+    bitacora.detener()
@@ -0,0 +1,468 @@
+# Importación y exportación masiva de fichas (CSV, JSONL y el volcado MySQL soporte_tecnico.sql).
+#
+# La importación lee el archivo como flujo, valida cada registro y carga lotes con COPY a una
+# tabla temporal; desde ahí hace upsert por id (las filas sin id se insertan como nuevas) y
+# reemplaza sus pasos en fichas_pasos. En los archivos, causas y solucion van separadas por '|'
+# (como en el volcado) o como listas en JSONL.
+# La exportación recorre la tabla con un cursor del lado del servidor y escribe por partes.
+#
+#   python importacion.py importar fichas.csv [--formato csv|jsonl|mysql] [--lote 5000]
+#   python importacion.py exportar fichas.jsonl [--formato csv|jsonl]
+#   python importacion.py convertir soporte_tecnico.sql fichas.jsonl
+import argparse
+import csv
+import io
+import json
+import logging
+import os
+import re
+import sys
+import time
+from datetime import datetime
+
+from fichas import separar_pasos
+
+logger = logging.getLogger(__name__)
+
+# Columnas que se importan/exportan, en este orden
+CAMPOS = ('id', 'categoria', 'problema', 'descripcion', 'causas', 'solucion', 'palabras_clave',
+          'fecha_creacion', 'fecha_actualizacion')
+OBLIGATORIOS = ('categoria', 'problema', 'solucion')
+CAMPOS_PASOS = ('causas', 'solucion')
+LARGOS_MAXIMOS = {'categoria': 50, 'problema': 255}
+
+# Filas por COPY/commit y máximo de errores detallados en el resumen
+TAMANO_LOTE = 5000
+MAX_ERRORES_RESUMEN = 100
+
+# Filas por FETCH del cursor de exportación y tamaño aproximado de cada fragmento escrito
+TAMANO_LOTE_EXPORTACION = 1000
+TAMANO_FRAGMENTO = 64 * 1024
+
+SQL_TABLA_TEMPORAL = """
+    CREATE TEMP TABLE IF NOT EXISTS importacion_fichas (
+        numero BIGINT,
+        id INTEGER,
+        nueva BOOLEAN NOT NULL DEFAULT false,
+        categoria TEXT,
+        problema TEXT,
+        descripcion TEXT,
+        causas TEXT[],
+        solucion TEXT[],
+        palabras_clave TEXT,
+        fecha_creacion TIMESTAMP,
+        fecha_actualizacion TIMESTAMP
+    ) ON COMMIT DELETE ROWS
+"""
+
+# Si el mismo id aparece varias veces en un lote, gana el último registro del archivo
+SQL_UPSERT_CON_ID = """
+    INSERT INTO fichas (id, categoria, problema, descripcion, palabras_clave, fecha_creacion, fecha_actualizacion)
+    SELECT DISTINCT ON (id) id, categoria, problema, descripcion, palabras_clave,
+           COALESCE(fecha_creacion, CURRENT_TIMESTAMP), COALESCE(fecha_actualizacion, CURRENT_TIMESTAMP)
+    FROM importacion_fichas
+    WHERE id IS NOT NULL
+    ORDER BY id, numero DESC
+    ON CONFLICT (id) DO UPDATE SET
+        categoria = EXCLUDED.categoria,
+        problema = EXCLUDED.problema,
+        descripcion = EXCLUDED.descripcion,
+        palabras_clave = EXCLUDED.palabras_clave,
+        -- Cuenta como edición: ETags y cache de fragmentos dependen de fecha_actualizacion
+        fecha_actualizacion = CURRENT_TIMESTAMP
+    RETURNING (xmax = 0) AS insertada
+"""
+
+# Tras importar ids explícitos, la identidad debe seguir por encima del mayor id (nunca hacia atrás)
+SQL_AJUSTAR_IDENTIDAD = """
+    SELECT setval(pg_get_serial_sequence('fichas', 'id'),
+                  GREATEST((SELECT COALESCE(MAX(id), 0) FROM fichas),
+                           nextval(pg_get_serial_sequence('fichas', 'id'))))
+"""
+
+# Las filas sin id reciben uno de la identidad antes de insertarse, para poder cargar sus pasos
+SQL_ASIGNAR_IDS = """
+    UPDATE importacion_fichas t
+    SET id = nuevos.id, nueva = true
+    FROM (
+        SELECT numero, nextval(pg_get_serial_sequence('fichas', 'id')) AS id
+        FROM (SELECT numero FROM importacion_fichas WHERE id IS NULL ORDER BY numero) pendientes
+    ) nuevos
+    WHERE t.numero = nuevos.numero
+"""
+
+SQL_INSERTAR_NUEVAS = """
+    INSERT INTO fichas (id, categoria, problema, descripcion, palabras_clave, fecha_creacion, fecha_actualizacion)
+    SELECT id, categoria, problema, descripcion, palabras_clave,
+           COALESCE(fecha_creacion, CURRENT_TIMESTAMP), COALESCE(fecha_actualizacion, CURRENT_TIMESTAMP)
+    FROM importacion_fichas
+    WHERE nueva
+    ORDER BY numero
+"""
+
+# Los pasos de las fichas importadas se reemplazan completos (la última aparición de cada id gana)
+SQL_BORRAR_PASOS = """
+    DELETE FROM fichas_pasos WHERE ficha_id IN (SELECT id FROM importacion_fichas WHERE NOT nueva)
+"""
+
+SQL_INSERTAR_PASOS = """
+    INSERT INTO fichas_pasos (ficha_id, tipo, orden, texto)
+    SELECT t.id, pasos.tipo, pasos.orden, pasos.texto
+    FROM (SELECT DISTINCT ON (id) id, causas, solucion FROM importacion_fichas ORDER BY id, numero DESC) t
+    CROSS JOIN LATERAL (
+        SELECT 'causa' AS tipo, orden, texto FROM unnest(t.causas) WITH ORDINALITY AS c(texto, orden)
+        UNION ALL
+        SELECT 'solucion', orden, texto FROM unnest(t.solucion) WITH ORDINALITY AS s(texto, orden)
+    ) pasos
+"""
+
+# ---------------------------------------------------------------- lectores
+
+def leer_csv(flujo):
+    """Registros de un CSV con encabezado (columnas con los nombres de CAMPOS; el resto se ignora)"""
+    yield from csv.DictReader(flujo)
+
+def leer_jsonl(flujo):
+    """Un objeto JSON por línea; las líneas vacías se saltan"""
+    for linea in flujo:
+        linea = linea.strip()
+        if not linea:
+            continue
+        try:
+            registro = json.loads(linea)
+        except ValueError as err:
+            registro = {'_error': f"JSON inválido: {err}"}
+        yield registro if isinstance(registro, dict) else {'_error': "Se esperaba un objeto JSON"}
+
+_INSERT_MYSQL = re.compile(r"^INSERT INTO `(\w+)` \(([^)]*)\) VALUES\s*(.*)$", re.DOTALL)
+_ESCAPES_MYSQL = {'n': '\n', 'r': '\r', 't': '\t', '0': '\0', 'Z': '\x1a'}
+
+def leer_volcado_mysql(flujo, tabla='fichas'):
+    """Filas de los INSERT INTO `tabla` de un volcado de MySQL/MariaDB (phpMyAdmin, mysqldump).
+
+    Recorre el archivo carácter a carácter sin cargarlo entero; entiende cadenas con
+    escapes \\' y '' y valores NULL.
+    """
+    columnas = None
+    en_insert = False
+    en_cadena = False
+    escape = False
+    posible_cierre = False
+    dentro_tupla = False
+    es_cadena = False
+    valor = []
+    tupla = []
+
+    def cerrar_valor():
+        nonlocal valor, es_cadena
+        if es_cadena:
+            tupla.append(''.join(valor))
+        else:
+            texto = ''.join(valor).strip()
+            tupla.append(None if texto.upper() == 'NULL' else texto)
+        valor = []
+        es_cadena = False
+
+    for linea in flujo:
+        if not en_insert:
+            coincidencia = _INSERT_MYSQL.match(linea)
+            if not coincidencia:
+                continue
+            en_insert = True
+            columnas = [c.strip().strip('`') for c in coincidencia.group(2).split(',')]
+            de_esta_tabla = coincidencia.group(1) == tabla
+            linea = coincidencia.group(3)
+
+        for caracter in linea:
+            if en_cadena:
+                if posible_cierre:
+                    posible_cierre = False
+                    if caracter == "'":
+                        # '' dentro de la cadena es una comilla literal
+                        valor.append("'")
+                        continue
+                    en_cadena = False
+                elif escape:
+                    valor.append(_ESCAPES_MYSQL.get(caracter, caracter))
+                    escape = False
+                    continue
+                elif caracter == '\\':
+                    escape = True
+                    continue
+                elif caracter == "'":
+                    posible_cierre = True
+                    continue
+                else:
+                    valor.append(caracter)
+                    continue
+
+            if not dentro_tupla:
+                if caracter == '(':
+                    dentro_tupla = True
+                    tupla = []
+                    valor = []
+                elif caracter == ';':
+                    en_insert = False
+                    break
+            elif caracter == "'":
+                en_cadena = True
+                es_cadena = True
+            elif caracter == ',':
+                cerrar_valor()
+            elif caracter == ')':
+                cerrar_valor()
+                dentro_tupla = False
+                if de_esta_tabla:
+                    yield dict(zip(columnas, tupla))
+            elif not caracter.isspace():
+                valor.append(caracter)
+
+LECTORES = {'csv': leer_csv, 'jsonl': leer_jsonl, 'mysql': leer_volcado_mysql}
+
+def detectar_formato(nombre_archivo):
+    """Formato por la extensión del archivo (None si no se reconoce)"""
+    extension = os.path.splitext(nombre_archivo or '')[1].lower()
+    return {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.sql': 'mysql'}.get(extension)
+
+# ---------------------------------------------------------------- validación
+
+def _fecha(valor):
+    if isinstance(valor, datetime):
+        return valor
+    return datetime.fromisoformat(str(valor).replace('T', ' ').replace('Z', ''))
+
+def validar_ficha(registro):
+    """Normaliza un registro leído del archivo. Devuelve (fila, errores)"""
+    if registro.get('_error'):
+        return None, [registro['_error']]
+
+    fila = {}
+    errores = []
+    for campo in CAMPOS:
+        valor = registro.get(campo)
+        if campo in CAMPOS_PASOS:
+            # Lista de pasos: como lista en JSON o separados por '|' en CSV y en el volcado
+            if isinstance(valor, list):
+                valor = [' '.join(str(paso).split()) for paso in valor if str(paso).strip()]
+            else:
+                valor = separar_pasos(valor if isinstance(valor, str) else None)
+        elif isinstance(valor, str):
+            valor = valor.strip() or None
+        fila[campo] = valor
+    # Los formularios siempre guardan descripción (las plantillas la recortan sin comprobar None)
+    fila['descripcion'] = fila['descripcion'] or ''
+
+    if fila['id'] is not None:
+        try:
+            fila['id'] = int(fila['id'])
+            if fila['id'] <= 0:
+                raise ValueError
+        except (TypeError, ValueError):
+            errores.append(f"id inválido: {fila['id']!r}")
+
+    for campo in ('fecha_creacion', 'fecha_actualizacion'):
+        if fila[campo] is not None:
+            try:
+                fila[campo] = _fecha(fila[campo])
+            except ValueError:
+                errores.append(f"{campo} inválida: {fila[campo]!r}")
+
+    for campo in OBLIGATORIOS:
+        if not fila[campo]:
+            errores.append(f"Falta {campo}")
+    for campo, maximo in LARGOS_MAXIMOS.items():
+        if fila[campo] is not None and len(fila[campo]) > maximo:
+            errores.append(f"{campo} supera {maximo} caracteres")
+
+    return fila, errores
+
+# ---------------------------------------------------------------- importación
+
+def _texto_copy(valor):
+    return (str(valor).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+def _valor_copy(valor):
+    """Valor en el formato de texto de COPY (tabuladores y saltos escapados, NULL = \\N, listas como text[])"""
+    if valor is None:
+        return '\\N'
+    if isinstance(valor, datetime):
+        return valor.isoformat(sep=' ')
+    if isinstance(valor, list):
+        elementos = ('"' + paso.replace('\\', '\\\\').replace('"', '\\"') + '"' for paso in valor)
+        return _texto_copy('{' + ','.join(elementos) + '}')
+    return _texto_copy(valor)
+
+def _cargar_lote(cursor, lote, resumen, con_ids):
+    buffer = io.StringIO()
+    for numero, fila in lote:
+        buffer.write('\t'.join([str(numero)] + [_valor_copy(fila[campo]) for campo in CAMPOS]) + '\n')
+    buffer.seek(0)
+
+    # Lotes grandes pueden superar el statement_timeout de las peticiones; el vocabulario se refresca al final
+    cursor.execute("SET LOCAL statement_timeout = 0")
+    cursor.execute("SELECT set_config('soporte.omitir_refresco_vocabulario', 'on', true)")
+    cursor.copy_expert(f"COPY importacion_fichas (numero, {', '.join(CAMPOS)}) FROM STDIN", buffer)
+
+    cursor.execute(SQL_UPSERT_CON_ID)
+    for (insertada,) in cursor.fetchall():
+        resumen['insertadas' if insertada else 'actualizadas'] += 1
+    if con_ids:
+        cursor.execute(SQL_AJUSTAR_IDENTIDAD)
+    cursor.execute(SQL_ASIGNAR_IDS)
+    cursor.execute(SQL_INSERTAR_NUEVAS)
+    resumen['insertadas'] += cursor.rowcount
+
+    cursor.execute(SQL_BORRAR_PASOS)
+    cursor.execute(SQL_INSERTAR_PASOS)
+
+def importar_fichas(conexion, registros, tamano_lote=TAMANO_LOTE):
+    """Valida y carga los registros por lotes (un commit por lote). Devuelve un resumen con los rechazos"""
+    inicio = time.perf_counter()
+    resumen = {'leidas': 0, 'insertadas': 0, 'actualizadas': 0, 'rechazadas': 0, 'errores': []}
+    con_ids = False
+
+    with conexion.cursor() as cursor:
+        cursor.execute(SQL_TABLA_TEMPORAL)
+        conexion.commit()
+
+        lote = []
+        for numero, registro in enumerate(registros, 1):
+            resumen['leidas'] += 1
+            fila, errores = validar_ficha(registro)
+            if errores:
+                resumen['rechazadas'] += 1
+                if len(resumen['errores']) < MAX_ERRORES_RESUMEN:
+                    resumen['errores'].append({'registro': numero, 'errores': errores})
+                continue
+
+            con_ids = con_ids or fila['id'] is not None
+            lote.append((numero, fila))
+            if len(lote) >= tamano_lote:
+                _cargar_lote(cursor, lote, resumen, con_ids)
+                conexion.commit()
+                lote = []
+                con_ids = False
+                logger.info("Lote de fichas importado", extra={'leidas': resumen['leidas']})
+
+        if lote:
+            _cargar_lote(cursor, lote, resumen, con_ids)
+            conexion.commit()
+
+        if resumen['insertadas'] or resumen['actualizadas']:
+            cursor.execute("SET LOCAL statement_timeout = 0")
+            cursor.execute("SELECT to_regclass('fichas_vocabulario')")
+            if cursor.fetchone()[0] is not None:
+                cursor.execute("SELECT reconstruir_fichas_vocabulario()")
+            conexion.commit()
+
+    resumen['segundos'] = round(time.perf_counter() - inicio, 3)
+    logger.info("Importación de fichas terminada", extra={
+        clave: valor for clave, valor in resumen.items() if clave != 'errores'
+    })
+    return resumen
+
+# ---------------------------------------------------------------- exportación
+
+def _fila_json(fila):
+    return json.dumps(
+        {campo: (valor.isoformat() if isinstance(valor, datetime) else valor) for campo, valor in zip(CAMPOS, fila)},
+        ensure_ascii=False
+    ) + '\n'
+
+def _fila_csv(fila):
+    return ['|'.join(valor) if isinstance(valor, list) else valor for valor in fila]
+
+def exportar_fichas(conexion, formato='csv'):
+    """Generador de fragmentos de texto con todas las fichas ordenadas por id.
+
+    Usa un cursor con nombre (del lado del servidor): en memoria solo hay TAMANO_LOTE_EXPORTACION filas.
+    """
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer) if formato == 'csv' else None
+    if escritor:
+        escritor.writerow(CAMPOS)
+
+    with conexion.cursor(name='exportar_fichas') as cursor:
+        cursor.itersize = TAMANO_LOTE_EXPORTACION
+        cursor.execute(f"SELECT {', '.join(CAMPOS)} FROM fichas_detalle ORDER BY id")
+        for fila in cursor:
+            if escritor:
+                escritor.writerow(_fila_csv(fila))
+            else:
+                buffer.write(_fila_json(fila))
+            if buffer.tell() >= TAMANO_FRAGMENTO:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+# ---------------------------------------------------------------- CLI
+
+def _abrir_conexion():
+    from database import crear_conexion
+    conexion = crear_conexion()
+    if conexion is None:
+        logger.error("No se pudo conectar a PostgreSQL")
+        sys.exit(1)
+    return conexion
+
+def main():
+    import bitacora
+    bitacora.configurar()
+
+    parser = argparse.ArgumentParser(description="Importación y exportación masiva de fichas")
+    comandos = parser.add_subparsers(dest='comando', required=True)
+
+    importar = comandos.add_parser('importar', help="Carga fichas desde CSV, JSONL o un volcado MySQL")
+    importar.add_argument('archivo')
+    importar.add_argument('--formato', choices=sorted(LECTORES))
+    importar.add_argument('--lote', type=int, default=TAMANO_LOTE)
+
+    exportar = comandos.add_parser('exportar', help="Escribe todas las fichas en CSV o JSONL")
+    exportar.add_argument('archivo')
+    exportar.add_argument('--formato', choices=('csv', 'jsonl'))
+
+    convertir = comandos.add_parser('convertir', help="Convierte el volcado MySQL a JSONL (sin base de datos)")
+    convertir.add_argument('origen')
+    convertir.add_argument('destino')
+
+    argumentos = parser.parse_args()
+    try:
+        if argumentos.comando == 'importar':
+            formato = argumentos.formato or detectar_formato(argumentos.archivo)
+            if formato not in LECTORES:
+                parser.error("No se reconoce el formato: indica --formato")
+            conexion = _abrir_conexion()
+            try:
+                with open(argumentos.archivo, encoding='utf-8-sig', newline='') as flujo:
+                    resumen = importar_fichas(conexion, LECTORES[formato](flujo), argumentos.lote)
+            finally:
+                conexion.close()
+            for error in resumen['errores']:
+                logger.warning("Registro rechazado", extra=error)
+
+        elif argumentos.comando == 'exportar':
+            formato = argumentos.formato or detectar_formato(argumentos.archivo) or 'csv'
+            conexion = _abrir_conexion()
+            try:
+                with open(argumentos.archivo, 'w', encoding='utf-8', newline='') as salida:
+                    for fragmento in exportar_fichas(conexion, formato):
+                        salida.write(fragmento)
+            finally:
+                conexion.close()
+            logger.info("Exportación de fichas terminada", extra={'archivo': argumentos.archivo})
+
+        else:
+            with open(argumentos.origen, encoding='utf-8') as flujo, \
+                    open(argumentos.destino, 'w', encoding='utf-8') as salida:
+                for registro in leer_volcado_mysql(flujo):
+                    salida.write(json.dumps({campo: registro.get(campo) for campo in CAMPOS}, ensure_ascii=False) + '\n')
+            logger.info("Volcado convertido", extra={'destino': argumentos.destino})
+    finally:
+        bitacora.detener()
+
+if __name__ == '__main__':
+    main()
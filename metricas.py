@@ -0,0 +1,284 @@
+# Métricas de latencia por endpoint, tiempo de BD y de plantillas (/metrics y cabecera Server-Timing).
+# Cada worker de gunicorn lleva sus propios contadores; la etiqueta worker distingue las series.
+import hmac
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+
+import psycopg2.extensions
+from flask import g, has_request_context, request, Response, before_render_template, template_rendered
+
+logger = logging.getLogger(__name__)
+
+# Límites (segundos) de los histogramas de latencia
+LIMITES_PETICION = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LIMITES_ESPERA_POOL = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+
+class Histograma:
+    """Histograma acumulativo al estilo Prometheus (no thread-safe: lo protege RegistroMetricas)"""
+
+    __slots__ = ('limites', 'cubetas', 'suma', 'cuenta')
+
+    def __init__(self, limites):
+        self.limites = limites
+        self.cubetas = [0] * len(limites)
+        self.suma = 0.0
+        self.cuenta = 0
+
+    def observar(self, valor):
+        indice = bisect_left(self.limites, valor)
+        if indice < len(self.cubetas):
+            self.cubetas[indice] += 1
+        self.suma += valor
+        self.cuenta += 1
+
+    def copiar(self):
+        copia = Histograma(self.limites)
+        copia.cubetas = list(self.cubetas)
+        copia.suma = self.suma
+        copia.cuenta = self.cuenta
+        return copia
+
+    def lineas(self, nombre, etiquetas):
+        acumulado = 0
+        for limite, cantidad in zip(self.limites, self.cubetas):
+            acumulado += cantidad
+            yield f'{nombre}_bucket{_etiquetas(etiquetas, le=limite)} {acumulado}'
+        yield f'{nombre}_bucket{_etiquetas(etiquetas, le="+Inf")} {self.cuenta}'
+        yield f'{nombre}_sum{_etiquetas(etiquetas)} {self.suma:.6f}'
+        yield f'{nombre}_count{_etiquetas(etiquetas)} {self.cuenta}'
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _etiquetas(etiquetas, **extra):
+    todas = dict(etiquetas, **extra)
+    if not todas:
+        return ''
+    return '{' + ','.join(f'{clave}="{_escapar(valor)}"' for clave, valor in todas.items()) + '}'
+
+def _numero(valor):
+    return f'{valor:.6f}' if isinstance(valor, float) else str(valor)
+
+class RegistroMetricas:
+    """Contadores e histogramas del proceso actual"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.peticiones = {}        # (endpoint, método, estado) -> cantidad
+        self.latencias = {}         # (endpoint, método) -> Histograma
+        self.db_consultas = {}      # endpoint -> cantidad
+        self.db_segundos = {}       # endpoint -> segundos
+        self.plantilla_segundos = {}
+        self.espera_pool = Histograma(LIMITES_ESPERA_POOL)
+
+    def registrar_peticion(self, endpoint, metodo, estado, duracion, consultas, segundos_db, segundos_plantilla):
+        with self._lock:
+            clave = (endpoint, metodo, estado)
+            self.peticiones[clave] = self.peticiones.get(clave, 0) + 1
+            histograma = self.latencias.get((endpoint, metodo))
+            if histograma is None:
+                histograma = self.latencias[(endpoint, metodo)] = Histograma(LIMITES_PETICION)
+            histograma.observar(duracion)
+            self.db_consultas[endpoint] = self.db_consultas.get(endpoint, 0) + consultas
+            self.db_segundos[endpoint] = self.db_segundos.get(endpoint, 0.0) + segundos_db
+            self.plantilla_segundos[endpoint] = self.plantilla_segundos.get(endpoint, 0.0) + segundos_plantilla
+
+    def registrar_espera_pool(self, segundos):
+        with self._lock:
+            self.espera_pool.observar(segundos)
+
+    def exportar(self, extras=()):
+        """Texto en formato de exposición de Prometheus"""
+        worker = {'worker': os.getpid()}
+        lineas = []
+        with self._lock:
+            lineas.append('# HELP peticiones_total Peticiones HTTP atendidas')
+            lineas.append('# TYPE peticiones_total counter')
+            for (endpoint, metodo, estado), cantidad in sorted(self.peticiones.items()):
+                lineas.append(f'peticiones_total{_etiquetas(worker, endpoint=endpoint, metodo=metodo, estado=estado)} {cantidad}')
+
+            lineas.append('# HELP peticion_duracion_segundos Latencia de las peticiones por endpoint')
+            lineas.append('# TYPE peticion_duracion_segundos histogram')
+            for (endpoint, metodo), histograma in sorted(self.latencias.items()):
+                lineas.extend(histograma.lineas('peticion_duracion_segundos', dict(worker, endpoint=endpoint, metodo=metodo)))
+
+            for nombre, ayuda, valores in (
+                ('db_consultas_total', 'Consultas SQL ejecutadas por endpoint', self.db_consultas),
+                ('db_consulta_segundos_total', 'Tiempo dentro de PostgreSQL por endpoint', self.db_segundos),
+                ('plantilla_render_segundos_total', 'Tiempo renderizando plantillas por endpoint', self.plantilla_segundos)
+            ):
+                lineas.append(f'# HELP {nombre} {ayuda}')
+                lineas.append(f'# TYPE {nombre} counter')
+                for endpoint, valor in sorted(valores.items()):
+                    lineas.append(f'{nombre}{_etiquetas(worker, endpoint=endpoint)} {_numero(valor)}')
+
+            lineas.append('# HELP db_pool_espera_segundos Espera para obtener una conexión del pool')
+            lineas.append('# TYPE db_pool_espera_segundos histogram')
+            lineas.extend(self.espera_pool.lineas('db_pool_espera_segundos', worker))
+
+        for nombre, tipo, ayuda, series in extras:
+            lineas.append(f'# HELP {nombre} {ayuda}')
+            lineas.append(f'# TYPE {nombre} {tipo}')
+            for etiquetas, valor in series:
+                if tipo == 'histogram':
+                    lineas.extend(valor.lineas(nombre, dict(worker, **etiquetas)))
+                else:
+                    lineas.append(f'{nombre}{_etiquetas(worker, **etiquetas)} {_numero(valor)}')
+        return '\n'.join(lineas) + '\n'
+
+
+registro = RegistroMetricas()
+
+# Otras fuentes de series para /metrics: funciones sin argumentos que devuelven [(nombre, tipo, ayuda, series)]
+_fuentes = []
+
+def agregar_fuente(funcion):
+    _fuentes.append(funcion)
+
+def _peticion_actual():
+    """Acumuladores de la petición en curso (None fuera de una petición, p.ej. el hilo de LISTEN)"""
+    if has_request_context():
+        return g.get('_metricas')
+    return None
+
+class CursorMedido(psycopg2.extensions.cursor):
+    """Cursor de psycopg2 que suma cuántas consultas hace cada petición y cuánto tardan"""
+
+    def _medir(self, metodo, *args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return metodo(*args, **kwargs)
+        finally:
+            actual = _peticion_actual()
+            if actual is not None:
+                actual['db_consultas'] += 1
+                actual['db_segundos'] += time.perf_counter() - inicio
+
+    def execute(self, query, vars=None):
+        return self._medir(super().execute, query, vars)
+
+    def executemany(self, query, vars_list):
+        return self._medir(super().executemany, query, vars_list)
+
+    def callproc(self, procname, parameters=None):
+        return self._medir(super().callproc, procname, parameters)
+
+    def copy_expert(self, sql, file, size=8192):
+        return self._medir(super().copy_expert, sql, file, size)
+
+def registrar_espera_pool(segundos):
+    """Lo llama el pool de conexiones con el tiempo que tardó en prestar una conexión"""
+    registro.registrar_espera_pool(segundos)
+    actual = _peticion_actual()
+    if actual is not None:
+        actual['pool_segundos'] += segundos
+
+def _inicio_plantilla(app, template, context, **extra):
+    actual = _peticion_actual()
+    if actual is not None:
+        actual['plantillas'].append(time.perf_counter())
+
+def _fin_plantilla(app, template, context, **extra):
+    actual = _peticion_actual()
+    if actual is not None and actual['plantillas']:
+        inicio = actual['plantillas'].pop()
+        # Solo la plantilla más externa: los fragmentos anidados ya están dentro de su tiempo
+        if not actual['plantillas']:
+            actual['plantilla_segundos'] += time.perf_counter() - inicio
+
+def _metricas_del_proceso():
+    """Series del pool (solo si este worker ya lo creó: el scrape no abre conexiones) y del circuit breaker"""
+    from database import circuito as circuito_bd, pool_actual
+    series = []
+    pool = pool_actual()
+    if pool is not None:
+        datos = pool.estadisticas()
+        series += [
+            ('db_pool_conexiones', 'gauge', 'Conexiones del pool por estado',
+             [({'estado': estado}, datos[estado]) for estado in ('abiertas', 'libres', 'en_uso')]),
+            ('db_pool_timeouts_total', 'counter', 'Peticiones que no obtuvieron conexión a tiempo',
+             [({}, datos['timeouts'])])
+        ]
+    circuito = circuito_bd.estadisticas()
+    return series + [
+        ('db_circuito_abierto', 'gauge', '1 mientras el circuit breaker corta el acceso a la BD',
+         [({}, 0 if circuito['estado'] == 'cerrado' else 1)]),
+        ('db_circuito_transiciones_total', 'counter', 'Cambios de estado del circuit breaker',
+         [({'transicion': transicion}, cantidad) for transicion, cantidad in sorted(circuito['transiciones'].items())])
+    ]
+
+def _scrape_permitido(token):
+    """Con METRICS_TOKEN se exige "Authorization: Bearer <token>"; sin él, solo desde la propia máquina"""
+    if token:
+        return hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+    return request.remote_addr in ('127.0.0.1', '::1')
+
+def registrar(app):
+    """Middleware de medición, cabecera Server-Timing y endpoint /metrics"""
+    token = os.getenv('METRICS_TOKEN')
+    if not token:
+        logger.info("METRICS_TOKEN no definido: /metrics solo responde a peticiones locales")
+
+    before_render_template.connect(_inicio_plantilla, app)
+    template_rendered.connect(_fin_plantilla, app)
+
+    @app.before_request
+    def iniciar_medicion():
+        g._metricas = {
+            'inicio': time.perf_counter(),
+            'db_consultas': 0,
+            'db_segundos': 0.0,
+            'pool_segundos': 0.0,
+            'plantilla_segundos': 0.0,
+            'plantillas': []
+        }
+
+    def registrar_medicion(actual, estado):
+        duracion = time.perf_counter() - actual['inicio']
+        registro.registrar_peticion(request.endpoint or 'sin_ruta', request.method, estado, duracion,
+                                    actual['db_consultas'], actual['db_segundos'], actual['plantilla_segundos'])
+        return duracion
+
+    @app.after_request
+    def terminar_medicion(respuesta):
+        actual = g.pop('_metricas', None)
+        if actual is None:
+            return respuesta
+        duracion = registrar_medicion(actual, respuesta.status_code)
+        endpoint = request.endpoint or 'sin_ruta'
+
+        if endpoint != 'static':
+            respuesta.headers['Server-Timing'] = ', '.join([
+                f'db;dur={actual["db_segundos"] * 1000:.1f};desc="{actual["db_consultas"]} consultas"',
+                f'pool;dur={actual["pool_segundos"] * 1000:.1f}',
+                f'tpl;dur={actual["plantilla_segundos"] * 1000:.1f}',
+                f'total;dur={duracion * 1000:.1f}'
+            ])
+        return respuesta
+
+    @app.teardown_request
+    def medir_excepcion(error):
+        # Si la petición terminó sin pasar por after_request (excepción propagada, after_request que falló)
+        # la medición sigue en g: cuenta como 500
+        actual = g.pop('_metricas', None)
+        if actual is not None:
+            registrar_medicion(actual, 500)
+
+    @app.route('/metrics')
+    def metrics():
+        if not _scrape_permitido(token):
+            return Response('No autorizado\n', status=401, mimetype='text/plain')
+        try:
+            extras = _metricas_del_proceso()
+        except Exception:
+            logger.exception("Error leyendo métricas del pool")
+            extras = []
+        for fuente in _fuentes:
+            try:
+                extras.extend(fuente())
+            except Exception:
+                logger.exception("Error leyendo métricas", extra={'fuente': getattr(fuente, '__qualname__', '')})
+        return Response(registro.exportar(extras), mimetype='text/plain; version=0.0.4; charset=utf-8')
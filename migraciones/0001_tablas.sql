@@ -0,0 +1,26 @@
+-- Tablas base. IF NOT EXISTS: las bases creadas antes de las migraciones ya las tienen.
+CREATE TABLE IF NOT EXISTS usuarios (
+    id SERIAL PRIMARY KEY,
+    usuario VARCHAR(50) UNIQUE NOT NULL,
+    password VARCHAR(255) NOT NULL,
+    rol VARCHAR(50) NOT NULL DEFAULT 'asesor',
+    permisos JSONB,
+    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS fichas (
+    id SERIAL PRIMARY KEY,
+    categoria VARCHAR(50) NOT NULL,
+    problema VARCHAR(255) NOT NULL,
+    descripcion TEXT,
+    causas TEXT,
+    solucion TEXT NOT NULL,
+    palabras_clave TEXT,
+    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Las filas importadas con id explícito dejan las secuencias atrasadas: ajustarlas una vez
+SELECT setval('usuarios_id_seq', COALESCE((SELECT MAX(id) FROM usuarios), 1), (SELECT MAX(id) FROM usuarios) IS NOT NULL);
+SELECT setval('fichas_id_seq', COALESCE((SELECT MAX(id) FROM fichas), 1), (SELECT MAX(id) FROM fichas) IS NOT NULL);
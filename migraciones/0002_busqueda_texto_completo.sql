@@ -0,0 +1,18 @@
+-- Índice de texto completo (español + sin acentos) sobre todos los campos de la ficha.
+-- unaccent() no es IMMUTABLE, por eso se envuelve en f_unaccent para poder usarlo en una columna generada.
+CREATE EXTENSION IF NOT EXISTS unaccent;
+
+CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text AS
+$$ SELECT public.unaccent('public.unaccent', $1) $$
+LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT;
+
+ALTER TABLE fichas ADD COLUMN IF NOT EXISTS busqueda tsvector
+GENERATED ALWAYS AS (
+    setweight(to_tsvector('spanish', f_unaccent(coalesce(problema, ''))), 'A') ||
+    setweight(to_tsvector('spanish', f_unaccent(coalesce(palabras_clave, ''))), 'A') ||
+    setweight(to_tsvector('spanish', f_unaccent(coalesce(descripcion, ''))), 'B') ||
+    setweight(to_tsvector('spanish', f_unaccent(coalesce(causas, ''))), 'C') ||
+    setweight(to_tsvector('spanish', f_unaccent(coalesce(solucion, ''))), 'C')
+) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_fichas_busqueda ON fichas USING GIN (busqueda);
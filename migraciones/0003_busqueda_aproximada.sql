@@ -0,0 +1,35 @@
+-- Búsqueda aproximada (tolerante a errores de tipeo) con trigramas
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_fichas_problema_trgm
+ON fichas USING GIN (f_unaccent(lower(problema)) gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_fichas_palabras_clave_trgm
+ON fichas USING GIN (f_unaccent(lower(coalesce(palabras_clave, ''))) gin_trgm_ops);
+
+-- Vocabulario para el "¿quisiste decir?": una fila por palabra, refrescado por trigger
+CREATE MATERIALIZED VIEW IF NOT EXISTS fichas_vocabulario AS
+SELECT palabra, count(*) AS frecuencia
+FROM (
+    SELECT regexp_split_to_table(
+        f_unaccent(lower(problema || ' ' || coalesce(palabras_clave, ''))), '[^a-z0-9]+'
+    ) AS palabra
+    FROM fichas
+) palabras
+WHERE length(palabra) >= 3
+GROUP BY palabra;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_fichas_vocabulario_palabra ON fichas_vocabulario (palabra);
+CREATE INDEX IF NOT EXISTS idx_fichas_vocabulario_trgm ON fichas_vocabulario USING GIN (palabra gin_trgm_ops);
+
+CREATE OR REPLACE FUNCTION refrescar_fichas_vocabulario() RETURNS trigger AS $$
+BEGIN
+    REFRESH MATERIALIZED VIEW fichas_vocabulario;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_fichas_vocabulario ON fichas;
+CREATE TRIGGER trg_fichas_vocabulario
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON fichas
+FOR EACH STATEMENT EXECUTE FUNCTION refrescar_fichas_vocabulario();
@@ -0,0 +1,4 @@
+-- Índice para recorrer el listado por (fecha_actualizacion, id) sin ordenar toda la tabla
+UPDATE fichas SET fecha_actualizacion = COALESCE(fecha_creacion, CURRENT_TIMESTAMP) WHERE fecha_actualizacion IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_fichas_listado ON fichas (fecha_actualizacion DESC, id DESC);
@@ -0,0 +1,23 @@
+-- Contador de versión de las fichas: lo incrementa un trigger en cada escritura y avisa por
+-- NOTIFY en el canal fichas_cambiadas (fichas.CANAL_CAMBIOS) a los snapshots de cada worker
+CREATE TABLE IF NOT EXISTS fichas_version (
+    id SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT INTO fichas_version (id, version) VALUES (1, 0) ON CONFLICT (id) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION notificar_cambio_fichas() RETURNS trigger AS $$
+DECLARE
+    nueva BIGINT;
+BEGIN
+    UPDATE fichas_version SET version = version + 1 WHERE id = 1 RETURNING version INTO nueva;
+    PERFORM pg_notify('fichas_cambiadas', nueva::text);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_fichas_version ON fichas;
+CREATE TRIGGER trg_fichas_version
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON fichas
+FOR EACH STATEMENT EXECUTE FUNCTION notificar_cambio_fichas();
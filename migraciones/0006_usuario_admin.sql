@@ -0,0 +1,9 @@
+-- Usuario admin inicial (contraseña admin123: cambiarla después del primer ingreso)
+INSERT INTO usuarios (usuario, password, rol, permisos)
+VALUES (
+    'admin',
+    'pbkdf2:sha256:600000$nClPaI8PgiArfiJR$fad8b46f19542cf9f32e227f03ea057ff66464e317fec1607ba0345303a604e6',
+    'admin',
+    '{"ver_fichas": true, "agregar_fichas": true, "editar_fichas": true, "eliminar_fichas": true, "cambiar_password": true}'
+)
+ON CONFLICT (usuario) DO NOTHING;
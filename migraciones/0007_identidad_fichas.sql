@@ -0,0 +1,16 @@
+-- Columnas identity en lugar de SERIAL: la secuencia queda ligada a la columna y se ajusta
+-- una sola vez aquí, sin setval(MAX(id)) en cada arranque ni tras un error de clave duplicada.
+-- BY DEFAULT permite seguir importando filas con id explícito.
+ALTER TABLE fichas ALTER COLUMN id DROP DEFAULT;
+DROP SEQUENCE IF EXISTS fichas_id_seq;
+ALTER TABLE fichas ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY;
+SELECT setval(pg_get_serial_sequence('fichas', 'id'), COALESCE(MAX(id), 0) + 1, false) FROM fichas;
+
+ALTER TABLE usuarios ALTER COLUMN id DROP DEFAULT;
+DROP SEQUENCE IF EXISTS usuarios_id_seq;
+ALTER TABLE usuarios ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY;
+SELECT setval(pg_get_serial_sequence('usuarios', 'id'), COALESCE(MAX(id), 0) + 1, false) FROM usuarios;
+
+-- Clave enviada con el formulario de alta: un reenvío o reintento devuelve la ficha ya creada
+ALTER TABLE fichas ADD COLUMN IF NOT EXISTS clave_idempotencia VARCHAR(64);
+ALTER TABLE fichas ADD CONSTRAINT fichas_clave_idempotencia_key UNIQUE (clave_idempotencia);
@@ -0,0 +1,10 @@
+-- Las importaciones masivas cargan miles de fichas por lote: el vocabulario se refresca
+-- una sola vez al final (importacion.py) en vez de tras cada sentencia.
+CREATE OR REPLACE FUNCTION refrescar_fichas_vocabulario() RETURNS trigger AS $$
+BEGIN
+    IF coalesce(current_setting('soporte.omitir_refresco_vocabulario', true), '') <> 'on' THEN
+        REFRESH MATERIALIZED VIEW fichas_vocabulario;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
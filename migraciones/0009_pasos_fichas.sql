@@ -0,0 +1,53 @@
+-- Causas y pasos de solución en filas propias (antes TEXT separado por '|' dentro de fichas).
+-- Cada paso se indexa y se busca por separado, y editar un paso solo toca su fila.
+CREATE TABLE IF NOT EXISTS fichas_pasos (
+    ficha_id INTEGER NOT NULL REFERENCES fichas(id) ON DELETE CASCADE,
+    tipo VARCHAR(10) NOT NULL CHECK (tipo IN ('causa', 'solucion')),
+    orden SMALLINT NOT NULL,
+    texto TEXT NOT NULL,
+    busqueda tsvector GENERATED ALWAYS AS (setweight(to_tsvector('spanish', f_unaccent(texto)), 'C')) STORED,
+    PRIMARY KEY (ficha_id, tipo, orden)
+);
+
+CREATE INDEX IF NOT EXISTS idx_fichas_pasos_busqueda ON fichas_pasos USING GIN (busqueda);
+
+INSERT INTO fichas_pasos (ficha_id, tipo, orden, texto)
+SELECT id, tipo, row_number() OVER (PARTITION BY id, tipo ORDER BY posicion), texto
+FROM (
+    -- Sin la numeración "1. " que algunas fichas guardaban dentro del texto
+    SELECT f.id, p.tipo, partes.posicion, regexp_replace(trim(partes.texto), '^\d+\.\s*', '') AS texto
+    FROM fichas f
+    CROSS JOIN LATERAL (VALUES ('causa', f.causas), ('solucion', f.solucion)) AS p(tipo, valor)
+    CROSS JOIN LATERAL unnest(regexp_split_to_array(p.valor, E'[|\n]')) WITH ORDINALITY AS partes(texto, posicion)
+) pasos
+WHERE texto <> ''
+ON CONFLICT DO NOTHING;
+
+-- El índice de texto completo de fichas deja de incluir causas y solución (ahora en fichas_pasos.busqueda)
+ALTER TABLE fichas DROP COLUMN IF EXISTS busqueda;
+ALTER TABLE fichas ADD COLUMN busqueda tsvector
+GENERATED ALWAYS AS (
+    setweight(to_tsvector('spanish', f_unaccent(coalesce(problema, ''))), 'A') ||
+    setweight(to_tsvector('spanish', f_unaccent(coalesce(palabras_clave, ''))), 'A') ||
+    setweight(to_tsvector('spanish', f_unaccent(coalesce(descripcion, ''))), 'B')
+) STORED;
+CREATE INDEX IF NOT EXISTS idx_fichas_busqueda ON fichas USING GIN (busqueda);
+
+ALTER TABLE fichas DROP COLUMN IF EXISTS causas;
+ALTER TABLE fichas DROP COLUMN IF EXISTS solucion;
+
+-- Modelo de lectura: la ficha con sus pasos ya agrupados y ordenados (text[] -> lista en psycopg2)
+CREATE OR REPLACE VIEW fichas_detalle AS
+SELECT f.id, f.categoria, f.problema, f.descripcion,
+       ARRAY(SELECT p.texto FROM fichas_pasos p
+             WHERE p.ficha_id = f.id AND p.tipo = 'causa' ORDER BY p.orden) AS causas,
+       ARRAY(SELECT p.texto FROM fichas_pasos p
+             WHERE p.ficha_id = f.id AND p.tipo = 'solucion' ORDER BY p.orden) AS solucion,
+       f.palabras_clave, f.fecha_creacion, f.fecha_actualizacion, f.busqueda
+FROM fichas f;
+
+-- Cambiar solo pasos también cuenta como cambio para los snapshots de los workers
+DROP TRIGGER IF EXISTS trg_fichas_pasos_version ON fichas_pasos;
+CREATE TRIGGER trg_fichas_pasos_version
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON fichas_pasos
+FOR EACH STATEMENT EXECUTE FUNCTION notificar_cambio_fichas();
@@ -0,0 +1,13 @@
+-- Aviso a los demás workers cuando cambia el rol, los permisos o el nombre de un usuario, o cuando se
+-- elimina: descartan el User que tienen en cache_usuarios (canal usuarios_cambiados, repositorios.CANAL_USUARIOS)
+CREATE OR REPLACE FUNCTION notificar_cambio_usuario() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('usuarios_cambiados', OLD.id::text);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_usuarios_aviso ON usuarios;
+CREATE TRIGGER trg_usuarios_aviso
+AFTER UPDATE OF usuario, rol, permisos OR DELETE ON usuarios
+FOR EACH ROW EXECUTE FUNCTION notificar_cambio_usuario();
@@ -0,0 +1,97 @@
+-- El vocabulario del "¿quisiste decir?" pasa de vista materializada (REFRESH completo y bloqueo exclusivo en
+-- cada escritura sobre fichas) a una tabla que cada fila modificada actualiza sumando o restando sus palabras.
+DROP TRIGGER IF EXISTS trg_fichas_vocabulario ON fichas;
+DROP FUNCTION IF EXISTS refrescar_fichas_vocabulario();
+DROP MATERIALIZED VIEW IF EXISTS fichas_vocabulario;
+
+CREATE TABLE IF NOT EXISTS fichas_vocabulario (
+    palabra TEXT PRIMARY KEY,
+    frecuencia INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_fichas_vocabulario_trgm ON fichas_vocabulario USING GIN (palabra gin_trgm_ops);
+
+-- Palabras (de 3 o más letras) que aporta una ficha, con cuántas veces aparece cada una
+CREATE OR REPLACE FUNCTION palabras_vocabulario(problema TEXT, palabras_clave TEXT)
+RETURNS TABLE (palabra TEXT, cantidad INTEGER) AS $$
+    SELECT palabra, count(*)::INTEGER
+    FROM regexp_split_to_table(f_unaccent(lower(problema || ' ' || coalesce(palabras_clave, ''))), '[^a-z0-9]+') AS palabra
+    WHERE length(palabra) >= 3
+    GROUP BY palabra
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Reconstrucción completa: al crear la tabla y al final de una importación masiva (importacion.py)
+CREATE OR REPLACE FUNCTION reconstruir_fichas_vocabulario() RETURNS void AS $$
+    DELETE FROM fichas_vocabulario;
+    INSERT INTO fichas_vocabulario (palabra, frecuencia)
+    SELECT p.palabra, sum(p.cantidad)
+    FROM fichas f
+    CROSS JOIN LATERAL palabras_vocabulario(f.problema, f.palabras_clave) p
+    GROUP BY p.palabra;
+$$ LANGUAGE sql;
+
+SELECT reconstruir_fichas_vocabulario();
+
+CREATE OR REPLACE FUNCTION actualizar_fichas_vocabulario() RETURNS trigger AS $$
+DECLARE
+    nuevo_problema TEXT;
+    nuevas_claves TEXT;
+    viejo_problema TEXT;
+    viejas_claves TEXT;
+    palabras TEXT[];
+    cantidades INTEGER[];
+BEGIN
+    -- Las importaciones masivas reconstruyen el vocabulario una sola vez al terminar
+    IF coalesce(current_setting('soporte.omitir_refresco_vocabulario', true), '') = 'on' THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP <> 'DELETE' THEN
+        nuevo_problema := NEW.problema;
+        nuevas_claves := NEW.palabras_clave;
+    END IF;
+    IF TG_OP <> 'INSERT' THEN
+        viejo_problema := OLD.problema;
+        viejas_claves := OLD.palabras_clave;
+    END IF;
+
+    -- Ordenadas por palabra: dos escrituras concurrentes bloquean las mismas filas en el mismo orden
+    SELECT array_agg(palabra ORDER BY palabra), array_agg(cantidad ORDER BY palabra)
+    INTO palabras, cantidades
+    FROM (
+        SELECT palabra, sum(cantidad)::INTEGER AS cantidad
+        FROM (
+            SELECT palabra, cantidad FROM palabras_vocabulario(nuevo_problema, nuevas_claves)
+            UNION ALL
+            SELECT palabra, -cantidad FROM palabras_vocabulario(viejo_problema, viejas_claves)
+        ) cambios
+        GROUP BY palabra
+        HAVING sum(cantidad) <> 0
+    ) diferencia;
+
+    IF palabras IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    INSERT INTO fichas_vocabulario AS v (palabra, frecuencia)
+    SELECT * FROM unnest(palabras, cantidades)
+    ON CONFLICT (palabra) DO UPDATE SET frecuencia = v.frecuencia + EXCLUDED.frecuencia;
+    DELETE FROM fichas_vocabulario WHERE palabra = ANY(palabras) AND frecuencia <= 0;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_fichas_vocabulario
+AFTER INSERT OR DELETE OR UPDATE OF problema, palabras_clave ON fichas
+FOR EACH ROW EXECUTE FUNCTION actualizar_fichas_vocabulario();
+
+CREATE OR REPLACE FUNCTION vaciar_fichas_vocabulario() RETURNS trigger AS $$
+BEGIN
+    TRUNCATE fichas_vocabulario;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_fichas_vocabulario_truncate ON fichas;
+CREATE TRIGGER trg_fichas_vocabulario_truncate
+AFTER TRUNCATE ON fichas
+FOR EACH STATEMENT EXECUTE FUNCTION vaciar_fichas_vocabulario();
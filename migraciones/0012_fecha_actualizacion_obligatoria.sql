@@ -0,0 +1,4 @@
+-- Los ETag, la cache de fragmentos y el cursor del listado usan fecha_actualizacion: nunca puede quedar NULL
+UPDATE fichas SET fecha_actualizacion = COALESCE(fecha_creacion, CURRENT_TIMESTAMP) WHERE fecha_actualizacion IS NULL;
+ALTER TABLE fichas ALTER COLUMN fecha_actualizacion SET DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE fichas ALTER COLUMN fecha_actualizacion SET NOT NULL;
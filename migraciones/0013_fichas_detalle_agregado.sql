@@ -0,0 +1,15 @@
+-- fichas_detalle agrupa los pasos de cada ficha con una sola lectura de fichas_pasos (antes, dos
+-- subconsultas ARRAY(...) correlacionadas por fila). LATERAL mantiene el plan por índice en las
+-- consultas que leen pocas fichas (una ficha, una página del listado).
+CREATE OR REPLACE VIEW fichas_detalle AS
+SELECT f.id, f.categoria, f.problema, f.descripcion,
+       coalesce(p.causas, '{}') AS causas,
+       coalesce(p.solucion, '{}') AS solucion,
+       f.palabras_clave, f.fecha_creacion, f.fecha_actualizacion, f.busqueda
+FROM fichas f
+LEFT JOIN LATERAL (
+    SELECT array_agg(texto ORDER BY orden) FILTER (WHERE tipo = 'causa') AS causas,
+           array_agg(texto ORDER BY orden) FILTER (WHERE tipo = 'solucion') AS solucion
+    FROM fichas_pasos
+    WHERE ficha_id = f.id
+) p ON true;
@@ -0,0 +1,18 @@
+-- Guardar una ficha son varias sentencias (UPDATE de fichas, INSERT y DELETE de sus pasos) y los triggers
+-- por sentencia subían la versión y mandaban un NOTIFY en cada una, aunque no tocaran filas: cada worker
+-- recargaba su snapshot varias veces por escritura. Ahora la versión sube una sola vez por transacción.
+CREATE OR REPLACE FUNCTION notificar_cambio_fichas() RETURNS trigger AS $$
+DECLARE
+    nueva BIGINT;
+BEGIN
+    -- set_config(..., true) dura hasta el fin de la transacción (y se deshace con un ROLLBACK TO SAVEPOINT,
+    -- igual que el UPDATE de abajo)
+    IF coalesce(current_setting('soporte.version_fichas_subida', true), '') = 'on' THEN
+        RETURN NULL;
+    END IF;
+    PERFORM set_config('soporte.version_fichas_subida', 'on', true);
+    UPDATE fichas_version SET version = version + 1 WHERE id = 1 RETURNING version INTO nueva;
+    PERFORM pg_notify('fichas_cambiadas', nueva::text);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,130 @@
+# Migraciones versionadas del esquema: archivos migraciones/NNNN_nombre.sql aplicados en orden.
+# Se ejecuta una vez por despliegue (start.sh) antes de arrancar gunicorn; los workers no tocan el esquema.
+import hashlib
+import logging
+import os
+import re
+import sys
+import time
+
+import bitacora
+from database import crear_conexion
+
+logger = logging.getLogger(__name__)
+
+CARPETA_MIGRACIONES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migraciones')
+PATRON_ARCHIVO = re.compile(r'^(\d{4})_(\w+)\.sql$')
+
+# Advisory lock: si varios procesos migran a la vez, uno aplica y los demás esperan y no encuentran pendientes
+CLAVE_BLOQUEO = 'soporte_tecnico.migraciones'
+
+SQL_TABLA_VERSION = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        nombre VARCHAR(100) NOT NULL,
+        checksum VARCHAR(40) NOT NULL,
+        aplicada_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+def listar_migraciones():
+    """Migraciones de la carpeta ordenadas por versión: [{'version', 'nombre', 'sql', 'checksum'}]"""
+    migraciones = []
+    for archivo in sorted(os.listdir(CARPETA_MIGRACIONES)):
+        coincidencia = PATRON_ARCHIVO.match(archivo)
+        if not coincidencia:
+            continue
+        with open(os.path.join(CARPETA_MIGRACIONES, archivo), encoding='utf-8') as entrada:
+            sql = entrada.read()
+        migraciones.append({
+            'version': int(coincidencia.group(1)),
+            'nombre': coincidencia.group(2),
+            'sql': sql,
+            'checksum': hashlib.sha1(sql.encode('utf-8')).hexdigest()
+        })
+
+    versiones = [migracion['version'] for migracion in migraciones]
+    if len(versiones) != len(set(versiones)):
+        raise ValueError(f"Hay números de migración repetidos en {CARPETA_MIGRACIONES}")
+    return migraciones
+
+def versiones_aplicadas(cursor):
+    """{version: checksum} de las migraciones ya registradas en schema_version"""
+    cursor.execute("SELECT version, checksum FROM schema_version")
+    return dict(cursor.fetchall())
+
+def aplicar_migraciones(conexion):
+    """Aplica las migraciones pendientes, cada una en su transacción; devuelve las versiones aplicadas"""
+    aplicadas = []
+    with conexion.cursor() as cursor:
+        # Crear índices sobre tablas grandes puede superar el statement_timeout de las peticiones
+        cursor.execute("SET statement_timeout = 0")
+        cursor.execute("SELECT pg_advisory_lock(hashtext(%s))", (CLAVE_BLOQUEO,))
+        conexion.commit()
+        try:
+            cursor.execute(SQL_TABLA_VERSION)
+            conexion.commit()
+            registradas = versiones_aplicadas(cursor)
+
+            for migracion in listar_migraciones():
+                checksum = registradas.get(migracion['version'])
+                if checksum is not None:
+                    if checksum != migracion['checksum']:
+                        logger.warning("Migración modificada después de aplicarse (no se vuelve a ejecutar)",
+                                       extra={'version': migracion['version'], 'nombre': migracion['nombre']})
+                    continue
+
+                inicio = time.perf_counter()
+                cursor.execute(migracion['sql'])
+                cursor.execute(
+                    "INSERT INTO schema_version (version, nombre, checksum) VALUES (%s, %s, %s)",
+                    (migracion['version'], migracion['nombre'], migracion['checksum'])
+                )
+                conexion.commit()
+                aplicadas.append(migracion['version'])
+                logger.info("Migración aplicada", extra={
+                    'version': migracion['version'],
+                    'nombre': migracion['nombre'],
+                    'segundos': round(time.perf_counter() - inicio, 3)
+                })
+        except Exception:
+            conexion.rollback()
+            raise
+        finally:
+            cursor.execute("SELECT pg_advisory_unlock(hashtext(%s))", (CLAVE_BLOQUEO,))
+            conexion.commit()
+    return aplicadas
+
+def migrar():
+    """Abre una conexión propia (fuera del pool) y aplica lo pendiente; False si no se pudo"""
+    conexion = crear_conexion()
+    if conexion is None:
+        logger.error("No se pudo conectar para aplicar migraciones")
+        return False
+    try:
+        aplicadas = aplicar_migraciones(conexion)
+        logger.info("Esquema al día", extra={'aplicadas': aplicadas})
+        return True
+    except Exception:
+        logger.exception("Error aplicando migraciones")
+        return False
+    finally:
+        conexion.close()
+
+def main():
+    bitacora.configurar()
+    # Al desplegar sí se puede esperar a que PostgreSQL responda (todavía no hay peticiones)
+    intentos = int(os.getenv('DB_INICIO_INTENTOS', '10'))
+    for intento in range(intentos):
+        if migrar():
+            break
+        if intento < intentos - 1:
+            logger.warning("Reintentando las migraciones en 5 segundos", extra={'intento': intento + 1})
+            time.sleep(5)
+    else:
+        bitacora.detener()
+        sys.exit(1)
+    bitacora.detener()
+
+if __name__ == '__main__':
+    main()
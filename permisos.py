@@ -0,0 +1,79 @@
+# Permisos de usuario: usuarios.permisos (JSONB) se decodifica una sola vez al cargar el usuario y se compila,
+# junto con el rol, en un ConjuntoPermisos inmutable (máscara de bits). Los usuarios con el mismo rol y los
+# mismos permisos comparten el conjunto; comprobar un permiso es un AND de enteros.
+import json
+import logging
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+# Permisos conocidos; cada uno ocupa un bit de la máscara
+PERMISOS = (
+    'ver_fichas',
+    'agregar_fichas',
+    'editar_fichas',
+    'eliminar_fichas',
+    'cambiar_password',
+    'gestion_soluciones_visuales'
+)
+BITS = {permiso: 1 << posicion for posicion, permiso in enumerate(PERMISOS)}
+TODOS = (1 << len(PERMISOS)) - 1
+
+# Permisos de cada rol antes de aplicar los de usuarios.permisos (un rol desconocido parte sin permisos)
+PERMISOS_POR_ROL = {
+    'admin': TODOS,
+    'asesor': BITS['ver_fichas'] | BITS['cambiar_password']
+}
+
+# Roles que tienen todos los permisos aunque usuarios.permisos diga otra cosa
+ROLES_SIN_RESTRICCIONES = frozenset({'admin'})
+
+def decodificar_permisos(valor):
+    """usuarios.permisos como dict: psycopg2 ya entrega el JSONB decodificado; el texto (datos importados) se parsea"""
+    if isinstance(valor, dict):
+        return valor
+    if isinstance(valor, (str, bytes)) and valor.strip():
+        try:
+            decodificado = json.loads(valor)
+        except ValueError:
+            logger.warning("Permisos de usuario con JSON inválido: se usan los del rol")
+            return {}
+        return decodificado if isinstance(decodificado, dict) else {}
+    return {}
+
+class ConjuntoPermisos:
+    """Permisos efectivos de un usuario (inmutable); 'permiso in conjunto' es la comprobación rápida"""
+    __slots__ = ('mascara', 'nombres')
+
+    def __init__(self, mascara):
+        self.mascara = mascara
+        self.nombres = frozenset(permiso for permiso in PERMISOS if mascara & BITS[permiso])
+
+    def __contains__(self, permiso):
+        return bool(self.mascara & BITS.get(permiso, 0))
+
+    def como_dict(self):
+        """{permiso: bool} con todos los permisos conocidos (mismo formato que usuarios.permisos)"""
+        return {permiso: bool(self.mascara & bit) for permiso, bit in BITS.items()}
+
+    def __repr__(self):
+        return f"ConjuntoPermisos({sorted(self.nombres)})"
+
+@lru_cache(maxsize=256)
+def _compilar(rol, activados, quitados):
+    if rol in ROLES_SIN_RESTRICCIONES:
+        return ConjuntoPermisos(TODOS)
+    return ConjuntoPermisos((PERMISOS_POR_ROL.get(rol, 0) | activados) & ~quitados)
+
+def compilar_permisos(rol, permisos=None):
+    """Conjunto del rol con los permisos que usuarios.permisos activa o quita (dict, JSON en texto o None)"""
+    if isinstance(permisos, ConjuntoPermisos):
+        return permisos
+    activados = quitados = 0
+    for permiso, activo in decodificar_permisos(permisos).items():
+        bit = BITS.get(permiso, 0)
+        if activo:
+            activados |= bit
+        else:
+            quitados |= bit
+    return _compilar(rol, activados, quitados)
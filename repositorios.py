@@ -0,0 +1,160 @@
+# Capa de lectura de fichas y usuarios: cada consulta nombra sus columnas y cada fila se convierte en un
+# objeto con __slots__ (sin dict por fila). Agregar una columna a la tabla ya no corre posiciones en las vistas.
+from busqueda import COLUMNAS_FICHA, buscar_fichas, buscar_fichas_aproximado
+from fichas import codificar_cursor, decodificar_cursor
+from permisos import decodificar_permisos
+
+# Columnas de fichas_detalle para las tarjetas de index.html (sin solucion ni fecha_creacion), en el orden de TarjetaFicha
+COLUMNAS_TARJETA = "id, categoria, problema, descripcion, causas, palabras_clave, fecha_actualizacion"
+
+# Columnas de usuarios en el orden de Usuario; la contraseña solo se lee donde se verifica
+COLUMNAS_USUARIO = "id, usuario, rol, permisos, fecha_creacion, fecha_actualizacion"
+COLUMNAS_USUARIO_CON_PASSWORD = COLUMNAS_USUARIO + ", password"
+
+# Canal de NOTIFY del trigger de usuarios (migraciones/0010_aviso_usuarios.sql); la carga es el id
+CANAL_USUARIOS = 'usuarios_cambiados'
+
+class Ficha:
+    """Ficha completa (COLUMNAS_FICHA); los templates la usan igual que el dict que armaban las rutas (causas y solucion: tuplas de pasos)"""
+    __slots__ = ('id', 'categoria', 'problema', 'descripcion', 'causas', 'solucion',
+                 'palabras_clave', 'fecha_creacion', 'fecha_actualizacion')
+
+    def __init__(self, id, categoria, problema, descripcion, causas, solucion,
+                 palabras_clave, fecha_creacion, fecha_actualizacion):
+        self.id = id
+        self.categoria = categoria
+        self.problema = problema
+        self.descripcion = descripcion
+        self.causas = tuple(causas or ())
+        self.solucion = tuple(solucion or ())
+        self.palabras_clave = palabras_clave
+        self.fecha_creacion = fecha_creacion
+        self.fecha_actualizacion = fecha_actualizacion
+
+class TarjetaFicha:
+    """Lo que muestra una tarjeta del listado (COLUMNAS_TARJETA)"""
+    __slots__ = ('id', 'categoria', 'problema', 'descripcion', 'causas', 'palabras_clave', 'fecha_actualizacion')
+
+    def __init__(self, id, categoria, problema, descripcion, causas, palabras_clave, fecha_actualizacion):
+        self.id = id
+        self.categoria = categoria
+        self.problema = problema
+        self.descripcion = descripcion
+        self.causas = tuple(causas or ())
+        self.palabras_clave = palabras_clave
+        self.fecha_actualizacion = fecha_actualizacion
+
+class Usuario:
+    """Fila de usuarios (COLUMNAS_USUARIO y, si se pidió, la contraseña)"""
+    __slots__ = ('id', 'usuario', 'rol', 'permisos', 'fecha_creacion', 'fecha_actualizacion', 'password')
+
+    def __init__(self, id, usuario, rol, permisos, fecha_creacion, fecha_actualizacion, password=None):
+        self.id = id
+        self.usuario = usuario
+        self.rol = rol
+        self.permisos = permisos
+        self.fecha_creacion = fecha_creacion
+        self.fecha_actualizacion = fecha_actualizacion
+        self.password = password
+
+    @property
+    def permisos_parsed(self):
+        return decodificar_permisos(self.permisos)
+
+class RepositorioFichas:
+    """Consultas de lectura de fichas sobre un cursor ya abierto"""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def obtener(self, id_ficha):
+        """Ficha completa o None"""
+        self.cursor.execute(f"SELECT {COLUMNAS_FICHA} FROM fichas_detalle WHERE id = %s", (id_ficha,))
+        fila = self.cursor.fetchone()
+        return Ficha(*fila) if fila else None
+
+    def obtener_varias(self, ids):
+        """{id: Ficha} de los ids pedidos en una sola consulta (los que no existen no aparecen)"""
+        self.cursor.execute(f"SELECT {COLUMNAS_FICHA} FROM fichas_detalle WHERE id = ANY(%s)", (list(ids),))
+        return {fila[0]: Ficha(*fila) for fila in self.cursor.fetchall()}
+
+    def todas(self):
+        """Todas las fichas completas (carga del snapshot)"""
+        self.cursor.execute(f"SELECT {COLUMNAS_FICHA} FROM fichas_detalle")
+        return [Ficha(*fila) for fila in self.cursor.fetchall()]
+
+    def version(self, id_ficha):
+        """(id, fecha_actualizacion) de una ficha, o None si no existe"""
+        self.cursor.execute("SELECT id, fecha_actualizacion FROM fichas WHERE id = %s", (id_ficha,))
+        return self.cursor.fetchone()
+
+    def pagina(self, limite, despues=None):
+        """Página de tarjetas ordenada por fecha_actualizacion DESC (paginación keyset).
+
+        Devuelve (tarjetas, siguiente) donde siguiente es el token para pedir la próxima página o None.
+        """
+        posicion = decodificar_cursor(despues) if despues else None
+
+        if posicion:
+            self.cursor.execute(f"""
+                SELECT {COLUMNAS_TARJETA} FROM fichas_detalle
+                WHERE (fecha_actualizacion, id) < (%s, %s)
+                ORDER BY fecha_actualizacion DESC, id DESC
+                LIMIT %s
+            """, (posicion[0], posicion[1], limite + 1))
+        else:
+            self.cursor.execute(f"""
+                SELECT {COLUMNAS_TARJETA} FROM fichas_detalle
+                ORDER BY fecha_actualizacion DESC, id DESC
+                LIMIT %s
+            """, (limite + 1,))
+
+        filas = self.cursor.fetchall()
+        tarjetas = [TarjetaFicha(*fila) for fila in filas[:limite]]
+
+        siguiente = None
+        if len(filas) > limite:
+            siguiente = codificar_cursor(tarjetas[-1].fecha_actualizacion, tarjetas[-1].id)
+        return tarjetas, siguiente
+
+    def conteos_por_categoria(self):
+        """Totales por categoría para el panel de estadísticas"""
+        self.cursor.execute("SELECT categoria, COUNT(*) FROM fichas GROUP BY categoria")
+        return dict(self.cursor.fetchall())
+
+    def buscar(self, texto, categoria=''):
+        """Búsqueda de texto completo (busqueda.buscar_fichas) como fichas completas"""
+        return [Ficha(*fila) for fila in buscar_fichas(self.cursor, texto, categoria)]
+
+    def buscar_aproximado(self, texto, categoria=''):
+        """Búsqueda por trigramas; descarta la columna de similitud"""
+        return [Ficha(*fila[:9]) for fila in buscar_fichas_aproximado(self.cursor, texto, categoria)]
+
+class RepositorioUsuarios:
+    """Consultas de lectura de usuarios sobre un cursor ya abierto"""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def obtener(self, id_usuario):
+        """Usuario sin la contraseña, o None"""
+        self.cursor.execute(f"SELECT {COLUMNAS_USUARIO} FROM usuarios WHERE id = %s", (id_usuario,))
+        fila = self.cursor.fetchone()
+        return Usuario(*fila) if fila else None
+
+    def obtener_con_password(self, usuario):
+        """Usuario con su hash de contraseña (para verificar el login), o None"""
+        self.cursor.execute(f"SELECT {COLUMNAS_USUARIO_CON_PASSWORD} FROM usuarios WHERE usuario = %s", (usuario,))
+        fila = self.cursor.fetchone()
+        return Usuario(*fila) if fila else None
+
+    def password(self, id_usuario):
+        """Hash de contraseña de un usuario, o None"""
+        self.cursor.execute("SELECT password FROM usuarios WHERE id = %s", (id_usuario,))
+        fila = self.cursor.fetchone()
+        return fila[0] if fila else None
+
+    def listar(self):
+        """Todos los usuarios, los más recientes primero (sin contraseñas)"""
+        self.cursor.execute(f"SELECT {COLUMNAS_USUARIO} FROM usuarios ORDER BY fecha_creacion DESC")
+        return [Usuario(*fila) for fila in self.cursor.fetchall()]
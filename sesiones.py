@@ -0,0 +1,312 @@
+# Sesiones guardadas en el servidor (opcional, SESSION_STORE_URL): la cookie solo lleva un id aleatorio y los
+# datos de Flask-Login y los mensajes flash quedan en memoria (un solo proceso) o en Redis (varios workers o
+# nodos). Junto a las sesiones se guarda el usuario ya armado con sus permisos, así load_user no vuelve a la BD,
+# y el admin puede cerrar todas las sesiones de un usuario desde gestion_usuarios.
+import copy
+import logging
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from flask.sessions import SessionInterface, SessionMixin, session_json_serializer
+from werkzeug.datastructures import CallbackDict
+
+logger = logging.getLogger(__name__)
+
+def _id_usuario(datos):
+    """Id del usuario autenticado en la sesión (Flask-Login lo guarda como texto en _user_id)"""
+    try:
+        return int(datos.get('_user_id'))
+    except (TypeError, ValueError):
+        return None
+
+class SesionServidor(CallbackDict, SessionMixin):
+    """Sesión de Flask cuyo contenido vive en un almacén; sid es None hasta que se guarda por primera vez"""
+
+    def __init__(self, datos=None, sid=None):
+        def al_modificar(sesion):
+            sesion.modified = True
+        super().__init__(datos, al_modificar)
+        self.sid = sid
+        self.sid_anterior = None
+        self.modified = False
+
+    def regenerar(self):
+        """Cambia el id al iniciar sesión (evita la fijación de sesión); el anterior se borra al guardar"""
+        if self.sid is not None and self.sid_anterior is None:
+            self.sid_anterior = self.sid
+        self.sid = None
+        self.modified = True
+
+class AlmacenSesionesMemoria:
+    """Sesiones en un dict LRU con expiración deslizante; sirve con un solo proceso (gunicorn -w 1, con hilos)"""
+
+    def __init__(self, ttl=43200, max_sesiones=10000):
+        self.ttl = ttl
+        self.max_sesiones = max_sesiones
+        self._sesiones = OrderedDict()  # sid -> [expira_en, id_usuario, datos]
+        self._por_usuario = {}          # id_usuario -> {sid}
+        self._usuarios = {}             # id_usuario -> (expira_en, datos del usuario)
+        self._lock = threading.Lock()
+        self.revocadas = 0
+
+    def _quitar(self, sid):
+        entrada = self._sesiones.pop(sid, None)
+        if entrada is not None and entrada[1] is not None:
+            sids = self._por_usuario.get(entrada[1])
+            if sids is not None:
+                sids.discard(sid)
+                if not sids:
+                    del self._por_usuario[entrada[1]]
+
+    def obtener(self, sid):
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._sesiones.get(sid)
+            if entrada is None:
+                return None
+            if entrada[0] < ahora:
+                self._quitar(sid)
+                return None
+            entrada[0] = ahora + self.ttl
+            self._sesiones.move_to_end(sid)
+            # Copia: flash() modifica en el lugar la lista de mensajes de la sesión
+            return copy.deepcopy(entrada[2])
+
+    def guardar(self, sid, datos):
+        id_usuario = _id_usuario(datos)
+        with self._lock:
+            self._quitar(sid)
+            self._sesiones[sid] = [time.monotonic() + self.ttl, id_usuario, datos]
+            if id_usuario is not None:
+                self._por_usuario.setdefault(id_usuario, set()).add(sid)
+            while len(self._sesiones) > self.max_sesiones:
+                self._quitar(next(iter(self._sesiones)))
+
+    def eliminar(self, sid):
+        with self._lock:
+            self._quitar(sid)
+
+    def obtener_usuario(self, id_usuario):
+        with self._lock:
+            entrada = self._usuarios.get(id_usuario)
+            if entrada is None or entrada[0] < time.monotonic():
+                return None
+            return entrada[1]
+
+    def guardar_usuario(self, id_usuario, datos):
+        with self._lock:
+            if id_usuario in self._por_usuario:
+                self._usuarios[id_usuario] = (time.monotonic() + self.ttl, datos)
+
+    def olvidar_usuario(self, id_usuario):
+        """Descarta el usuario guardado (cambió su rol o permisos); sus sesiones siguen abiertas"""
+        with self._lock:
+            self._usuarios.pop(id_usuario, None)
+
+    def revocar_usuario(self, id_usuario):
+        """Cierra todas las sesiones del usuario; devuelve cuántas había"""
+        with self._lock:
+            sids = list(self._por_usuario.get(id_usuario, ()))
+            for sid in sids:
+                self._quitar(sid)
+            self._usuarios.pop(id_usuario, None)
+            self.revocadas += len(sids)
+            return len(sids)
+
+    def contar_por_usuario(self, ids):
+        """{id_usuario: sesiones abiertas}"""
+        ahora = time.monotonic()
+        with self._lock:
+            return {
+                id_usuario: sum(1 for sid in self._por_usuario.get(id_usuario, ()) if self._sesiones[sid][0] >= ahora)
+                for id_usuario in ids
+            }
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'backend': 'memoria',
+                'sesiones': len(self._sesiones),
+                'max_sesiones': self.max_sesiones,
+                'usuarios': len(self._por_usuario),
+                'revocadas': self.revocadas
+            }
+
+class AlmacenSesionesRedis:
+    """Misma interfaz que AlmacenSesionesMemoria, compartida entre workers y nodos.
+
+    Claves: {prefijo}:s:<sid> (datos serializados como la cookie de Flask), {prefijo}:u:<id> (sids del usuario)
+    y {prefijo}:usuario:<id> (usuario armado). Las sesiones y el usuario expiran con el TTL y leer una sesión
+    lo renueva; el conjunto de sids no expira (una sesión activa que no se modifica no lo volvería a tocar y
+    revocar_usuario no la encontraría): los sids vencidos se quitan al contar y al revocar.
+    """
+
+    def __init__(self, url, ttl=43200, prefijo='sesiones'):
+        import redis
+        self.ttl = ttl
+        self.prefijo = prefijo
+        self._cliente = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.errores = 0
+        self.revocadas = 0
+
+    def _sesion(self, sid):
+        return f'{self.prefijo}:s:{sid}'
+
+    def _sids(self, id_usuario):
+        return f'{self.prefijo}:u:{id_usuario}'
+
+    def _usuario(self, id_usuario):
+        return f'{self.prefijo}:usuario:{id_usuario}'
+
+    def _error(self, mensaje, err):
+        self.errores += 1
+        logger.warning(mensaje, extra={'error': str(err), 'muestreo': True})
+
+    def obtener(self, sid):
+        try:
+            with self._cliente.pipeline() as tuberia:
+                tuberia.get(self._sesion(sid))
+                tuberia.expire(self._sesion(sid), self.ttl)
+                crudo, _ = tuberia.execute()
+        except Exception as err:
+            # Sin Redis la petición sigue como anónima (Flask-Login redirige al login)
+            self._error("Almacén de sesiones no disponible", err)
+            return None
+        return session_json_serializer.loads(crudo.decode('utf-8')) if crudo is not None else None
+
+    def guardar(self, sid, datos):
+        id_usuario = _id_usuario(datos)
+        try:
+            with self._cliente.pipeline() as tuberia:
+                tuberia.set(self._sesion(sid), session_json_serializer.dumps(datos), ex=self.ttl)
+                if id_usuario is not None:
+                    tuberia.sadd(self._sids(id_usuario), sid)
+                    # Quita el TTL que le ponían las versiones anteriores
+                    tuberia.persist(self._sids(id_usuario))
+                tuberia.execute()
+        except Exception as err:
+            self._error("No se pudo guardar la sesión", err)
+
+    def eliminar(self, sid):
+        try:
+            self._cliente.delete(self._sesion(sid))
+        except Exception as err:
+            self._error("No se pudo borrar la sesión", err)
+
+    def obtener_usuario(self, id_usuario):
+        try:
+            crudo = self._cliente.get(self._usuario(id_usuario))
+        except Exception as err:
+            self._error("Almacén de sesiones no disponible", err)
+            return None
+        return session_json_serializer.loads(crudo.decode('utf-8')) if crudo is not None else None
+
+    def guardar_usuario(self, id_usuario, datos):
+        try:
+            self._cliente.set(self._usuario(id_usuario), session_json_serializer.dumps(datos), ex=self.ttl)
+        except Exception as err:
+            self._error("No se pudo guardar el usuario de la sesión", err)
+
+    def olvidar_usuario(self, id_usuario):
+        try:
+            self._cliente.delete(self._usuario(id_usuario))
+        except Exception:
+            self.errores += 1
+            logger.exception("Error descartando el usuario de las sesiones", extra={'id_usuario': id_usuario})
+
+    def revocar_usuario(self, id_usuario):
+        try:
+            sids = [sid.decode('utf-8') for sid in self._cliente.smembers(self._sids(id_usuario))]
+            self._cliente.delete(self._sids(id_usuario), self._usuario(id_usuario),
+                                 *(self._sesion(sid) for sid in sids))
+        except Exception:
+            self.errores += 1
+            logger.exception("Error cerrando las sesiones del usuario", extra={'id_usuario': id_usuario})
+            raise
+        self.revocadas += len(sids)
+        return len(sids)
+
+    def contar_por_usuario(self, ids):
+        """{id_usuario: sesiones abiertas}; de paso quita de cada conjunto las sesiones ya expiradas"""
+        ids = list(ids)
+        try:
+            with self._cliente.pipeline() as tuberia:
+                for id_usuario in ids:
+                    tuberia.smembers(self._sids(id_usuario))
+                conjuntos = tuberia.execute()
+            sids_por_usuario = [[sid.decode('utf-8') for sid in sids] for sids in conjuntos]
+            with self._cliente.pipeline() as tuberia:
+                for sids in sids_por_usuario:
+                    for sid in sids:
+                        tuberia.exists(self._sesion(sid))
+                existentes = iter(tuberia.execute())
+            conteos = {}
+            with self._cliente.pipeline() as tuberia:
+                for id_usuario, sids in zip(ids, sids_por_usuario):
+                    vencidas = [sid for sid in sids if not next(existentes)]
+                    if vencidas:
+                        tuberia.srem(self._sids(id_usuario), *vencidas)
+                    conteos[id_usuario] = len(sids) - len(vencidas)
+                tuberia.execute()
+            return conteos
+        except Exception as err:
+            self._error("Almacén de sesiones no disponible", err)
+            return {}
+
+    def estadisticas(self):
+        return {'backend': 'redis', 'errores': self.errores, 'revocadas': self.revocadas}
+
+class InterfazSesionesServidor(SessionInterface):
+    """SessionInterface de Flask que guarda el contenido de la sesión en un almacén y en la cookie solo el id"""
+
+    def __init__(self, almacen):
+        self.almacen = almacen
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            datos = self.almacen.obtener(sid)
+            if datos is not None:
+                return SesionServidor(datos, sid)
+        return SesionServidor()
+
+    def save_session(self, app, session, response):
+        nombre = self.get_cookie_name(app)
+        dominio = self.get_cookie_domain(app)
+        ruta = self.get_cookie_path(app)
+
+        if session.sid_anterior is not None:
+            self.almacen.eliminar(session.sid_anterior)
+            session.sid_anterior = None
+
+        if not session:
+            # Sesión vaciada (logout): se borra del almacén junto con la cookie
+            if session.modified and session.sid is not None:
+                self.almacen.eliminar(session.sid)
+                response.delete_cookie(nombre, domain=dominio, path=ruta, secure=self.get_cookie_secure(app),
+                                       samesite=self.get_cookie_samesite(app), httponly=self.get_cookie_httponly(app))
+            return
+
+        if not session.modified:
+            return
+
+        nueva = session.sid is None
+        if nueva:
+            session.sid = secrets.token_urlsafe(32)
+        self.almacen.guardar(session.sid, dict(session))
+        if nueva or session.permanent:
+            response.set_cookie(
+                nombre, session.sid, expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app), domain=dominio, path=ruta,
+                secure=self.get_cookie_secure(app), samesite=self.get_cookie_samesite(app)
+            )
+
+def crear_almacen_sesiones(url, ttl=43200, max_sesiones=10000):
+    """'memoria' -> almacén del proceso; 'redis://...' -> Redis; vacío -> None (cookie firmada de Flask)"""
+    if not url:
+        return None
+    if url == 'memoria':
+        return AlmacenSesionesMemoria(ttl=ttl, max_sesiones=max_sesiones)
+    return AlmacenSesionesRedis(url, ttl=ttl)
@@ -1,10 +1,10 @@
 #!/bin/bash
+set -e
 
-# Ejecuta el script de inicialización de la base de datos
-#!/bin/bash
-echo "🚀 Iniciando la aplicación Flask..."
-python app.py
+# Aplica las migraciones pendientes del esquema (una vez por despliegue) antes de arrancar
+echo "🚀 Aplicando migraciones..."
+python migrar.py
 
-# Inicia la aplicación con Gunicorn
+# Inicia la aplicación con Gunicorn (configuración en gunicorn.conf.py)
 echo "Iniciando Gunicorn..."
-gunicorn --bind 0.0.0.0:5000 app:app
+exec gunicorn app:app
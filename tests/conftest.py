@@ -0,0 +1,22 @@
+# Fixtures comunes: las pruebas cubren las piezas en Python puro (sin PostgreSQL ni Redis)
+import time
+
+import pytest
+
+class RelojFalso:
+    """Reemplazo de time.monotonic que solo avanza cuando la prueba lo pide"""
+
+    def __init__(self, inicio=1000.0):
+        self.ahora = inicio
+
+    def __call__(self):
+        return self.ahora
+
+    def avanzar(self, segundos):
+        self.ahora += segundos
+
+@pytest.fixture
+def reloj(monkeypatch):
+    reloj = RelojFalso()
+    monkeypatch.setattr(time, 'monotonic', reloj)
+    return reloj
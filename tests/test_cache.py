@@ -0,0 +1,95 @@
+from cache import CacheFragmentos, CacheTTL
+
+def test_ttl_expira(reloj):
+    cache = CacheTTL(ttl=60)
+    cache.guardar('usuario:1', 'ana')
+    reloj.avanzar(59)
+    assert cache.obtener('usuario:1') == 'ana'
+
+    reloj.avanzar(2)
+    assert cache.obtener('usuario:1', 'sin datos') == 'sin datos'
+    assert cache.estadisticas()['items'] == 0
+
+def test_ttl_por_entrada(reloj):
+    cache = CacheTTL(ttl=60)
+    cache.guardar('corta', 1, ttl=5)
+    cache.guardar('larga', 2)
+    reloj.avanzar(10)
+    assert cache.obtener('corta') is None
+    assert cache.obtener('larga') == 2
+
+def test_ttl_desaloja_la_menos_usada(reloj):
+    cache = CacheTTL(max_items=2)
+    cache.guardar('a', 1)
+    cache.guardar('b', 2)
+    cache.obtener('a')
+    cache.guardar('c', 3)
+
+    assert cache.obtener('b') is None
+    assert cache.obtener('a') == 1
+    assert cache.obtener('c') == 3
+
+def test_ttl_invalidar_y_contadores(reloj):
+    cache = CacheTTL()
+    cache.guardar('a', 1)
+    cache.invalidar('a')
+    cache.invalidar('no existe')
+    assert cache.obtener('a') is None
+
+    cache.guardar('b', 2)
+    cache.obtener('b')
+    estadisticas = cache.estadisticas()
+    assert (estadisticas['aciertos'], estadisticas['fallos']) == (1, 1)
+
+def fragmento(bytes_html):
+    return {'titulo': '', 'html': 'x' * bytes_html}
+
+def test_fragmentos_expiran(reloj):
+    cache = CacheFragmentos(ttl=3600)
+    cache.guardar(7, 'admin', fragmento(10))
+    reloj.avanzar(3601)
+    assert cache.obtener(7, 'admin') is None
+    assert cache.estadisticas()['bytes'] == 0
+
+def test_fragmentos_desalojan_por_bytes(reloj):
+    cache = CacheFragmentos(max_bytes=100)
+    cache.guardar(1, 'v', fragmento(40))
+    cache.guardar(2, 'v', fragmento(40))
+    cache.obtener(1, 'v')
+    cache.guardar(3, 'v', fragmento(40))
+
+    assert cache.obtener(2, 'v') is None
+    assert cache.obtener(1, 'v') is not None
+    estadisticas = cache.estadisticas()
+    assert estadisticas['bytes'] == 80
+    assert estadisticas['desalojos'] == 1
+
+def test_fragmentos_cuentan_bytes_utf8(reloj):
+    cache = CacheFragmentos(max_bytes=100)
+    cache.guardar(1, 'v', {'titulo': 'Sin señal', 'html': ''})
+    assert cache.estadisticas()['bytes'] == len('Sin señal'.encode('utf-8'))
+
+def test_fragmentos_no_guarda_el_que_no_entra(reloj):
+    cache = CacheFragmentos(max_bytes=100)
+    cache.guardar(1, 'v', fragmento(40))
+    cache.guardar(2, 'v', fragmento(101))
+    assert cache.obtener(2, 'v') is None
+    assert cache.obtener(1, 'v') is not None
+
+def test_fragmentos_reemplazo_no_duplica_bytes(reloj):
+    cache = CacheFragmentos(max_bytes=100)
+    cache.guardar(1, 'v', fragmento(40))
+    cache.guardar(1, 'v', fragmento(30))
+    assert cache.estadisticas()['bytes'] == 30
+
+def test_fragmentos_invalidar_grupo(reloj):
+    cache = CacheFragmentos()
+    cache.guardar(1, 'admin', fragmento(10))
+    cache.guardar(1, 'asesor', fragmento(10))
+    cache.guardar(2, 'admin', fragmento(10))
+
+    cache.invalidar_grupo(1)
+    assert cache.obtener(1, 'admin') is None
+    assert cache.obtener(1, 'asesor') is None
+    assert cache.obtener(2, 'admin') is not None
+    assert cache.estadisticas()['items'] == 1
@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta
+
+from conocimiento import SnapshotFichas
+from fichas import codificar_cursor
+from repositorios import Ficha
+
+BASE = datetime(2025, 10, 1, 9, 0)
+
+def ficha(id, categoria='Internet', problema='', descripcion='', causas=(), solucion=(), palabras_clave='',
+          minutos=0):
+    fecha = BASE + timedelta(minutes=minutos)
+    return Ficha(id, categoria, problema, descripcion, causas, solucion, palabras_clave, fecha, fecha)
+
+def snapshot(*fichas):
+    return SnapshotFichas(1, fichas)
+
+def ids(fichas):
+    return [f.id for f in fichas]
+
+def test_buscar_por_prefijo_sin_acentos():
+    datos = snapshot(ficha(1, problema='Módem sin conexión'), ficha(2, problema='Televisor sin señal'))
+    assert ids(datos.buscar('modem')) == [1]
+    assert ids(datos.buscar('CONEX')) == [1]
+    assert ids(datos.buscar('senal')) == [2]
+
+def test_buscar_exige_todas_las_palabras():
+    datos = snapshot(ficha(1, problema='Internet lento', causas=('Router viejo',)),
+                     ficha(2, problema='Internet caído'))
+    assert ids(datos.buscar('lento router')) == [1]
+    assert datos.buscar('lento caido') == []
+
+def test_buscar_ignora_palabras_vacias():
+    datos = snapshot(ficha(1, problema='Sin señal en el televisor'))
+    assert ids(datos.buscar('señal de la tele')) == [1]
+
+def test_buscar_ordena_por_peso_del_campo():
+    datos = snapshot(ficha(1, solucion=('Reiniciar el router',), minutos=10),
+                     ficha(2, problema='Router no enciende'))
+    # problema pesa más que solucion aunque la otra ficha sea más reciente
+    assert ids(datos.buscar('router')) == [2, 1]
+
+def test_buscar_filtra_por_categoria():
+    datos = snapshot(ficha(1, categoria='Internet', problema='Sin servicio'),
+                     ficha(2, categoria='TV', problema='Sin servicio'))
+    assert ids(datos.buscar('servicio', categoria='TV')) == [2]
+    assert datos.buscar('servicio', categoria='Telefonía') == []
+
+def test_buscar_sin_texto_lista_por_fecha():
+    datos = snapshot(ficha(1, minutos=1), ficha(2, categoria='TV', minutos=3), ficha(3, minutos=2))
+    assert ids(datos.buscar('')) == [2, 3, 1]
+    assert ids(datos.buscar('', categoria='Internet')) == [3, 1]
+    assert ids(datos.buscar('', limite=1)) == [2]
+    # Texto sin palabras buscables no devuelve todo
+    assert datos.buscar('¿?') == []
+
+def test_pagina_recorre_todas_sin_repetir():
+    datos = snapshot(*(ficha(id, minutos=id % 4) for id in range(1, 11)))
+    vistas = []
+    despues = None
+    while True:
+        pagina, despues = datos.pagina(3, despues)
+        vistas.extend(ids(pagina))
+        if despues is None:
+            break
+
+    assert vistas == ids(datos.fichas)
+    assert sorted(vistas) == list(range(1, 11))
+
+def test_pagina_usa_el_cursor_del_repositorio():
+    datos = snapshot(ficha(1, minutos=1), ficha(2, minutos=2), ficha(3, minutos=3))
+    pagina, siguiente = datos.pagina(2)
+    assert ids(pagina) == [3, 2]
+    assert siguiente == codificar_cursor(BASE + timedelta(minutes=2), 2)
+
+    pagina, siguiente = datos.pagina(2, siguiente)
+    assert ids(pagina) == [1]
+    assert siguiente is None
+
+def test_pagina_con_cursor_invalido_empieza_desde_el_principio():
+    datos = snapshot(ficha(1, minutos=1), ficha(2, minutos=2))
+    pagina, _ = datos.pagina(1, 'no-es-un-cursor')
+    assert ids(pagina) == [2]
@@ -0,0 +1,82 @@
+import threading
+
+import pytest
+
+from contrasenas import LimitadorIntentos, PoolHash, PoolHashSaturado, prefijo_del_metodo
+
+def test_limitador_bloquea_al_llegar_al_maximo(reloj):
+    limitador = LimitadorIntentos(max_intentos=3, ventana=60)
+    for _ in range(2):
+        limitador.registrar_fallo('ana')
+    assert limitador.espera('ana') == 0
+
+    limitador.registrar_fallo('ana')
+    assert limitador.espera('ana') == 61
+    assert limitador.espera('otro') == 0
+
+def test_limitador_ventana_deslizante(reloj):
+    limitador = LimitadorIntentos(max_intentos=2, ventana=60)
+    limitador.registrar_fallo('ana')
+    reloj.avanzar(40)
+    limitador.registrar_fallo('ana')
+    assert limitador.espera('ana') == 21
+
+    # Sale de la ventana el primer fallo: vuelve a quedar un intento
+    reloj.avanzar(21)
+    assert limitador.espera('ana') == 0
+    limitador.registrar_fallo('ana')
+    assert limitador.espera('ana') == 40
+
+def test_limitador_limpiar_tras_login_correcto(reloj):
+    limitador = LimitadorIntentos(max_intentos=1, ventana=60)
+    limitador.registrar_fallo('ana')
+    limitador.limpiar('ana')
+    assert limitador.espera('ana') == 0
+
+def test_limitador_acota_las_claves(reloj):
+    limitador = LimitadorIntentos(max_intentos=1, ventana=60, max_claves=2)
+    for clave in ('a', 'b', 'c'):
+        limitador.registrar_fallo(clave)
+    assert limitador.espera('a') == 0
+    assert limitador.espera('c') == 61
+    assert limitador.bloqueos == 1
+
+def test_pool_rechaza_con_la_cola_llena():
+    pool = PoolHash('pbkdf2:sha256:1000', hilos=1, max_en_cola=0, timeout=5)
+    liberar = threading.Event()
+    en_curso = threading.Thread(target=pool._ejecutar, args=('verificar', liberar.wait))
+    en_curso.start()
+    try:
+        with pytest.raises(PoolHashSaturado):
+            pool.verificar('hash', 'clave')
+    finally:
+        liberar.set()
+        en_curso.join()
+    assert pool.operaciones[('verificar', 'rechazada')] == 1
+
+def test_pool_el_cupo_sigue_ocupado_tras_un_timeout():
+    pool = PoolHash('pbkdf2:sha256:1000', hilos=1, max_en_cola=0, timeout=0.05)
+    liberar = threading.Event()
+    with pytest.raises(PoolHashSaturado):
+        pool._ejecutar('verificar', liberar.wait)
+
+    # El hash que expiró sigue corriendo y ocupa el único cupo
+    with pytest.raises(PoolHashSaturado, match="lleno"):
+        pool.verificar('hash', 'clave')
+    liberar.set()
+    pool._ejecutor.shutdown(wait=True)
+    assert pool.pendientes == 0
+
+def test_pool_genera_verifica_y_detecta_rehash():
+    pool = PoolHash('pbkdf2:sha256:1000', hilos=1)
+    hash_guardado = pool.generar('secreto')
+    assert pool.verificar(hash_guardado, 'secreto')
+    assert not pool.verificar(hash_guardado, 'otra')
+    assert not pool.necesita_rehash(hash_guardado)
+    assert pool.necesita_rehash('pbkdf2:sha256:600000$sal$hash')
+
+def test_prefijo_del_metodo_sin_calcular_hashes():
+    assert prefijo_del_metodo('pbkdf2:sha256:1000') == 'pbkdf2:sha256:1000'
+    assert prefijo_del_metodo('pbkdf2:sha512').startswith('pbkdf2:sha512:')
+    assert prefijo_del_metodo('scrypt') == 'scrypt:32768:8:1'
+    assert prefijo_del_metodo('scrypt:1024:8:1') == 'scrypt:1024:8:1'
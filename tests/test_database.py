@@ -0,0 +1,216 @@
+import psycopg2
+import pytest
+
+import database
+from database import CircuitoConexion, PoolConexiones
+
+class CursorFalso:
+    def __init__(self, conexion):
+        self.conexion = conexion
+
+    def execute(self, sql):
+        if self.conexion.muerta:
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+
+    def close(self):
+        pass
+
+class ConexionFalsa:
+    """Lo que el pool usa de una conexión de psycopg2"""
+
+    def __init__(self):
+        self.closed = 0
+        self.muerta = False
+        self.estado = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def cursor(self):
+        return CursorFalso(self)
+
+    def rollback(self):
+        self.estado = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def get_transaction_status(self):
+        return self.estado
+
+    def close(self):
+        self.closed = 1
+
+@pytest.fixture
+def circuito(monkeypatch):
+    circuito = CircuitoConexion(umbral_fallos=2, espera_apertura=30)
+    monkeypatch.setattr(database, 'circuito', circuito)
+    return circuito
+
+@pytest.fixture
+def creadas(monkeypatch, circuito):
+    """Conexiones que abre el pool; crear_conexion respeta el circuito como la real"""
+    creadas = []
+
+    def crear_conexion(permitida=False):
+        if not permitida and not circuito.permitir():
+            return None
+        conexion = ConexionFalsa()
+        creadas.append(conexion)
+        circuito.registrar_exito()
+        return conexion
+
+    monkeypatch.setattr(database, 'crear_conexion', crear_conexion)
+    return creadas
+
+def test_reutiliza_la_conexion_devuelta(creadas):
+    pool = PoolConexiones(maximo=2)
+    conexion = pool.obtener()
+    pool.devolver(conexion)
+
+    assert pool.obtener() is conexion
+    assert len(creadas) == 1
+    assert pool.estadisticas()['checkouts'] == 2
+
+def test_agotado_devuelve_none_tras_el_timeout(creadas):
+    pool = PoolConexiones(maximo=1, timeout_espera=0.05)
+    assert pool.obtener() is not None
+
+    assert pool.obtener() is None
+    estadisticas = pool.estadisticas()
+    assert estadisticas['timeouts'] == 1
+    assert estadisticas['esperas'] == 1
+    assert estadisticas['en_uso'] == 1
+
+def test_descarta_la_conexion_cerrada_al_devolverla(creadas):
+    pool = PoolConexiones(maximo=1)
+    conexion = pool.obtener()
+    conexion.close()
+    pool.devolver(conexion)
+
+    assert pool.estadisticas()['abiertas'] == 0
+    nueva = pool.obtener()
+    assert nueva is not conexion
+    assert len(creadas) == 2
+
+def test_hace_rollback_de_la_transaccion_abierta_al_devolver(creadas):
+    pool = PoolConexiones(maximo=1)
+    conexion = pool.obtener()
+    conexion.estado = psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+    pool.devolver(conexion)
+
+    assert conexion.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_IDLE
+    assert pool.obtener() is conexion
+
+def test_ping_de_la_conexion_inactiva(reloj, creadas):
+    pool = PoolConexiones(maximo=1, ping_segundos=30)
+    conexion = pool.obtener()
+    pool.devolver(conexion)
+    reloj.avanzar(31)
+    conexion.muerta = True
+
+    nueva = pool.obtener()
+    assert nueva is not conexion
+    assert conexion.closed
+    estadisticas = pool.estadisticas()
+    assert estadisticas['pings_fallidos'] == 1
+    assert estadisticas['abiertas'] == 1
+
+def test_sin_ping_si_la_conexion_se_devolvio_hace_poco(reloj, creadas):
+    pool = PoolConexiones(maximo=1, ping_segundos=30)
+    conexion = pool.obtener()
+    pool.devolver(conexion)
+    reloj.avanzar(5)
+    conexion.muerta = True
+
+    # Dentro de ping_segundos se presta sin comprobarla
+    assert pool.obtener() is conexion
+
+def test_circuito_se_abre_tras_el_umbral_de_fallos(reloj):
+    circuito = CircuitoConexion(umbral_fallos=3, espera_apertura=30)
+    for _ in range(2):
+        assert circuito.permitir()
+        circuito.registrar_fallo("connection refused")
+    assert circuito.estado == 'cerrado'
+
+    circuito.registrar_fallo("connection refused")
+    assert circuito.estado == 'abierto'
+    assert not circuito.disponible()
+    assert not circuito.permitir()
+    assert circuito.estadisticas()['rechazadas'] == 1
+
+def test_circuito_exito_reinicia_los_fallos_consecutivos(reloj):
+    circuito = CircuitoConexion(umbral_fallos=2)
+    circuito.registrar_fallo("timeout")
+    circuito.registrar_exito()
+    circuito.registrar_fallo("timeout")
+    assert circuito.estado == 'cerrado'
+
+def test_circuito_semiabierto_deja_pasar_un_solo_sondeo(reloj):
+    circuito = CircuitoConexion(umbral_fallos=1, espera_apertura=30)
+    circuito.registrar_fallo("connection refused")
+    reloj.avanzar(29)
+    assert not circuito.permitir()
+
+    reloj.avanzar(1)
+    assert circuito.permitir()
+    assert circuito.estado == 'semiabierto'
+    assert not circuito.permitir()
+
+    circuito.registrar_exito()
+    assert circuito.estado == 'cerrado'
+    assert circuito.permitir()
+    assert circuito.estadisticas()['transiciones'] == {
+        'cerrado->abierto': 1, 'abierto->semiabierto': 1, 'semiabierto->cerrado': 1
+    }
+
+def test_circuito_sondeo_fallido_vuelve_a_abrir(reloj):
+    circuito = CircuitoConexion(umbral_fallos=3, espera_apertura=30)
+    for _ in range(3):
+        circuito.registrar_fallo("connection refused")
+    reloj.avanzar(30)
+    assert circuito.permitir()
+
+    circuito.registrar_fallo("connection refused")
+    assert circuito.estado == 'abierto'
+    reloj.avanzar(10)
+    assert not circuito.permitir()
+
+def test_circuito_sondeo_cancelado_se_reintenta_enseguida(reloj):
+    circuito = CircuitoConexion(umbral_fallos=1, espera_apertura=30)
+    circuito.registrar_fallo("connection refused")
+    reloj.avanzar(30)
+    assert circuito.permitir()
+
+    circuito.cancelar_sondeo()
+    assert circuito.estado == 'abierto'
+    assert circuito.permitir()
+
+def test_pool_no_presta_con_el_circuito_abierto(reloj, circuito, creadas):
+    pool = PoolConexiones(maximo=2)
+    conexion = pool.obtener()
+    pool.devolver(conexion)
+    circuito.registrar_fallo("connection refused")
+    circuito.registrar_fallo("connection refused")
+
+    # Ni siquiera la conexión libre: lo más probable es que esté muerta
+    assert pool.obtener() is None
+    assert len(creadas) == 1
+
+def test_pool_sondeo_con_conexion_libre_cierra_el_circuito(reloj, circuito, creadas):
+    pool = PoolConexiones(maximo=2)
+    conexion = pool.obtener()
+    pool.devolver(conexion)
+    circuito.registrar_fallo("connection refused")
+    circuito.registrar_fallo("connection refused")
+    reloj.avanzar(30)
+
+    assert pool.obtener() is conexion
+    assert circuito.estado == 'cerrado'
+
+def test_pool_sondeo_con_ping_fallido_reabre_el_circuito(reloj, circuito, creadas):
+    pool = PoolConexiones(maximo=2)
+    conexion = pool.obtener()
+    pool.devolver(conexion)
+    conexion.muerta = True
+    circuito.registrar_fallo("connection refused")
+    circuito.registrar_fallo("connection refused")
+    reloj.avanzar(30)
+
+    assert pool.obtener() is None
+    assert circuito.estado == 'abierto'
+    assert pool.estadisticas()['abiertas'] == 0
@@ -0,0 +1,47 @@
+import pytest
+
+from fichas import insertar_ficha, separar_pasos
+
+class CursorGuionado:
+    """Cursor que responde cada fetchone con la siguiente fila del guion y anota las consultas"""
+
+    def __init__(self, *filas):
+        self.filas = list(filas)
+        self.consultas = []
+
+    def execute(self, sql, parametros=None):
+        self.consultas.append(' '.join(sql.split()))
+
+    def fetchone(self):
+        return self.filas.pop(0)
+
+    def contar(self, inicio):
+        return sum(1 for consulta in self.consultas if consulta.startswith(inicio))
+
+def insertar(cursor, clave='clave-1'):
+    return insertar_ficha(cursor, 'Internet', 'Sin servicio', '', ['Corte'], ['Reiniciar'], '', clave)
+
+def test_insertar_ficha_nueva():
+    cursor = CursorGuionado((42,))
+    assert insertar(cursor) == (42, True)
+    assert cursor.contar('INSERT INTO fichas_pasos') == 2
+
+def test_insertar_ficha_repetida_devuelve_la_existente():
+    # El INSERT no devuelve fila (conflicto de clave) y el SELECT encuentra la ficha del primer envío
+    cursor = CursorGuionado(None, (42,))
+    assert insertar(cursor) == (42, False)
+    assert cursor.contar('INSERT INTO fichas_pasos') == 0
+
+def test_insertar_ficha_reintenta_si_la_existente_se_borro():
+    cursor = CursorGuionado(None, None, (43,))
+    assert insertar(cursor) == (43, True)
+    assert cursor.contar('INSERT INTO fichas (') == 2
+
+def test_insertar_ficha_falla_tras_dos_intentos():
+    cursor = CursorGuionado(None, None, None, None)
+    with pytest.raises(RuntimeError):
+        insertar(cursor)
+
+def test_separar_pasos():
+    assert separar_pasos('1. Reiniciar|2. Revisar cables\n3.Llamar') == ['Reiniciar', 'Revisar cables', 'Llamar']
+    assert separar_pasos(None) == []
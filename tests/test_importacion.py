@@ -0,0 +1,90 @@
+import io
+import os
+from datetime import datetime
+
+import importacion
+from importacion import detectar_formato, leer_jsonl, leer_volcado_mysql, validar_ficha
+
+VOLCADO = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'soporte_tecnico.sql')
+
+def leer_volcado(tabla='fichas'):
+    with open(VOLCADO, encoding='utf-8') as flujo:
+        return list(leer_volcado_mysql(flujo, tabla))
+
+def test_volcado_soporte_tecnico():
+    fichas = leer_volcado()
+    assert len(fichas) == 21
+    assert all(not validar_ficha(registro)[1] for registro in fichas)
+
+    primera = fichas[0]
+    assert primera['id'] == '4'
+    assert primera['categoria'] == 'TV'
+    assert primera['problema'] == 'No hay señal en el televisor'
+    assert primera['causas'] == 'Micronodo/CATV alarmado, apagado|Problemas con el decodificador'
+    assert fichas[-1]['id'] == '30'
+
+def test_volcado_otra_tabla():
+    usuarios = leer_volcado('usuarios')
+    assert len(usuarios) == 3
+    assert set(usuarios[0]) == {'id', 'usuario', 'password', 'rol', 'fecha_creacion', 'fecha_actualizacion', 'permisos'}
+
+def test_volcado_escapes_y_null():
+    volcado = io.StringIO(
+        "-- comentario\n"
+        "INSERT INTO `fichas` (`id`, `problema`, `descripcion`) VALUES\n"
+        "(1, 'L\\'modem', NULL),\n"
+        "(2, 'dice ''hola''', 'a\\nb; (c)');\n"
+        "INSERT INTO `otra` (`id`) VALUES (9);\n"
+    )
+    assert list(leer_volcado_mysql(volcado)) == [
+        {'id': '1', 'problema': "L'modem", 'descripcion': None},
+        {'id': '2', 'problema': "dice 'hola'", 'descripcion': 'a\nb; (c)'}
+    ]
+
+def test_jsonl_marca_las_lineas_invalidas():
+    registros = list(leer_jsonl(io.StringIO('{"id": 1}\n\n[1, 2]\n{roto\n')))
+    assert registros[0] == {'id': 1}
+    assert registros[1]['_error'] == "Se esperaba un objeto JSON"
+    assert registros[2]['_error'].startswith("JSON inválido")
+
+def test_validar_normaliza_pasos_y_fechas():
+    fila, errores = validar_ficha({
+        'id': '7', 'categoria': ' TV ', 'problema': 'Sin señal', 'causas': ['  Cable   suelto ', ''],
+        'solucion': '1. Revisar|2. Reiniciar', 'fecha_creacion': '2025-09-30T13:29:02Z'
+    })
+    assert errores == []
+    assert fila['id'] == 7
+    assert fila['categoria'] == 'TV'
+    assert fila['causas'] == ['Cable suelto']
+    assert fila['solucion'] == ['Revisar', 'Reiniciar']
+    assert fila['descripcion'] == ''
+    assert fila['fecha_creacion'] == datetime(2025, 9, 30, 13, 29, 2)
+    assert fila['fecha_actualizacion'] is None
+
+def test_validar_informa_cada_error():
+    _, errores = validar_ficha({
+        'id': '-3', 'categoria': 'x' * 51, 'problema': '  ', 'fecha_actualizacion': 'ayer'
+    })
+    assert errores == [
+        "id inválido: -3",
+        "fecha_actualizacion inválida: 'ayer'",
+        "Falta problema",
+        "Falta solucion",
+        f"categoria supera {importacion.LARGOS_MAXIMOS['categoria']} caracteres"
+    ]
+
+def test_validar_pasa_el_error_del_lector():
+    assert validar_ficha({'_error': "JSON inválido"}) == (None, ["JSON inválido"])
+
+def test_detectar_formato():
+    assert detectar_formato('fichas.CSV') == 'csv'
+    assert detectar_formato('fichas.ndjson') == 'jsonl'
+    assert detectar_formato('soporte_tecnico.sql') == 'mysql'
+    assert detectar_formato('fichas.xlsx') is None
+    assert detectar_formato(None) is None
+
+def test_valor_copy_escapa_texto_y_listas():
+    assert importacion._valor_copy(None) == '\\N'
+    assert importacion._valor_copy('a\tb\nc\\d') == 'a\\tb\\nc\\\\d'
+    assert importacion._valor_copy(['uno', 'con "comillas"']) == '{"uno","con \\\\"comillas\\\\""}'
+    assert importacion._valor_copy(datetime(2025, 1, 2, 3, 4, 5)) == '2025-01-02 03:04:05'
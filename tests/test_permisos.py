@@ -0,0 +1,44 @@
+from permisos import BITS, PERMISOS, TODOS, ConjuntoPermisos, compilar_permisos, decodificar_permisos
+
+def test_admin_tiene_todos_aunque_se_los_quiten():
+    conjunto = compilar_permisos('admin', {'eliminar_fichas': False})
+    assert conjunto.mascara == TODOS
+    assert all(permiso in conjunto for permiso in PERMISOS)
+
+def test_asesor_parte_de_los_permisos_del_rol():
+    conjunto = compilar_permisos('asesor')
+    assert conjunto.nombres == {'ver_fichas', 'cambiar_password'}
+    assert conjunto.mascara == BITS['ver_fichas'] | BITS['cambiar_password']
+    assert 'editar_fichas' not in conjunto
+
+def test_usuario_activa_y_quita_permisos_del_rol():
+    conjunto = compilar_permisos('asesor', {'agregar_fichas': True, 'cambiar_password': False})
+    assert conjunto.nombres == {'ver_fichas', 'agregar_fichas'}
+
+def test_rol_desconocido_parte_sin_permisos():
+    assert compilar_permisos('invitado').mascara == 0
+    assert compilar_permisos('invitado', {'ver_fichas': True}).nombres == {'ver_fichas'}
+
+def test_permisos_desconocidos_se_ignoran():
+    assert compilar_permisos('asesor', {'borrar_todo': True}) is compilar_permisos('asesor')
+    assert 'borrar_todo' not in compilar_permisos('admin')
+
+def test_mismo_rol_y_permisos_comparten_el_conjunto():
+    assert compilar_permisos('asesor', {'agregar_fichas': True}) is \
+        compilar_permisos('asesor', '{"agregar_fichas": true}')
+
+def test_conjunto_ya_compilado_se_devuelve_igual():
+    conjunto = compilar_permisos('asesor')
+    assert compilar_permisos('admin', conjunto) is conjunto
+
+def test_decodificar_permisos():
+    assert decodificar_permisos({'ver_fichas': True}) == {'ver_fichas': True}
+    assert decodificar_permisos('{"ver_fichas": false}') == {'ver_fichas': False}
+    assert decodificar_permisos('{roto') == {}
+    assert decodificar_permisos('[1, 2]') == {}
+    assert decodificar_permisos(None) == {}
+
+def test_como_dict_lista_todos_los_permisos():
+    datos = ConjuntoPermisos(BITS['ver_fichas']).como_dict()
+    assert list(datos) == list(PERMISOS)
+    assert [permiso for permiso, activo in datos.items() if activo] == ['ver_fichas']